@@ -0,0 +1,147 @@
+"""
+This script handles raw AF_PACKET sockets with PACKET_FANOUT for Linux capture.
+"""
+
+import ctypes
+import os
+import socket
+import struct
+import sys
+import time
+
+# Linux constants that the socket module does not always export
+ETH_P_ALL = 0x0003
+SOL_PACKET = getattr(socket, 'SOL_PACKET', 263)
+PACKET_FANOUT = 18
+PACKET_FANOUT_HASH = 0
+PACKET_FANOUT_FLAG_DEFRAG = 0x8000
+PACKET_STATISTICS = 6
+SO_TIMESTAMPNS = getattr(socket, 'SO_TIMESTAMPNS', 35)
+SO_RCVBUFFORCE = getattr(socket, 'SO_RCVBUFFORCE', 33)
+SO_ATTACH_FILTER = getattr(socket, 'SO_ATTACH_FILTER', 26)
+
+# Largest frame we expect to read (covers jumbo frames and GRO super-packets)
+MAX_FRAME_SIZE = 65536
+# Kernel receive buffer per socket, so short bursts are absorbed instead of dropped
+RECEIVE_BUFFER_SIZE = 8 * 1024 * 1024
+_TIMESPEC = struct.Struct('@ll')
+_TPACKET_STATS = struct.Struct('@II')
+
+
+def fanout_supported():
+    """Check whether AF_PACKET sockets with fanout can be used on this platform."""
+    return sys.platform.startswith('linux') and hasattr(socket, 'AF_PACKET')
+
+
+def new_fanout_group_id():
+    """Return a fanout group id that is unique to this capture session."""
+    return (os.getpid() ^ int(time.time())) & 0xffff
+
+
+def attach_filter(sock, filter_code):
+    """
+    Attach a classic BPF program to a socket.
+
+    Args:
+        sock: Socket to filter
+        filter_code: Packed struct sock_filter instructions (8 bytes each)
+    """
+    buffer = ctypes.create_string_buffer(filter_code, len(filter_code))
+    fprog = struct.pack('@HL', len(filter_code) // 8, ctypes.addressof(buffer))
+    sock.setsockopt(socket.SOL_SOCKET, SO_ATTACH_FILTER, fprog)
+
+
+def socket_statistics(sock):
+    """
+    Read and reset the kernel counters of a packet socket.
+
+    Returns:
+        tuple: (accepted, dropped) since the last call; accepted counts packets
+        that passed the socket filter, including the dropped ones, which found
+        the receive buffer full
+    """
+    packets, drops = _TPACKET_STATS.unpack(
+        sock.getsockopt(SOL_PACKET, PACKET_STATISTICS, _TPACKET_STATS.size)
+    )
+    return packets, drops
+
+
+def interface_packet_count(interface):
+    """
+    Packets received plus sent on an interface, from the kernel's counters.
+
+    Returns:
+        int, or None if the counters are not available
+    """
+    total = 0
+    try:
+        for counter in ('rx_packets', 'tx_packets'):
+            with open(f'/sys/class/net/{interface}/statistics/{counter}') as handle:
+                total += int(handle.read())
+    except (OSError, ValueError):
+        return None
+    return total
+
+
+def open_fanout_socket(interface, group_id, timeout=1.0, filter_code=None):
+    """
+    Open a raw socket on an interface and join a hash-mode fanout group.
+
+    Every socket that joins the same group on the same interface receives a
+    disjoint share of the traffic. The kernel picks the member by a hash of
+    the flow tuple, so all packets of one flow go to the same socket.
+
+    Args:
+        interface: Name of the interface to capture on
+        group_id: 16-bit fanout group id shared by all workers
+        timeout: Socket timeout in seconds so callers can poll for shutdown
+        filter_code: Optional packed BPF program, attached before the socket is
+            bound so no unfiltered packets are queued
+
+    Returns:
+        socket.socket: Bound raw socket
+    """
+    sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
+    try:
+        if filter_code:
+            attach_filter(sock, filter_code)
+        sock.bind((interface, ETH_P_ALL))
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, SO_TIMESTAMPNS, 1)
+        except OSError:
+            pass
+        try:
+            # SO_RCVBUFFORCE ignores rmem_max but needs CAP_NET_ADMIN
+            sock.setsockopt(socket.SOL_SOCKET, SO_RCVBUFFORCE, RECEIVE_BUFFER_SIZE)
+        except OSError:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECEIVE_BUFFER_SIZE)
+        fanout_arg = (group_id & 0xffff) | ((PACKET_FANOUT_HASH | PACKET_FANOUT_FLAG_DEFRAG) << 16)
+        sock.setsockopt(SOL_PACKET, PACKET_FANOUT, struct.pack('@I', fanout_arg))
+        sock.settimeout(timeout)
+    except Exception:
+        sock.close()
+        raise
+    return sock
+
+
+def recv_frame(sock):
+    """
+    Receive one frame from a raw socket.
+
+    Returns:
+        tuple: (timestamp, raw_bytes), using the kernel receive timestamp when
+        available, or None if the socket timed out
+    """
+    try:
+        data, ancdata, _, _ = sock.recvmsg(MAX_FRAME_SIZE, socket.CMSG_SPACE(_TIMESPEC.size))
+    except socket.timeout:
+        return None
+
+    timestamp = None
+    for level, kind, value in ancdata:
+        if level == socket.SOL_SOCKET and kind == SO_TIMESTAMPNS and len(value) >= _TIMESPEC.size:
+            seconds, nanoseconds = _TIMESPEC.unpack_from(value)
+            timestamp = seconds + nanoseconds / 1e9
+    if timestamp is None:
+        timestamp = time.time()
+    return timestamp, data
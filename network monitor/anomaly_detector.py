@@ -2,74 +2,105 @@
 This script handles anomaly detector that performs numerical operations.
 """
 
+import copy
 import numpy as np
 from feature_extractor import FeatureExtractor
 from models.deep_packet_analyzer import DeepPacketAnalyzer
+from models.model_registry import select_model_type, shared_registry
+from models.training_worker import TrainingWorker
 
-# Check what ML libraries are available
-DEEP_LEARNING_AVAILABLE = False
-try:
-    import torch
-    DEEP_LEARNING_AVAILABLE = True
-except ImportError:
-    pass
-
-NEURAL_NETWORK_AVAILABLE = False
-try:
-    from sklearn.neural_network import MLPClassifier
-    NEURAL_NETWORK_AVAILABLE = True
-except ImportError:
-    pass
+# Registry name of the deep packet analyzer
+DEEP_ANALYZER = 'deep_packet_analyzer'
 
 class AnomalyDetector:
     """A class for detecting network traffic anomalies using machine learning."""
     
-    def __init__(self, logger):
+    def __init__(self, logger, background_training=True, model_type='auto', registry=None):
         """
         Initialize the AnomalyDetector with a logger.
         
         Args:
             logger: Logger object for recording detection events and errors
+            background_training: Train the deep analyzer in a separate process
+                and swap in each trained model between batches, instead of
+                training inline
+            model_type: Deep analyzer model type, or 'auto' for the most
+                sophisticated one available
+            registry: ModelRegistry holding the deep analyzer; defaults to the
+                registry shared by the whole process
         """
         self.logger = logger
         self.feature_extractor = FeatureExtractor()
-        # Select the most sophisticated model available
-        if DEEP_LEARNING_AVAILABLE:
-            model_type = 'deep_nn'
-            self.logger.info("AnomalyDetector: Using Deep Neural Network model (most sophisticated)")
-        elif NEURAL_NETWORK_AVAILABLE:
-            model_type = 'neural_network'
-            self.logger.info("AnomalyDetector: Using Neural Network model")
-        else:
-            model_type = 'random_forest'
-            self.logger.info("AnomalyDetector: Using Random Forest model")
-            
-        # Initialize the deep packet analyzer
-        self.deep_analyzer = DeepPacketAnalyzer(model_type=model_type)
+        self.registry = registry if registry is not None else shared_registry
+        # Select the most sophisticated model available; no ML framework is imported until training
+        model_type, description = select_model_type(model_type)
+        self.logger.info(f"AnomalyDetector: Using {description}")
+
+        # The deep packet analyzer is built once per process and shared through the registry
+        self.deep_analyzer = self.registry.get(DEEP_ANALYZER, lambda: DeepPacketAnalyzer(model_type=model_type))
+        self.training_worker = TrainingWorker(model_type, logger) if background_training else None
 
-    def analyze_traffic(self, raw_packets, persistent_detector):
+    def swap_trained_model(self):
+        """
+        Replace the deep analyzer with the latest one trained in the background, if any.
+
+        Returns:
+            bool: True if a new model was swapped in
+        """
+        if self.training_worker is None:
+            return False
+        try:
+            trained = self.training_worker.poll()
+        except Exception as e:
+            self.logger.error(f"Error collecting trained model: {e}")
+            return False
+        if trained is None:
+            return False
+        self._publish(trained)
+        self.logger.info("Swapped in the newly trained deep analyzer")
+        return True
+
+    def _publish(self, trained):
+        """Make a trained deep analyzer the one used for detection."""
+        # A single reference assignment: a batch uses either the old or the new model
+        self.deep_analyzer = trained
+        self.registry.set(DEEP_ANALYZER, trained)
+
+    def close(self):
+        """Stop background training."""
+        if self.training_worker is not None:
+            self.training_worker.close()
+
+    def analyze_traffic(self, raw_packets, persistent_detector, features=None):
         """
         Analyze network traffic for anomalies using machine learning.
         
         Args:
-            raw_packets: List of network packets to analyze
+            raw_packets: List of DecodedPacket records (or raw packets, decoded here)
             persistent_detector: Object containing the trained ML model
+            features: Optional feature matrix already extracted for these records
             
         Returns:
             tuple: (anomalies, anomaly_details) where anomalies is a boolean array
                   and anomaly_details is a list of strings describing the anomalies
         """
         try:
-            # Extract features from packets using the feature extractor
-            features = self.feature_extractor.extract_features(raw_packets)
-            if features is None or (hasattr(features, 'empty') and features.empty):
+            # Between batches, pick up a model trained in the background
+            self.swap_trained_model()
+            deep_analyzer = self.deep_analyzer
+
+            # Decode once and share the records with the feature extractor
+            records = self.feature_extractor.decoder.decode_batch(raw_packets)
+            if features is None:
+                features = self.feature_extractor.extract_matrix(records)
+            if len(features) == 0:
                 return [], []
 
             # Try to use the deep analyzer if it's fitted
-            if hasattr(self.deep_analyzer, 'is_fitted') and self.deep_analyzer.is_fitted:
+            if hasattr(deep_analyzer, 'is_fitted') and deep_analyzer.is_fitted:
                 try:
                     # Use the deep analyzer for predictions
-                    anomaly_probs = self.deep_analyzer.predict_proba(features)
+                    anomaly_probs = deep_analyzer.predict_proba(features)
                     # Use a lower threshold for deep learning model
                     threshold = 0.8
                     anomalies = anomaly_probs[:, 1] > threshold
@@ -85,7 +116,7 @@ class AnomalyDetector:
             # Generate detailed descriptions for each anomalous packet
             try:
                 anomaly_details = self._generate_anomaly_details(
-                    raw_packets, anomalies, anomaly_scores
+                    records, anomalies, anomaly_scores
                 )
             except Exception as e:
                 self.logger.error(f"Error generating anomaly details: {e}")
@@ -95,7 +126,7 @@ class AnomalyDetector:
             anomaly_count = np.sum(anomalies)
             self.logger.info(
                 f"ML model detected {anomaly_count} anomalies "
-                f"out of {len(raw_packets)} packets"
+                f"out of {len(records)} packets"
             )
 
             return anomalies, anomaly_details
@@ -107,7 +138,7 @@ class AnomalyDetector:
 
     def _traditional_analysis(self, features, persistent_detector):
         """
-        Traditional anomaly analysis using the isolation forest model.
+        Traditional anomaly analysis using the streaming anomaly model.
         
         Args:
             features: Extracted features from packets
@@ -142,23 +173,35 @@ class AnomalyDetector:
     def train_deep_analyzer(self, features, labels):
         """
         Train the deep analyzer with labeled data.
+
+        With background training this only hands a snapshot to the training
+        process; the trained model is swapped in by a later analyze_traffic call.
+        Otherwise a copy of the analyzer is trained here and then published,
+        so detection on another thread never sees a model halfway through fit.
         
         Args:
             features: Feature data for training
             labels: Labels for the data (0 for normal, 1 for anomaly)
         """
         try:
-            self.deep_analyzer.fit(features, labels)
+            if self.training_worker is not None:
+                self.training_worker.submit(np.asarray(features), np.asarray(labels))
+                return
+            trained = copy.deepcopy(self.deep_analyzer)
+            trained.fit(features, labels)
+            if not trained.is_fitted:
+                raise RuntimeError("training did not produce a fitted model")
+            self._publish(trained)
             self.logger.info("Deep analyzer trained successfully")
         except Exception as e:
             self.logger.error(f"Error training deep analyzer: {e}")
 
-    def _generate_anomaly_details(self, raw_packets, anomalies, scores):
+    def _generate_anomaly_details(self, records, anomalies, scores):
         """
         Generate detailed information about detected anomalies.
         
         Args:
-            raw_packets: List of original network packets
+            records: List of DecodedPacket records
             anomalies: Boolean array indicating which packets are anomalous
             scores: Array of anomaly scores for each packet
             
@@ -166,48 +209,21 @@ class AnomalyDetector:
             list: Detailed descriptions of each anomalous packet
         """
         anomaly_details = []
+        packet_types = {0x0800: "IPv4", 0x86DD: "IPv6", 0x0806: "ARP"}
         
         # Iterate through all packets and generate details for anomalous ones
-        for i, (is_anomaly, score, packet) in enumerate(zip(anomalies, scores, raw_packets)):
+        for i, (is_anomaly, score, record) in enumerate(zip(anomalies, scores, records)):
             if is_anomaly:
                 try:
-                    # Handle packets that come as tuples (sometimes from packet capture)
-                    if isinstance(packet, tuple):
-                        packet = packet[1]
-                    
-                    # Extract basic packet information
-                    try:
-                        packet_summary = packet.summary()
-                    except:
-                        packet_summary = "Unknown packet"
-                        
-                    packet_type = "Unknown"
-                    
-                    try:
-                        protocol = packet.lastlayer().name
-                    except:
-                        protocol = "Unknown"
-
-                    # Determine packet type based on its type attribute
-                    try:
-                        if hasattr(packet, 'type'):
-                            if packet.type == 0x0800:
-                                packet_type = "IPv4"
-                            elif packet.type == 0x86DD:
-                                packet_type = "IPv6"
-                            elif packet.type == 0x0806:
-                                packet_type = "ARP"
-                    except:
-                        pass
-
                     # Format the anomaly details string
                     detail = (
-                        f"Anomaly at packet {i}: {packet_summary} | "
-                        f"Type: {packet_type} | Protocol: {protocol} | "
+                        f"Anomaly at packet {i}: {record.summary()} | "
+                        f"Type: {packet_types.get(record.ethertype, 'Unknown')} | "
+                        f"Protocol: {record.top_layer} | "
                         f"Score: {score:.2f}"
                     )
                     anomaly_details.append(detail)
                 except Exception as e:
                     self.logger.debug(f"Error processing anomaly details for packet {i}: {e}")
 
-        return anomaly_details
\ No newline at end of file
+        return anomaly_details
@@ -0,0 +1,153 @@
+"""
+This script benchmarks deep analyzer inference latency across batch sizes: the NumPy inference engine against the framework paths.
+"""
+
+import argparse
+import importlib.util
+import os
+import sys
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from models.mlp_inference import MlpInferenceEngine
+
+
+def synthetic_network(rng, sizes):
+    """He-initialized weights and small biases for layer sizes like [19, 128, 64, 32, 2]."""
+    weights = [rng.standard_normal((inputs, outputs)) * np.sqrt(2.0 / inputs)
+               for inputs, outputs in zip(sizes, sizes[1:])]
+    biases = [rng.standard_normal(outputs) * 0.1 for outputs in sizes[1:]]
+    return weights, biases
+
+
+def unfused_forward(X, mean, scale, weights, biases):
+    """Plain NumPy forward pass: separate scaling and a new array for every step."""
+    hidden = (X - mean) / scale
+    for index, (weight, bias) in enumerate(zip(weights, biases)):
+        hidden = hidden @ weight + bias
+        if index < len(weights) - 1:
+            hidden = np.maximum(hidden, 0)
+    hidden = np.exp(hidden - hidden.max(axis=1, keepdims=True))
+    return hidden / hidden.sum(axis=1, keepdims=True)
+
+
+def torch_path(weights, biases, mean, scale):
+    """The DeepNeuralNetwork.predict_proba path: a new tensor, eval() and a copy back per batch."""
+    import torch
+    import torch.nn as nn
+
+    layers = []
+    for index, (weight, bias) in enumerate(zip(weights, biases)):
+        linear = nn.Linear(*weight.shape)
+        with torch.no_grad():
+            linear.weight.copy_(torch.from_numpy(weight.T))
+            linear.bias.copy_(torch.from_numpy(bias))
+        layers.append(linear)
+        if index < len(weights) - 1:
+            layers += [nn.ReLU(), nn.Dropout(0.2)]
+    model = nn.Sequential(*layers)
+
+    def predict_proba(X):
+        model.eval()
+        with torch.no_grad():
+            outputs = model(torch.FloatTensor((X - mean) / scale))
+            return torch.softmax(outputs, dim=1).cpu().numpy()
+    return model, predict_proba
+
+
+def sklearn_path(rng, sizes):
+    """A scikit-learn MLPClassifier of the same shape, as DeepPacketAnalyzer uses without PyTorch."""
+    from sklearn.neural_network import MLPClassifier
+    from sklearn.preprocessing import StandardScaler
+
+    X = rng.lognormal(3, 2, (2000, sizes[0])).astype(np.float32)
+    y = (X[:, 0] > np.median(X[:, 0])).astype(np.int64)
+    scaler = StandardScaler().fit(X)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        model = MLPClassifier(hidden_layer_sizes=tuple(sizes[1:-1]), max_iter=20, random_state=0)
+        model.fit(scaler.transform(X), y)
+    return model, scaler, lambda batch: model.predict_proba(scaler.transform(batch))
+
+
+def time_batches(predict, batch, repeats):
+    """Latency of each call, in microseconds."""
+    predict(batch)
+    times = np.empty(repeats)
+    for index in range(repeats):
+        start = time.perf_counter()
+        predict(batch)
+        times[index] = time.perf_counter() - start
+    return times * 1e6
+
+
+def main():
+    """Time every inference path at each batch size, after checking that they agree."""
+    parser = argparse.ArgumentParser(description='Deep analyzer inference latency benchmark')
+    parser.add_argument('--batch-sizes', type=str, default='1,10,100,1000,10000',
+                        help='Comma-separated batch sizes')
+    parser.add_argument('--layers', type=str, default='19,128,64,32,2',
+                        help='Comma-separated layer sizes, input first')
+    parser.add_argument('--samples', type=int, default=200000,
+                        help='Rows timed per batch size and path; sets the number of repeats')
+    parser.add_argument('--threads', type=int, default=None,
+                        help='BLAS threads for the engine; tuned on the largest batch if not given')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    sizes = [int(size) for size in args.layers.split(',')]
+    batch_sizes = [int(size) for size in args.batch_sizes.split(',')]
+    weights, biases = synthetic_network(rng, sizes)
+    mean = rng.uniform(0, 1000, sizes[0])
+    scale = rng.uniform(1, 500, sizes[0])
+
+    engine = MlpInferenceEngine(weights, biases, mean=mean, scale=scale, threads=args.threads)
+    if args.threads is None:
+        threads = engine.tune_threads(max(batch_sizes))
+        print(f"Tuned engine threads: {threads or 'pool default'} of {os.cpu_count()} CPUs")
+
+    paths = [
+        ("NumPy engine", engine.predict_proba),
+        ("NumPy unfused", lambda X: unfused_forward(X, mean, scale, weights, biases)),
+    ]
+    check = rng.uniform(0, 2000, (256, sizes[0])).astype(np.float32)
+    reference = unfused_forward(check.astype(np.float64), mean, scale, weights, biases)
+    print(f"Engine vs float64 reference: max probability difference "
+          f"{np.abs(engine.predict_proba(check) - reference).max():.2e}")
+
+    if importlib.util.find_spec('torch') is not None:
+        model, predict_proba = torch_path(weights, biases, mean, scale)
+        paths.append(("PyTorch per batch", predict_proba))
+        exported = MlpInferenceEngine.from_model(model, threads=engine.threads)
+        scaled = ((check - mean) / scale).astype(np.float32)
+        print(f"Engine exported from PyTorch vs PyTorch: max probability difference "
+              f"{np.abs(exported.predict_proba(scaled) - predict_proba(check)).max():.2e}")
+    else:
+        print("PyTorch not installed; skipping the PyTorch path")
+
+    if importlib.util.find_spec('sklearn') is not None:
+        model, scaler, predict_proba = sklearn_path(rng, sizes)
+        exported = MlpInferenceEngine.from_model(model, scaler, threads=engine.threads)
+        paths.append(("scikit-learn MLP", predict_proba))
+        paths.append(("NumPy engine (MLP)", exported.predict_proba))
+        print(f"Engine exported from scikit-learn vs scikit-learn: max probability difference "
+              f"{np.abs(exported.predict_proba(check) - predict_proba(check)).max():.2e}")
+
+    print(f"Latency per batch ({'-'.join(map(str, sizes))} network):")
+    print(f"  {'batch':>6}  {'path':<20} {'mean us':>10} {'p99 us':>10} {'us/sample':>10}")
+    for batch_size in batch_sizes:
+        batch = rng.uniform(0, 2000, (batch_size, sizes[0])).astype(np.float32)
+        repeats = max(20, args.samples // batch_size)
+        for label, predict in paths:
+            times = time_batches(predict, batch, min(repeats, 20000))
+            print(f"  {batch_size:>6}  {label:<20} {times.mean():10.1f} {np.percentile(times, 99):10.1f} "
+                  f"{times.mean() / batch_size:10.3f}")
+
+
+if __name__ == "__main__":
+    main()
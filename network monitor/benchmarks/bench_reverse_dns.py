@@ -0,0 +1,85 @@
+"""
+This script checks that reverse DNS enrichment never blocks alert logging, using a local stub resolver.
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.network_utils import ReverseDnsResolver
+
+
+class StubResolver:
+    """Answers PTR lookups after a fixed delay; some addresses have no name and some hang."""
+
+    def __init__(self, delay, fail_rate, hang_rate, hang_time, seed=42):
+        """Decide up front which addresses fail or hang."""
+        self.delay = delay
+        self.fail_rate = fail_rate
+        self.hang_rate = hang_rate
+        self.hang_time = hang_time
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.queries = {}
+
+    def __call__(self, ip):
+        """Resolve one address."""
+        with self.lock:
+            self.queries[ip] = self.queries.get(ip, 0) + 1
+            roll = self.rng.random()
+        if roll < self.hang_rate:
+            time.sleep(self.hang_time)
+            return None
+        time.sleep(self.delay)
+        if roll < self.hang_rate + self.fail_rate:
+            return None
+        return "host-" + ip.replace('.', '-') + ".example.net"
+
+
+def main():
+    """Log alerts for a skewed stream of IPs and report logging latency and resolver counters."""
+    parser = argparse.ArgumentParser(description='Reverse DNS enrichment latency test')
+    parser.add_argument('--alerts', type=int, default=20000, help='Alerts to log')
+    parser.add_argument('--addresses', type=int, default=500, help='Distinct alerting IPs')
+    parser.add_argument('--delay', type=float, default=0.02, help='Stub lookup time in seconds')
+    parser.add_argument('--fail-rate', type=float, default=0.3, help='Share of addresses without a PTR record')
+    parser.add_argument('--hang-rate', type=float, default=0.02, help='Share of lookups that hang')
+    parser.add_argument('--hang-time', type=float, default=2.0, help='Seconds a hanging lookup takes')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    addresses = [f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}" for i in range(args.addresses)]
+    stub = StubResolver(args.delay, args.fail_rate, args.hang_rate, args.hang_time, args.seed)
+    resolver = ReverseDnsResolver(stub)
+    followups = []
+
+    worst = 0.0
+    with_hostname = 0
+    start = time.perf_counter()
+    for _ in range(args.alerts):
+        # A few addresses raise most alerts
+        ip = addresses[min(int(rng.paretovariate(1.2)) - 1, len(addresses) - 1)]
+        began = time.perf_counter()
+        line = resolver.format(ip, lambda ip, hostname: followups.append(ip))
+        worst = max(worst, time.perf_counter() - began)
+        with_hostname += line != ip
+        time.sleep(0.0001)
+    elapsed = time.perf_counter() - start
+    resolver.wait(args.hang_time * 2)
+    resolver.close()
+
+    repeated = sum(count - 1 for count in stub.queries.values())
+    print(f"{args.alerts} alerts in {elapsed:.2f} s, slowest log call {worst * 1e6:.0f} us")
+    print(f"{with_hostname} alerts logged with a hostname, {len(followups)} follow-up hostname lines")
+    print(f"{len(stub.queries)} addresses queried, {repeated} repeated queries")
+    print(f"Resolver: {resolver.stats}")
+
+
+if __name__ == "__main__":
+    main()
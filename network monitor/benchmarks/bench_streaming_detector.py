@@ -0,0 +1,102 @@
+"""
+This script benchmarks the streaming Half-Space Trees detector against refitting an IsolationForest on every batch.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from sklearn.ensemble import IsolationForest
+from sklearn.metrics import roc_auc_score
+
+from models.half_space_trees import HalfSpaceTrees
+
+
+def make_profiles(rng, count, features):
+    """Random traffic profiles: a center and spread per feature, in log space."""
+    centers = rng.uniform(0, 10, (count, features))
+    spreads = rng.uniform(0.05, 0.3, (count, features))
+    return centers, spreads
+
+
+def sample(rng, profiles, active, size):
+    """Draw size samples from the active profiles."""
+    centers, spreads = profiles
+    chosen = rng.choice(active, size)
+    return np.expm1(rng.normal(centers[chosen], spreads[chosen])).clip(0)
+
+
+def anomalies(rng, profiles, size):
+    """Samples of known profiles with a few features pushed far out."""
+    centers, spreads = profiles
+    chosen = rng.integers(0, len(centers), size)
+    values = rng.normal(centers[chosen], spreads[chosen])
+    for row in range(size):
+        columns = rng.choice(values.shape[1], 3, replace=False)
+        values[row, columns] += rng.choice([-1, 1], 3) * rng.uniform(2, 4, 3)
+    return np.expm1(values).clip(0)
+
+
+def main():
+    """Stream batches through both approaches, then compare latency, throughput and detection quality."""
+    parser = argparse.ArgumentParser(description='Streaming anomaly model benchmark')
+    parser.add_argument('--batches', type=int, default=200, help='Update batches in the stream')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Samples per update batch')
+    parser.add_argument('--features', type=int, default=19, help='Features per sample')
+    parser.add_argument('--profiles', type=int, default=8, help='Traffic profiles; each batch holds only a few')
+    parser.add_argument('--score-size', type=int, default=100000, help='Samples scored for the throughput test')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    profiles = make_profiles(rng, args.profiles, args.features)
+    stream = []
+    for _ in range(args.batches):
+        # Each batch sees only some of the traffic profiles, as traffic mixes shift over a day
+        active = rng.choice(args.profiles, max(1, args.profiles // 3), replace=False)
+        stream.append(sample(rng, profiles, active, args.batch_size))
+
+    streaming = HalfSpaceTrees()
+    refit = None
+    stream_times, refit_times = [], []
+    for batch in stream:
+        start = time.perf_counter()
+        streaming.partial_fit(batch)
+        stream_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        refit = IsolationForest(contamination=0.01, random_state=42).fit(batch)
+        refit_times.append(time.perf_counter() - start)
+
+    print(f"Update latency per {args.batch_size}-sample batch over {args.batches} batches:")
+    for label, times in [("IsolationForest refit", refit_times), ("Half-Space Trees", stream_times)]:
+        times = np.array(times) * 1000
+        print(f"  {label:<22} mean {times.mean():8.2f} ms  p99 {np.percentile(times, 99):8.2f} ms  "
+              f"{times.mean() * 1000 / args.batch_size:7.2f} us/sample")
+
+    scored = sample(rng, profiles, np.arange(args.profiles), args.score_size)
+    print(f"Scoring throughput on {args.score_size} samples:")
+    for label, model in [("IsolationForest refit", refit), ("Half-Space Trees", streaming)]:
+        start = time.perf_counter()
+        model.score_samples(scored)
+        elapsed = time.perf_counter() - start
+        print(f"  {label:<22} {args.score_size / elapsed / 1000:8.1f} k samples/s")
+
+    # Normal traffic from every profile, including ones missing from the last batch
+    normal = sample(rng, profiles, np.arange(args.profiles), 5000)
+    abnormal = anomalies(rng, profiles, 250)
+    labels = np.r_[np.zeros(len(normal)), np.ones(len(abnormal))]
+    print("Detection on normal traffic from all profiles plus injected anomalies:")
+    for label, model in [("IsolationForest refit", refit), ("Half-Space Trees", streaming)]:
+        scores = -np.r_[model.score_samples(normal), model.score_samples(abnormal)]
+        flagged = np.r_[model.predict(normal), model.predict(abnormal)] == -1
+        print(f"  {label:<22} ROC AUC {roc_auc_score(labels, scores):.3f}  "
+              f"false positive rate {flagged[:len(normal)].mean():.3f}  "
+              f"detection rate {flagged[len(normal):].mean():.3f}")
+
+
+if __name__ == "__main__":
+    main()
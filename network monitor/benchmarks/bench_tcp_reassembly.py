@@ -0,0 +1,210 @@
+"""
+This script fuzzes and benchmarks TCP stream reassembly with incremental threat scanning on synthetic pcaps.
+"""
+
+import argparse
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scapy.all import Ether, IP, TCP, Raw, wrpcap
+
+from bench_threat_scanner import ATTACKS, WORDS
+from packet_decoder import PacketDecoder
+from pcap_reader import PcapReader
+from tcp_reassembly import TcpReassembler, SEQ_MODULO
+from threat_scanner import ThreatScanner
+
+
+def build_stream(rng, size):
+    """Build one stream of text with an attack string planted at a random position."""
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(WORDS) + '=' + str(rng.randint(0, 99999))
+        words.append(word)
+        length += len(word) + 1
+    words.insert(rng.randint(0, len(words)), rng.choice(ATTACKS))
+    return ('&'.join(words) + ' ').encode('utf-8')
+
+
+def segment_stream(rng, data, isn, max_segment, fuzz):
+    """
+    Cut a stream into (seq, bytes) segments.
+
+    With fuzz, segments are reordered within a small window, some are sent
+    twice, and some are retransmitted with extra bytes that overlap the
+    previous segment.
+    """
+    segments = []
+    offset = 0
+    while offset < len(data):
+        size = rng.randint(1, max_segment)
+        segments.append((offset, data[offset:offset + size]))
+        offset += size
+    if fuzz:
+        fuzzed = []
+        for offset, chunk in segments:
+            if offset and rng.random() < 0.1:
+                back = rng.randint(1, min(offset, 40))
+                fuzzed.append((offset - back, data[offset - back:offset + len(chunk)]))
+            else:
+                fuzzed.append((offset, chunk))
+            if rng.random() < 0.05:
+                fuzzed.append((offset, chunk))
+        for i in range(len(fuzzed) - 1):
+            if rng.random() < 0.2:
+                j = min(len(fuzzed) - 1, i + rng.randint(1, 4))
+                fuzzed[i], fuzzed[j] = fuzzed[j], fuzzed[i]
+        segments = fuzzed
+    return [((isn + 1 + offset) % SEQ_MODULO, chunk) for offset, chunk in segments]
+
+
+def build_pcap(path, streams, max_segment, fuzz, seed=42):
+    """Write the streams as interleaved TCP connections to a pcap file."""
+    rng = random.Random(seed)
+    eth = dict(src="02:00:00:00:00:01", dst="02:00:00:00:00:02")
+    connections = []
+    for index, data in enumerate(streams):
+        # Start some streams just below the sequence number wraparound
+        isn = rng.choice([rng.randrange(SEQ_MODULO), SEQ_MODULO - rng.randint(1, 2000)])
+        header = Ether(**eth) / IP(src=f"10.0.{index // 250}.{index % 250 + 1}", dst="192.168.1.10")
+        sport = 20000 + index
+        packets = [header / TCP(sport=sport, dport=8080, flags="S", seq=isn)]
+        for seq, chunk in segment_stream(rng, data, isn, max_segment, fuzz):
+            packets.append(header / TCP(sport=sport, dport=8080, flags="PA", seq=seq) / Raw(chunk))
+        packets.append(header / TCP(sport=sport, dport=8080, flags="FA",
+                                    seq=(isn + 1 + len(data)) % SEQ_MODULO))
+        connections.append(packets)
+
+    # Interleave the connections, keeping each one's SYN first and FIN last
+    frames = []
+    while connections:
+        packets = rng.choice(connections)
+        frames.append(packets.pop(0))
+        if not packets:
+            connections.remove(packets)
+    for i, packet in enumerate(frames):
+        packet.time = 1700000000 + i * 0.0001
+    wrpcap(path, frames)
+
+
+def load_records(path):
+    """Read and decode every frame of a pcap file."""
+    with PcapReader(path) as reader:
+        frames = [(timestamp, bytes(frame)) for timestamp, _, frame in reader]
+    return PacketDecoder(logging.getLogger(__name__)).decode_batch(frames)
+
+
+def reassemble_and_scan(records, scanner, reassembler):
+    """Reassemble every stream and scan it incrementally; returns the stream data and matches per stream."""
+    data = {}
+    found = {}
+    for record in records:
+        chunk = reassembler.add(record)
+        if chunk is None:
+            continue
+        key = reassembler.stream_key(record)
+        data.setdefault(key, []).append(chunk.data[chunk.new_start:])
+        matches = found.setdefault(key, set())
+        for match in scanner.scan(chunk.data):
+            if match.end > chunk.new_start:
+                matches.add((match.pattern_id, match.start + chunk.offset))
+    return {key: b''.join(parts) for key, parts in data.items()}, found
+
+
+def fuzz(args, scanner, workdir):
+    """Check reassembled streams and incremental matches against the original streams."""
+    rng = random.Random(args.seed)
+    streams = [build_stream(rng, rng.randint(200, args.stream_size)) for _ in range(args.fuzz_streams)]
+    path = os.path.join(workdir, 'fuzz.pcap')
+    build_pcap(path, streams, args.fuzz_max_segment, fuzz=True, seed=args.seed)
+    records = load_records(path)
+
+    data, found = reassemble_and_scan(records, scanner, TcpReassembler(overlap=args.overlap))
+    failures = 0
+    for index, stream in enumerate(streams):
+        key = (f"10.0.{index // 250}.{index % 250 + 1}", 20000 + index, "192.168.1.10", 8080)
+        expected = {(match.pattern_id, match.start) for match in scanner.scan(stream)}
+        if data.get(key) != stream:
+            print(f"Stream {index}: reassembled data differs from the original")
+            failures += 1
+        elif found.get(key, set()) != expected:
+            print(f"Stream {index}: matches {sorted(found.get(key, set()))} != {sorted(expected)}")
+            failures += 1
+    print(f"Fuzz: {len(streams)} streams, {len(records)} packets, {failures} failures")
+    return failures == 0
+
+
+def throughput(args, scanner, workdir):
+    """Compare per-segment scanning, full-buffer rescanning and incremental scanning."""
+    rng = random.Random(args.seed + 1)
+    streams = [build_stream(rng, args.stream_size) for _ in range(args.streams)]
+    path = os.path.join(workdir, 'throughput.pcap')
+    build_pcap(path, streams, args.max_segment, fuzz=False, seed=args.seed)
+    records = load_records(path)
+    total = sum(map(len, streams))
+    expected = sum(len({(m.pattern_id, m.start) for m in scanner.scan(stream)}) for stream in streams)
+
+    def per_segment():
+        found = 0
+        for record in records:
+            if record.payload_length:
+                found += len(scanner.scan(record.payload))
+        return found
+
+    def rescan_buffer():
+        buffers = {}
+        found = {}
+        for record in records:
+            if record.payload_length:
+                key = TcpReassembler.stream_key(record)
+                buffers[key] = buffers.get(key, b'') + record.payload
+                found[key] = {(m.pattern_id, m.start) for m in scanner.scan(buffers[key])}
+        return sum(map(len, found.values()))
+
+    def incremental():
+        _, found = reassemble_and_scan(records, scanner, TcpReassembler(overlap=args.overlap))
+        return sum(map(len, found.values()))
+
+    print(f"Throughput: {len(streams)} streams of {args.stream_size} bytes, "
+          f"segments up to {args.max_segment} bytes, {expected} matches in the streams")
+    for label, func in [("per-segment scan (no reassembly)", per_segment),
+                        ("reassembly + full buffer rescan", rescan_buffer),
+                        ("reassembly + incremental scan", incremental)]:
+        best = float('inf')
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            found = func()
+            best = min(best, time.perf_counter() - start)
+        print(f"{label:<36} {best * 1000:9.1f} ms  {total / best / 1e6:8.2f} MB/s  {found} matches")
+
+
+def main():
+    """Run the fuzz check, then the throughput benchmark."""
+    parser = argparse.ArgumentParser(description='TCP reassembly fuzz and throughput test')
+    parser.add_argument('--fuzz-streams', type=int, default=300, help='Streams in the fuzzed pcap')
+    parser.add_argument('--streams', type=int, default=200, help='Streams in the throughput pcap')
+    parser.add_argument('--stream-size', type=int, default=8000, help='Bytes per stream')
+    parser.add_argument('--fuzz-max-segment', type=int, default=200, help='Largest TCP segment payload when fuzzing')
+    parser.add_argument('--max-segment', type=int, default=1460, help='Largest TCP segment payload when timing')
+    parser.add_argument('--overlap', type=int, default=256, help='Reassembler overlap window')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of timed runs (best is reported)')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed')
+    args = parser.parse_args()
+
+    scanner = ThreatScanner()
+    with tempfile.TemporaryDirectory() as workdir:
+        ok = fuzz(args, scanner, workdir)
+        throughput(args, scanner, workdir)
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+This script benchmarks the single-pass byte-level threat scanner against trial decoding and the per-pattern regex loop.
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from threat_scanner import ThreatScanner, AHOCORASICK_AVAILABLE, decode_context
+
+PATHS = ['/', '/index.html', '/api/v1/users', '/static/js/app.min.js', '/search', '/login',
+         '/images/logo.png', '/cart/checkout', '/wp-admin/admin-ajax.php', '/feed.xml']
+AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36',
+    'Mozilla/5.0 (X11; Linux x86_64; rv:121.0) Gecko/20100101 Firefox/121.0',
+    'curl/8.4.0',
+    'python-requests/2.31.0',
+]
+ATTACKS = [
+    "id=1 UNION SELECT password FROM users",
+    "q=<script>document.cookie</script>",
+    "file=../../etc/passwd",
+    "cmd=test; cat /etc/shadow ",
+    "data=eval(base64_decode($x))",
+    "username=admin&password=hunter2",
+    "card=4111111111111111",
+    "contact=alice@example.com",
+    "סיסמה=12345",
+    "משתמש=דני; הרץ ",
+    "DROP TABLE sessions",
+]
+WORDS = ['alpha', 'beta', 'gamma', 'delta', 'value', 'token', 'session', 'locale', 'page', 'size']
+
+
+def build_corpus(count, attack_rate, seed=42):
+    """
+    Build HTTP request and response payloads, a fraction of them carrying an attack string.
+
+    Payloads are UTF-8 encoded, except one in ten which is encoded as Hebrew cp1255.
+    """
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(count):
+        query = '&'.join(f"{rng.choice(WORDS)}={rng.randint(0, 99999)}" for _ in range(rng.randint(0, 5)))
+        if rng.random() < attack_rate:
+            query = (query + '&' if query else '') + rng.choice(ATTACKS)
+        if rng.random() < 0.7:
+            method = rng.choice(['GET', 'GET', 'GET', 'POST'])
+            body = ''
+            if method == 'POST':
+                body = '{' + ', '.join(f'"{rng.choice(WORDS)}": "{rng.randint(0, 10**6)}"' for _ in range(8)) + '}'
+            payload = (
+                f"{method} {rng.choice(PATHS)}?{query} HTTP/1.1\r\n"
+                f"Host: www.example.com\r\n"
+                f"User-Agent: {rng.choice(AGENTS)}\r\n"
+                f"Accept: text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8\r\n"
+                f"Accept-Language: en-US,en;q=0.5\r\n"
+                f"Cookie: session={rng.getrandbits(128):032x}; theme=dark\r\n"
+                f"Connection: keep-alive\r\n\r\n{body}"
+            )
+        else:
+            text = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(50, 300)))
+            payload = (
+                "HTTP/1.1 200 OK\r\nContent-Type: text/html; charset=utf-8\r\n"
+                f"Cache-Control: max-age=3600\r\n\r\n<html><body><p>{text} {query}</p></body></html>"
+            )
+        corpus.append(payload.encode('cp1255' if rng.random() < 0.1 else 'utf-8'))
+    return corpus
+
+
+LEGACY_ENCODINGS = ['utf-8', 'cp1255', 'iso-8859-8', 'hebrew', 'windows-1255', 'ascii']
+
+
+def legacy_scan(threat_patterns, payload):
+    """The previous path: trial-decode the payload, then one re.search and re.finditer per pattern."""
+    for encoding in LEGACY_ENCODINGS:
+        try:
+            text = payload.decode(encoding)
+            break
+        except UnicodeDecodeError:
+            continue
+    else:
+        return []
+    detected = []
+    for pattern_id, pattern in enumerate(threat_patterns):
+        if re.search(pattern, text):
+            for match in re.finditer(pattern, text):
+                detected.append((pattern_id, match.group()))
+    return detected
+
+
+def bench(label, func, corpus, repeat):
+    """Time func over the corpus and print payloads per second."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for payload in corpus:
+            func(payload)
+        best = min(best, time.perf_counter() - start)
+    rate = len(corpus) / best
+    print(f"{label:<40} {best * 1000:10.1f} ms  {rate:12,.0f} payloads/s")
+    return rate
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description='Threat scanner benchmark')
+    parser.add_argument('--payloads', type=int, default=5000, help='Number of HTTP payloads')
+    parser.add_argument('--attack-rate', type=float, default=0.05, help='Fraction of payloads carrying an attack')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of timed runs (best is reported)')
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.payloads, args.attack_rate)
+    scanner = ThreatScanner()
+    threat_patterns = [pattern.regex for pattern in scanner.patterns]
+
+    # Both implementations must report the same matches
+    for payload in corpus:
+        new = [(match.pattern_id, decode_context(payload[match.start:match.end])[0])
+               for match in scanner.scan(payload)]
+        if new != legacy_scan(threat_patterns, payload):
+            print(f"Mismatch on payload: {payload[:200]!r}")
+            sys.exit(1)
+
+    prefilter = "Aho-Corasick" if AHOCORASICK_AVAILABLE else "str.find"
+    print(f"{len(corpus)} payloads, {sum(map(len, corpus)) / len(corpus):.0f} bytes average, "
+          f"{args.attack_rate:.0%} with attacks, {prefilter} prefilter")
+    legacy_rate = bench("trial decode + per-pattern regex loop",
+                        lambda payload: legacy_scan(threat_patterns, payload), corpus, args.repeat)
+    new_rate = bench("ThreatScanner.scan", scanner.scan, corpus, args.repeat)
+    bench("ThreatScanner.candidates (prefilter)", scanner.candidates, corpus, args.repeat)
+    print(f"Speedup: {new_rate / legacy_rate:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""
+This script handles compiling the static whitelist rules into a kernel BPF socket filter.
+"""
+
+import struct
+from whitelist_manager import PROTOCOL_NUMBERS_V4, PROTOCOL_NUMBERS_V6
+
+# Classic BPF opcodes (linux/filter.h)
+BPF_LDW_ABS = 0x20       # A = 32-bit word at packet offset k
+BPF_LDH_ABS = 0x28       # A = 16-bit half word at packet offset k
+BPF_LDB_ABS = 0x30       # A = byte at packet offset k
+BPF_LDH_IND = 0x48       # A = 16-bit half word at packet offset X + k
+BPF_LDXB_MSH = 0xb1      # X = 4 * (byte at packet offset k & 0x0f), the IPv4 header length
+BPF_AND_K = 0x54         # A &= k
+BPF_MOD_K = 0x94         # A %= k
+BPF_JA = 0x05            # Jump forward k instructions
+BPF_JEQ_K = 0x15
+BPF_JGT_K = 0x25
+BPF_JGE_K = 0x35
+BPF_JSET_K = 0x45
+BPF_RET_K = 0x06
+
+# Ancillary load of a random 32-bit number (SKF_AD_OFF + SKF_AD_RANDOM)
+SKF_AD_RANDOM = 0xfffff000 + 56
+
+# Offsets in an untagged Ethernet frame
+ETHERTYPE_OFFSET = 12
+IPV4_OFFSET = 14
+IPV6_OFFSET = 14
+ETH_P_IP = 0x0800
+ETH_P_IPV6 = 0x86DD
+IPPROTO_TCP = 6
+IPPROTO_UDP = 17
+
+# Bytes of an accepted packet passed to the socket
+SNAPLEN = 262144
+BPF_MAXINSNS = 4096
+
+_INSTRUCTION = struct.Struct('=HBBI')
+
+
+class _Assembler:
+    """Builds a BPF program with forward jumps to named labels."""
+
+    def __init__(self):
+        self.code = []
+        self.labels = {}
+
+    def emit(self, code, k=0, jt=0, jf=0):
+        """Append an instruction; jt and jf count instructions to skip."""
+        self.code.append([code, jt, jf, k])
+
+    def jump(self, label):
+        """Append an unconditional jump to a label."""
+        self.code.append([BPF_JA, 0, 0, label])
+
+    def jump_if_equal(self, value, label):
+        """Jump to a label if A == value."""
+        self.emit(BPF_JEQ_K, value, 0, 1)
+        self.jump(label)
+
+    def jump_if_in_range(self, start, end, label):
+        """Jump to a label if start <= A <= end."""
+        if start == end:
+            self.jump_if_equal(start, label)
+            return
+        self.emit(BPF_JGE_K, start, 0, 2)
+        self.emit(BPF_JGT_K, end, 1, 0)
+        self.jump(label)
+
+    def label(self, name):
+        """Mark the position of the next instruction."""
+        self.labels[name] = len(self.code)
+
+    def assemble(self):
+        """Resolve labels and return (code, jt, jf, k) tuples."""
+        program = []
+        for pc, (code, jt, jf, k) in enumerate(self.code):
+            if code == BPF_JA:
+                k = self.labels[k] - pc - 1
+            program.append((code, jt, jf, k))
+        if len(program) > BPF_MAXINSNS:
+            raise ValueError(f"BPF program has {len(program)} instructions, the kernel accepts {BPF_MAXINSNS}")
+        return program
+
+
+def _ipv6_words(value):
+    """Split a 128-bit integer into four 32-bit words, most significant first."""
+    return [(value >> shift) & 0xffffffff for shift in (96, 64, 32, 0)]
+
+
+def compile_whitelist_filter(ips, ports, protocols, sample_rate=0):
+    """
+    Compile whitelist rules into a classic BPF program for an AF_PACKET socket.
+
+    The program drops packets that match any rule, as WhitelistManager would
+    discard them, and accepts everything else. A packet matches if its
+    protocol is whitelisted, if either address is in a whitelisted network,
+    or, for TCP and UDP, if either port is in a whitelisted range. Frames the
+    program cannot parse (VLAN tags, IPv6 extension headers in front of the
+    transport header, later IPv4 fragments) are accepted and left to the
+    userspace checks.
+
+    Args:
+        ips: ip_network objects (IPv4 and IPv6)
+        ports: Inclusive (start, end) port ranges
+        protocols: Protocol names, as in WHITELISTED_PROTOCOLS
+        sample_rate: If N > 0, accept a random 1-in-N sample of whitelisted
+            packets instead of dropping all of them
+
+    Returns:
+        list: (code, jt, jf, k) instruction tuples
+    """
+    asm = _Assembler()
+    proto4 = sorted({PROTOCOL_NUMBERS_V4[name] for name in protocols if name in PROTOCOL_NUMBERS_V4})
+    proto6 = sorted({PROTOCOL_NUMBERS_V6[name] for name in protocols if name in PROTOCOL_NUMBERS_V6})
+    nets4 = [net for net in ips if net.version == 4]
+    nets6 = [net for net in ips if net.version == 6]
+    ports = sorted((max(start, 0), min(end, 65535)) for start, end in ports)
+
+    asm.emit(BPF_LDH_ABS, ETHERTYPE_OFFSET)
+    asm.emit(BPF_JEQ_K, ETH_P_IP, 0, 1)
+    asm.jump('ipv4')
+    asm.emit(BPF_JEQ_K, ETH_P_IPV6, 0, 1)
+    asm.jump('ipv6')
+    asm.jump('accept')
+
+    # IPv4: protocol, source and destination network, then ports
+    asm.label('ipv4')
+    if proto4:
+        asm.emit(BPF_LDB_ABS, IPV4_OFFSET + 9)
+        for proto in proto4:
+            asm.jump_if_equal(proto, 'match')
+    for offset in (IPV4_OFFSET + 12, IPV4_OFFSET + 16):
+        for net in nets4:
+            asm.emit(BPF_LDW_ABS, offset)
+            mask = int(net.netmask)
+            if mask != 0xffffffff:
+                asm.emit(BPF_AND_K, mask)
+            asm.jump_if_equal(int(net.network_address), 'match')
+    if ports:
+        asm.emit(BPF_LDB_ABS, IPV4_OFFSET + 9)
+        asm.emit(BPF_JEQ_K, IPPROTO_TCP, 2, 0)
+        asm.emit(BPF_JEQ_K, IPPROTO_UDP, 1, 0)
+        asm.jump('accept')
+        # Later fragments carry no transport header
+        asm.emit(BPF_LDH_ABS, IPV4_OFFSET + 6)
+        asm.emit(BPF_JSET_K, 0x1fff, 0, 1)
+        asm.jump('accept')
+        asm.emit(BPF_LDXB_MSH, IPV4_OFFSET)
+        for port_offset in (0, 2):
+            asm.emit(BPF_LDH_IND, IPV4_OFFSET + port_offset)
+            for start, end in ports:
+                asm.jump_if_in_range(start, end, 'match')
+    asm.jump('accept')
+
+    # IPv6: next header, source and destination network, then ports
+    asm.label('ipv6')
+    if proto6:
+        asm.emit(BPF_LDB_ABS, IPV6_OFFSET + 6)
+        for proto in proto6:
+            asm.jump_if_equal(proto, 'match')
+    for offset in (IPV6_OFFSET + 8, IPV6_OFFSET + 24):
+        for index, net in enumerate(nets6):
+            next_net = f'ipv6_net_{offset}_{index}'
+            words = zip(_ipv6_words(int(net.network_address)), _ipv6_words(int(net.netmask)))
+            for word, (value, mask) in enumerate(words):
+                if mask == 0:
+                    continue
+                asm.emit(BPF_LDW_ABS, offset + 4 * word)
+                if mask != 0xffffffff:
+                    asm.emit(BPF_AND_K, mask)
+                asm.emit(BPF_JEQ_K, value, 1, 0)
+                asm.jump(next_net)
+            asm.jump('match')
+            asm.label(next_net)
+    if ports:
+        asm.emit(BPF_LDB_ABS, IPV6_OFFSET + 6)
+        asm.emit(BPF_JEQ_K, IPPROTO_TCP, 2, 0)
+        asm.emit(BPF_JEQ_K, IPPROTO_UDP, 1, 0)
+        asm.jump('accept')
+        for port_offset in (40, 42):
+            asm.emit(BPF_LDH_ABS, IPV6_OFFSET + port_offset)
+            for start, end in ports:
+                asm.jump_if_in_range(start, end, 'match')
+    asm.jump('accept')
+
+    # Whitelisted: drop, or keep a random 1-in-N sample
+    asm.label('match')
+    if sample_rate and sample_rate > 1:
+        asm.emit(BPF_LDW_ABS, SKF_AD_RANDOM)
+        asm.emit(BPF_MOD_K, sample_rate)
+        asm.emit(BPF_JEQ_K, 0, 1, 0)
+    elif sample_rate == 1:
+        asm.jump('accept')
+    asm.emit(BPF_RET_K, 0)
+    asm.label('accept')
+    asm.emit(BPF_RET_K, SNAPLEN)
+    return asm.assemble()
+
+
+def pack_filter(program):
+    """Pack instruction tuples into the kernel's struct sock_filter array."""
+    return b''.join(_INSTRUCTION.pack(code, jt, jf, k) for code, jt, jf, k in program)
+
+
+def whitelist_filter_expression(ips, ports, protocols):
+    """
+    Express the same whitelist rules in libpcap filter syntax.
+
+    Used where the capture backend takes a filter string (scapy sniff); it
+    has no random sampling.
+
+    Returns:
+        str: Filter expression, or an empty string if there are no rules
+    """
+    terms = []
+    for name in protocols:
+        if name in PROTOCOL_NUMBERS_V4:
+            terms.append(f"ip proto {PROTOCOL_NUMBERS_V4[name]}")
+        if name in PROTOCOL_NUMBERS_V6:
+            terms.append(f"ip6 proto {PROTOCOL_NUMBERS_V6[name]}")
+    for net in ips:
+        terms.append(f"net {net.with_prefixlen}")
+    for start, end in ports:
+        transport = "(tcp or udp)"
+        if start == end:
+            terms.append(f"({transport} and port {start})")
+        else:
+            terms.append(f"({transport} and portrange {start}-{end})")
+    if not terms:
+        return ""
+    return "not (" + " or ".join(terms) + ")"
@@ -0,0 +1,219 @@
+"""
+This script handles the continuous capture pipeline.
+"""
+
+import threading
+import time
+from queue import Queue, Full, Empty
+
+
+class PacketBatch:
+    """A batch of captured packets and the results attached to it by each stage."""
+
+    def __init__(self, sequence, packets):
+        """
+        Initialize the batch.
+
+        Args:
+            sequence: Monotonic batch number assigned by the pipeline
+            packets: List of (timestamp, raw_bytes) tuples
+        """
+        self.sequence = sequence
+        self.packets = packets
+        self.closed_at = time.time()
+        self.records = []
+        self.suspicious_activities = []
+        self.features = None
+        self.anomalies = []
+        self.anomaly_details = []
+        self.flows = []
+        self.flow_features = None
+        self.flow_anomaly_details = []
+        self.dns_clients = []
+        self.dns_features = None
+        self.dns_anomaly_details = []
+
+
+class CapturePipeline:
+    """
+    Runs capture and the processing stages concurrently, joined by bounded queues.
+
+    The capture thread never waits for analysis: it keeps draining the packet
+    source and closes a batch as soon as it holds ``batch_size`` packets or
+    ``batch_timeout`` seconds have passed since its first packet, whichever
+    comes first. Each processing stage runs in its own thread and hands the
+    batch to the next stage through a bounded queue.
+    """
+
+    def __init__(self, logger, packet_source, stages, batch_size=1000,
+                 batch_timeout=5.0, queue_size=4, drop_when_full=True, on_first_packet=None):
+        """
+        Initialize the pipeline.
+
+        Args:
+            logger: Logger object for recording pipeline events
+            packet_source: Object exposing read_packets(max_count, timeout) that
+                returns a list of (timestamp, raw_bytes) tuples, or None once the
+                source is exhausted
+            stages: Ordered list of (name, callable) pairs; each callable receives
+                a PacketBatch and fills in its results
+            batch_size: Maximum number of packets per batch
+            batch_timeout: Maximum number of seconds a batch stays open
+            queue_size: Capacity of each inter-stage queue, in batches
+            drop_when_full: Drop a closed batch when the first stage is backed up
+                instead of blocking capture
+            on_first_packet: Optional callable run on the capture thread when
+                the source delivers its first packets
+        """
+        self.logger = logger
+        self.packet_source = packet_source
+        self.stages = stages
+        self.batch_size = max(1, int(batch_size))
+        self.batch_timeout = max(0.01, float(batch_timeout))
+        self.drop_when_full = drop_when_full
+        self.on_first_packet = on_first_packet
+        self.queues = [Queue(maxsize=queue_size) for _ in stages]
+        self.stop_event = threading.Event()
+        self.threads = []
+        self.stats = {
+            'batches': 0,
+            'packets': 0,
+            'dropped_batches': 0,
+            'dropped_packets': 0,
+        }
+
+    def start(self):
+        """Start the capture thread and one thread per stage."""
+        for index, (name, func) in enumerate(self.stages):
+            in_queue = self.queues[index]
+            out_queue = self.queues[index + 1] if index + 1 < len(self.queues) else None
+            thread = threading.Thread(
+                target=self._stage_loop,
+                args=(name, func, in_queue, out_queue),
+                name=f"pipeline-{name}",
+                daemon=True
+            )
+            self.threads.append(thread)
+            thread.start()
+
+        capture_thread = threading.Thread(
+            target=self._capture_loop,
+            name="pipeline-capture",
+            daemon=True
+        )
+        self.threads.insert(0, capture_thread)
+        capture_thread.start()
+
+    def stop(self):
+        """Ask the capture thread to stop; queued batches are still processed."""
+        self.stop_event.set()
+
+    def join(self, timeout=None):
+        """Wait for all pipeline threads to finish."""
+        for thread in self.threads:
+            thread.join(timeout)
+
+    def is_alive(self):
+        """True while any pipeline thread is still running."""
+        return any(thread.is_alive() for thread in self.threads)
+
+    def run(self):
+        """Start the pipeline and block until the source is exhausted or interrupted."""
+        self.start()
+        try:
+            while self.is_alive():
+                time.sleep(0.5)
+        finally:
+            self.stop()
+            self.join(timeout=self.batch_timeout + 5)
+
+    def _capture_loop(self):
+        """Drain the packet source and close batches on size or time."""
+        sequence = 0
+        pending = []
+        deadline = None
+
+        try:
+            while not self.stop_event.is_set():
+                wait = self.batch_timeout if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    packets = self.packet_source.read_packets(
+                        self.batch_size - len(pending),
+                        min(wait, 0.5)
+                    )
+                except Exception as e:
+                    self.logger.error(f"Capture stage error: {e}", exc_info=True)
+                    packets = []
+
+                if packets is None:
+                    break
+
+                if packets:
+                    if self.on_first_packet is not None:
+                        callback, self.on_first_packet = self.on_first_packet, None
+                        try:
+                            callback()
+                        except Exception as e:
+                            self.logger.error(f"First packet callback error: {e}", exc_info=True)
+                    if not pending:
+                        deadline = time.monotonic() + self.batch_timeout
+                    pending.extend(packets)
+
+                if pending and (len(pending) >= self.batch_size or time.monotonic() >= deadline):
+                    self._emit(PacketBatch(sequence, pending))
+                    sequence += 1
+                    pending = []
+                    deadline = None
+        finally:
+            if pending:
+                self._emit(PacketBatch(sequence, pending), block=True)
+            self._put(self.queues[0], None)
+
+    def _emit(self, batch, block=False):
+        """Hand a closed batch to the first stage."""
+        self.stats['batches'] += 1
+        self.stats['packets'] += len(batch.packets)
+
+        if self.drop_when_full and not block:
+            try:
+                self.queues[0].put_nowait(batch)
+            except Full:
+                self.stats['dropped_batches'] += 1
+                self.stats['dropped_packets'] += len(batch.packets)
+                self.logger.warning(
+                    f"Pipeline backed up, dropped batch {batch.sequence} "
+                    f"({len(batch.packets)} packets)"
+                )
+        else:
+            self._put(self.queues[0], batch)
+
+    def _put(self, out_queue, item):
+        """Blocking put that still gives up once every stage has exited."""
+        while True:
+            try:
+                out_queue.put(item, timeout=1)
+                return
+            except Full:
+                if not any(thread.is_alive() for thread in self.threads[1:]):
+                    return
+
+    def _stage_loop(self, name, func, in_queue, out_queue):
+        """Run one processing stage until the end-of-stream marker arrives."""
+        while True:
+            try:
+                batch = in_queue.get(timeout=1)
+            except Empty:
+                continue
+
+            if batch is None:
+                if out_queue is not None:
+                    self._put(out_queue, None)
+                return
+
+            try:
+                func(batch)
+            except Exception as e:
+                self.logger.error(f"Error in {name} stage: {e}", exc_info=True)
+
+            if out_queue is not None:
+                self._put(out_queue, batch)
@@ -8,9 +8,9 @@ from .whitelist_config import (
     WHITELISTED_PROTOCOLS,
     TIME_BASED_WHITELIST,
     WHITELISTED_DOMAINS,
-    COMPILED_DOMAIN_PATTERNS
+    WHITELISTED_DOMAIN_FILES
 )
-from .feature_config import FEATURE_NAMES
+from .feature_config import FEATURE_NAMES, FLOW_FEATURE_NAMES, DNS_FEATURE_NAMES
 
 __all__ = [
     'WHITELISTED_IPS',
@@ -18,6 +18,8 @@ __all__ = [
     'WHITELISTED_PROTOCOLS',
     'TIME_BASED_WHITELIST',
     'WHITELISTED_DOMAINS',
-    'COMPILED_DOMAIN_PATTERNS',
-    'FEATURE_NAMES'
+    'WHITELISTED_DOMAIN_FILES',
+    'FEATURE_NAMES',
+    'FLOW_FEATURE_NAMES',
+    'DNS_FEATURE_NAMES'
 ]
@@ -24,3 +24,36 @@ FEATURE_NAMES = [
     'is_stp',          # Boolean flag for Spanning Tree Protocol
     'is_arp'           # Boolean flag for ARP packet
 ]
+
+# Flow-level feature names, one row per exported flow record
+FLOW_FEATURE_NAMES = [
+    'duration',        # Seconds between the first and last packet
+    'protocol',        # IP protocol number
+    'dst_port',        # Responder port
+    'fwd_packets',     # Packets sent by the initiator
+    'rev_packets',     # Packets sent by the responder
+    'fwd_bytes',       # Bytes sent by the initiator
+    'rev_bytes',       # Bytes sent by the responder
+    'syn_count',       # TCP packets with SYN set
+    'fin_count',       # TCP packets with FIN set
+    'rst_count',       # TCP packets with RST set
+    'psh_count',       # TCP packets with PSH set
+    'ack_count',       # TCP packets with ACK set
+    'urg_count',       # TCP packets with URG set
+    'iat_mean',        # Mean packet inter-arrival time
+    'iat_std',         # Standard deviation of inter-arrival time
+    'iat_max'          # Longest gap between packets
+]
+
+# DNS client feature names, one row per client that queried in a batch
+DNS_FEATURE_NAMES = [
+    'query_rate',          # Queries per second over the rate window
+    'queries',             # Queries seen from the client
+    'unique_qnames',       # Estimated distinct query names
+    'unique_ratio',        # Distinct names per query
+    'qname_length',        # Average query name length
+    'label_length',        # Average longest-label length
+    'max_label_length',    # Longest label seen
+    'label_entropy',       # Average longest-label entropy in bits per character
+    'tunnel_qtype_ratio'   # Share of NULL and TXT queries
+]
@@ -2,7 +2,6 @@
 This script handles whitelist config.
 """
 
-import re
 from ipaddress import ip_network
 
 # IP address whitelist
@@ -33,12 +32,12 @@ TIME_BASED_WHITELIST = {
     "MAINTENANCE_WINDOW": ("22:00", "23:00"),
 }
 
-# Domain whitelist patterns
+# Domain whitelist: exact names, or "*." followed by a name for all of its subdomains
 WHITELISTED_DOMAINS = [
-    r".*\.google\.com$",
-    r".*\.microsoft\.com$",
-    r".*\.apple\.com$",
+    "*.google.com",
+    "*.microsoft.com",
+    "*.apple.com",
 ]
 
-# Compile domain patterns for better performance
-COMPILED_DOMAIN_PATTERNS = [re.compile(pattern) for pattern in WHITELISTED_DOMAINS]
+# Plain-text domain lists or hosts files loaded into the domain whitelist
+WHITELISTED_DOMAIN_FILES = []
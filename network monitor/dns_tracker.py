@@ -0,0 +1,237 @@
+"""
+This script handles per-client DNS query statistics and tunneling detection across batches.
+"""
+
+import math
+from collections import Counter, OrderedDict
+import numpy as np
+from config.feature_config import DNS_FEATURE_NAMES
+from rate_detector import RateCounter
+from sketches import KeyedHyperLogLog, SketchWindow
+
+# Query types that carry arbitrary data and are favoured by DNS tunnels
+DNS_TUNNEL_QTYPES = {10, 16}    # NULL, TXT
+
+# Reverse lookup zones: every PTR query has a distinct name below them
+REVERSE_DNS_ZONES = {'in-addr.arpa', 'ip6.arpa'}
+
+# Second-level labels under which registrations happen one level deeper (example.co.uk)
+SECOND_LEVEL_LABELS = {'ac', 'co', 'com', 'edu', 'gov', 'net', 'org'}
+
+
+def label_entropy(label):
+    """Shannon entropy of a label's characters, in bits per character."""
+    length = len(label)
+    if not length:
+        return 0.0
+    return -sum(count / length * math.log2(count / length) for count in Counter(label).values())
+
+
+def base_domain(labels):
+    """
+    Approximate registered domain of a query name, e.g. example.com for a.b.example.com.
+
+    Without a public suffix list, two labels are kept, or three under a
+    two-letter country code with a common second-level label (example.co.uk).
+    """
+    keep = 2
+    if len(labels) > 2 and len(labels[-1]) == 2 and labels[-2] in SECOND_LEVEL_LABELS:
+        keep = 3
+    return '.'.join(labels[-keep:])
+
+
+class DnsClientStats:
+    """Running query statistics of one DNS client."""
+
+    __slots__ = ('queries', 'tunnel_qtype_queries', 'qname_length', 'label_length',
+                 'max_label_length', 'label_entropy', 'alerted_until')
+
+    def __init__(self):
+        self.queries = 0
+        self.tunnel_qtype_queries = 0
+        self.qname_length = 0.0         # Moving average of the query name length
+        self.label_length = 0.0         # Moving average of the longest label length
+        self.max_label_length = 0
+        self.label_entropy = 0.0        # Moving average of the longest label's entropy
+        self.alerted_until = None
+
+
+class DnsActivityTracker:
+    """
+    Tracks DNS queries per client over any number of batches in bounded memory.
+
+    For every client it keeps a sliding-window query rate, a HyperLogLog of
+    the distinct names it queried, and moving averages of the length and
+    character entropy of the longest label of its queries. Per registered
+    domain it keeps a query count and a HyperLogLog of distinct names below
+    it. Per client and registered domain it keeps a HyperLogLog of the
+    distinct names queried below the domain over the last one to two
+    windows. Clients and domains live in LRUs with hard caps.
+
+    Two kinds of alerts are raised: a client whose query rate crosses the
+    threshold, and likely tunneling, where a client keeps sending long,
+    high-entropy labels, or queries an unusual number of distinct names below
+    one domain within the window. Reverse lookups (in-addr.arpa, ip6.arpa)
+    are never judged as tunneling. Each client alerts at most once per window.
+    """
+
+    def __init__(self, window=60, query_threshold=25, max_clients=10000, max_domains=50000,
+                 tunnel_label_length=24, tunnel_entropy=3.5, tunnel_min_queries=10,
+                 tunnel_unique_subdomains=300, smoothing=0.1):
+        """
+        Initialize the tracker.
+
+        Args:
+            window: Seconds over which query rates are counted
+            query_threshold: Queries from one client within the window that raise an alert
+            max_clients: Hard cap on tracked clients
+            max_domains: Hard cap on tracked registered domains
+            tunnel_label_length: Average longest-label length that suggests tunneling
+            tunnel_entropy: Average longest-label entropy (bits per character) that suggests tunneling
+            tunnel_min_queries: Queries a client must have sent before label statistics are judged
+            tunnel_unique_subdomains: Distinct names one client queries below one
+                domain within the window that suggest tunneling
+            smoothing: Weight of each new query in the moving averages
+        """
+        self.window = window
+        self.max_clients = max_clients
+        self.max_domains = max_domains
+        self.tunnel_label_length = tunnel_label_length
+        self.tunnel_entropy = tunnel_entropy
+        self.tunnel_min_queries = tunnel_min_queries
+        self.tunnel_unique_subdomains = tunnel_unique_subdomains
+        self.smoothing = smoothing
+
+        self.rates = RateCounter(window, query_threshold, max_clients)
+        self.client_names = KeyedHyperLogLog(precision=6, max_keys=max_clients)
+        # Distinct names per (client, registered domain), in epochs of one window
+        self.subdomain_names = SketchWindow(lambda: KeyedHyperLogLog(precision=6, max_keys=max_domains),
+                                            epoch_seconds=window, epochs=2)
+        self.clients = OrderedDict()
+        self.domains = OrderedDict()    # Registered domain -> queries
+        self.active = set()             # Clients seen since the last features() call
+        self.stats = {'queries': 0, 'clients_evicted': 0, 'domains_evicted': 0}
+
+    def __len__(self):
+        return len(self.clients)
+
+    def set_query_threshold(self, threshold):
+        """Change the per-client query count that raises a rate alert."""
+        self.rates.threshold = threshold
+
+    def _client(self, client):
+        """Get or create a client's statistics, evicting the least recently active client if needed."""
+        stats = self.clients.get(client)
+        if stats is None:
+            if len(self.clients) >= self.max_clients:
+                self.clients.popitem(last=False)
+                self.stats['clients_evicted'] += 1
+            stats = self.clients[client] = DnsClientStats()
+        else:
+            self.clients.move_to_end(client)
+        return stats
+
+    def _count_domain(self, domain):
+        """Count a query to a registered domain."""
+        count = self.domains.pop(domain, None)
+        if count is None:
+            count = 0
+            if len(self.domains) >= self.max_domains:
+                self.domains.popitem(last=False)
+                self.stats['domains_evicted'] += 1
+        self.domains[domain] = count + 1
+        return count + 1
+
+    def observe(self, client, qname, timestamp, qtype=None):
+        """
+        Record one DNS query.
+
+        Args:
+            client: Source IP of the query
+            qname: Query name, with or without the trailing root dot
+            timestamp: Capture time in seconds
+            qtype: Query type number, if known
+
+        Returns:
+            list: Suspicious activity tuples raised by this query
+        """
+        name = qname.strip().lower().rstrip('.')
+        if not name:
+            return []
+        labels = name.split('.')
+        domain = base_domain(labels)
+        # The part below the registered domain is where tunnels put their data
+        longest = max(labels[:-domain.count('.') - 1] or labels[:1], key=len)
+        entropy = label_entropy(longest)
+
+        self.stats['queries'] += 1
+        self.active.add(client)
+        stats = self._client(client)
+        stats.queries += 1
+        if qtype in DNS_TUNNEL_QTYPES:
+            stats.tunnel_qtype_queries += 1
+        if stats.queries == 1:
+            stats.qname_length, stats.label_length, stats.label_entropy = len(name), len(longest), entropy
+        else:
+            weight = self.smoothing
+            stats.qname_length += weight * (len(name) - stats.qname_length)
+            stats.label_length += weight * (len(longest) - stats.label_length)
+            stats.label_entropy += weight * (entropy - stats.label_entropy)
+        stats.max_label_length = max(stats.max_label_length, len(longest))
+        self.client_names.add(client, name)
+        self._count_domain(domain)
+        reverse_lookup = domain in REVERSE_DNS_ZONES
+        if not reverse_lookup:
+            sketch = self.subdomain_names.sketch_for(timestamp)
+            if sketch is not None:
+                sketch.add((client, domain), name)
+
+        alerts = []
+        count = self.rates.add(client, timestamp)
+        if count is not None:
+            alerts.append(('High DNS query rate detected', client, f"{count} queries in {self.window}s"))
+
+        if not reverse_lookup and (stats.alerted_until is None or timestamp >= stats.alerted_until):
+            reason = None
+            if (stats.queries >= self.tunnel_min_queries
+                    and stats.label_length >= self.tunnel_label_length
+                    and stats.label_entropy >= self.tunnel_entropy):
+                reason = (f"average label length {stats.label_length:.0f}, "
+                          f"entropy {stats.label_entropy:.2f} bits/char")
+            else:
+                current, *older = self.subdomain_names.sketches()
+                subdomains = current.count((client, domain), *older)
+                if subdomains >= self.tunnel_unique_subdomains:
+                    reason = f"about {subdomains:.0f} distinct names queried below it within {self.window}s"
+            if reason is not None:
+                stats.alerted_until = timestamp + self.window
+                alerts.append(('Possible DNS tunneling detected', client, domain, reason))
+        return alerts
+
+    def client_features(self, client):
+        """Feature vector of one client, in DNS_FEATURE_NAMES order."""
+        stats = self.clients[client]
+        unique = self.client_names.count(client)
+        return [
+            self.rates.count(client) / self.window,
+            stats.queries,
+            unique,
+            min(unique / stats.queries, 1.0),
+            stats.qname_length,
+            stats.label_length,
+            stats.max_label_length,
+            stats.label_entropy,
+            stats.tunnel_qtype_queries / stats.queries,
+        ]
+
+    def features(self):
+        """
+        Feature rows for the clients that queried since the last call.
+
+        Returns:
+            tuple: (clients, float32 matrix with one row per client)
+        """
+        clients = [client for client in self.active if client in self.clients]
+        self.active = set()
+        matrix = np.array([self.client_features(client) for client in clients], dtype=np.float32)
+        return clients, matrix.reshape(len(clients), len(DNS_FEATURE_NAMES))
@@ -0,0 +1,173 @@
+"""
+This script handles domain allow/block lists stored as a trie of reversed labels.
+"""
+
+import ipaddress
+from collections import OrderedDict
+
+# Host names in hosts files that are never meant as list entries
+HOSTS_FILE_IGNORED = {'localhost', 'localhost.localdomain', 'local', 'broadcasthost',
+                      'ip6-localhost', 'ip6-loopback', '0.0.0.0'}
+
+
+def normalize_domain(name):
+    """Lowercase a domain name and strip the trailing root dot."""
+    return name.strip().lower().rstrip('.')
+
+
+class _Node:
+    """One label of the trie."""
+
+    __slots__ = ('children', 'exact', 'wildcard')
+
+    def __init__(self):
+        self.children = {}
+        self.exact = False      # The domain ending at this node is listed
+        self.wildcard = False   # Every subdomain of it is listed
+
+
+class DomainTrie:
+    """
+    Set of domain names and wildcard suffixes with O(label count) lookups.
+
+    Entries are stored by reversed labels, so www.google.com is found by
+    walking com -> google -> www. "example.com" matches only that name;
+    "*.example.com" matches every subdomain of example.com but not
+    example.com itself. A lookup costs one dictionary step per label of the
+    query, however many entries are loaded. Recent answers are kept in a
+    small LRU, since the same names are queried over and over.
+    """
+
+    def __init__(self, domains=(), cache_size=1024):
+        """
+        Build the trie.
+
+        Args:
+            domains: Initial entries, e.g. "example.com" or "*.example.com"
+            cache_size: Number of recent query names whose answers are cached
+        """
+        self.root = _Node()
+        self.entries = 0
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        for domain in domains:
+            self.add(domain)
+
+    def __len__(self):
+        return self.entries
+
+    def __contains__(self, qname):
+        return self.match(qname)
+
+    def add(self, domain):
+        """
+        Add an entry.
+
+        Args:
+            domain: Exact name, or "*." followed by a name to match its subdomains
+
+        Returns:
+            bool: True if the entry was new
+        """
+        domain = normalize_domain(domain)
+        wildcard = domain.startswith('*.')
+        if wildcard:
+            domain = domain[2:]
+        if not domain:
+            return False
+
+        node = self.root
+        for label in reversed(domain.split('.')):
+            child = node.children.get(label)
+            if child is None:
+                child = node.children[label] = _Node()
+            node = child
+
+        if wildcard:
+            added, node.wildcard = not node.wildcard, True
+        else:
+            added, node.exact = not node.exact, True
+        if added:
+            self.entries += 1
+            self.cache.clear()
+        return added
+
+    def match(self, qname):
+        """
+        Check whether a query name is listed.
+
+        Args:
+            qname: Domain name, with or without the trailing root dot
+
+        Returns:
+            bool
+        """
+        result = self.cache.get(qname)
+        if result is not None:
+            self.cache.move_to_end(qname)
+            return result
+
+        result = self._match(qname)
+        self.cache[qname] = result
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return result
+
+    def _match(self, qname):
+        """Walk the trie for one query name."""
+        labels = normalize_domain(qname).split('.')
+        node = self.root
+        for remaining in range(len(labels) - 1, -1, -1):
+            node = node.children.get(labels[remaining])
+            if node is None:
+                return False
+            # Labels left over below this node make the query a subdomain of it
+            if remaining and node.wildcard:
+                return True
+        return node.exact
+
+    def load(self, path):
+        """
+        Add the entries of a plain-text list or hosts file.
+
+        Returns:
+            int: Number of new entries
+        """
+        return sum(self.add(domain) for domain in load_domain_file(path))
+
+
+def parse_domain_line(line):
+    """
+    Extract the domain entries from one line of a list or hosts file.
+
+    Plain lists have one entry per line. Hosts-file lines start with an IP
+    address followed by one or more names. Everything after '#' is a comment.
+
+    Returns:
+        list: Entries on the line
+    """
+    fields = line.split('#', 1)[0].split()
+    if not fields:
+        return []
+    try:
+        ipaddress.ip_address(fields[0])
+    except ValueError:
+        return [fields[0]]
+    return [name for name in fields[1:] if normalize_domain(name) not in HOSTS_FILE_IGNORED]
+
+
+def load_domain_file(path):
+    """
+    Read the domain entries of a plain-text list or hosts file.
+
+    Args:
+        path: File path
+
+    Returns:
+        list: Entries in file order
+    """
+    domains = []
+    with open(path, encoding='utf-8', errors='replace') as handle:
+        for line in handle:
+            domains.extend(parse_domain_line(line))
+    return domains
@@ -3,13 +3,51 @@ This script handles feature extractor that processes data.
 """
 
 # Import necessary libraries
+import numpy as np
 import pandas as pd
-from scapy.layers.inet import IP, TCP, UDP
-from scapy.layers.inet6 import IPv6, ICMPv6ND_NS
-from scapy.layers.dns import DNS
-from scapy.layers.l2 import ARP
-from scapy.packet import Raw
 from config.feature_config import FEATURE_NAMES
+from header_parser import (
+    HEADER_DTYPE, parse_frames, parse_packets, HDR_TCP, HDR_UDP, HDR_DNS, HDR_LLMNR,
+    HDR_MULTICAST, HDR_BROADCAST, HDR_ICMPV6_ND, HDR_STP, HDR_ARP, DNS_PORTS
+)
+from packet_decoder import (
+    DecodedPacket, PacketDecoder, FLAG_TCP, FLAG_UDP, FLAG_LLMNR, FLAG_MULTICAST,
+    FLAG_BROADCAST, FLAG_ICMPV6_ND, FLAG_STP, FLAG_ARP
+)
+
+
+def _flag(headers, bit):
+    """Column that is 1 where a header flag bit is set."""
+    return (headers['flags'] & bit) != 0
+
+
+def _tcp_flag(headers, mask):
+    """Column that is 1 for TCP packets with any of the given TCP flag bits set."""
+    return _flag(headers, HDR_TCP) & ((headers['tcp_flags'] & mask) != 0)
+
+
+# How each feature column is computed from a parsed header batch
+FEATURE_COLUMNS = {
+    'packet_length': lambda h: h['length'],
+    'is_ip': lambda h: h['ip_version'] == 4,
+    'is_ipv6': lambda h: h['ip_version'] == 6,
+    'is_tcp': lambda h: _flag(h, HDR_TCP),
+    'is_udp': lambda h: _flag(h, HDR_UDP),
+    'is_dns': lambda h: _flag(h, HDR_DNS),
+    'is_llmnr': lambda h: _flag(h, HDR_LLMNR),
+    'is_multicast': lambda h: _flag(h, HDR_MULTICAST),
+    'is_broadcast': lambda h: _flag(h, HDR_BROADCAST),
+    'ttl': lambda h: h['ttl'],
+    'src_port': lambda h: h['src_port'],
+    'dst_port': lambda h: h['dst_port'],
+    'has_payload': lambda h: h['payload_length'] > 0,
+    'payload_length': lambda h: h['payload_length'],
+    'is_syn': lambda h: _tcp_flag(h, 0x02),
+    'is_syn_ack': lambda h: _tcp_flag(h, 0x12),
+    'is_icmpv6_nd': lambda h: _flag(h, HDR_ICMPV6_ND),
+    'is_stp': lambda h: _flag(h, HDR_STP),
+    'is_arp': lambda h: _flag(h, HDR_ARP),
+}
 
 class FeatureExtractor:
     """A class for extracting features from network packets for machine learning analysis."""
@@ -17,148 +55,89 @@ class FeatureExtractor:
     def __init__(self):
         """Initialize the FeatureExtractor with predefined feature names."""
         self.feature_names = FEATURE_NAMES
+        self.decoder = PacketDecoder()
+
+    def extract_matrix(self, batch):
+        """Extract the feature matrix for a whole batch with vectorized column operations.
+        
+        Args:
+            batch: Parsed header array (HEADER_DTYPE), list of raw (timestamp, bytes)
+                tuples, or list of DecodedPacket records
+        Returns:
+            C-contiguous float32 ndarray of shape (packets, features), with columns
+            in FEATURE_NAMES order
+        """
+        headers = self._as_headers(batch)
+        matrix = np.empty((len(headers), len(self.feature_names)), dtype=np.float32)
+        for column, name in enumerate(self.feature_names):
+            matrix[:, column] = FEATURE_COLUMNS[name](headers)
+        return matrix
+
+    def _as_headers(self, batch):
+        """Parse a batch into a header array unless it already is one."""
+        if isinstance(batch, np.ndarray) and batch.dtype == HEADER_DTYPE:
+            return batch
+        if len(batch) and isinstance(batch[0], DecodedPacket):
+            return parse_frames([record.frame for record in batch],
+                                [record.timestamp or 0.0 for record in batch])
+        return parse_packets(batch)
 
     def extract_features(self, raw_packets):
         """Extract features from a list of packets for machine learning analysis.
         
         Args:
-            raw_packets: List of network packets to analyze
+            raw_packets: Anything extract_matrix accepts
         Returns:
             pandas DataFrame containing extracted features, or None if no features could be extracted
         """
-        features = []
-        
-        for packet in raw_packets:
-            try:
-                # Handle packets that come as tuples (timestamp, packet)
-                if isinstance(packet, tuple):
-                    packet = packet[1]
-                
-                try:
-                    feature_vector = self._extract_packet_features(packet)
-                    features.append(feature_vector)
-                except Exception as e:
-                    # Log error and continue with next packet
-                    continue
-            except Exception as e:
-                # Log error and continue with next packet
-                continue
-
-        if not features:
-            return None
-
         try:
-            df = pd.DataFrame(features, columns=self.feature_names)
-            return df
-        except Exception as e:
+            matrix = self.extract_matrix(raw_packets)
+        except Exception:
+            return None
+        if not len(matrix):
             return None
+        return pd.DataFrame(matrix, columns=self.feature_names)
 
-    def _extract_packet_features(self, packet):
-        """Extract features from a single packet.
+    def _extract_packet_features(self, record):
+        """Extract features from a single decoded packet.
+
+        Per-packet reference implementation of extract_matrix, kept for
+        benchmarks and for callers that only hold one record. It follows the
+        header parser's definitions rather than scapy's layers: a packet is DNS
+        by its TCP/UDP ports, and the payload is everything after the TCP/UDP
+        header, so ICMP data and non-first IP fragments have none.
         
         Args:
-            packet: A single network packet to analyze
+            record: A DecodedPacket to analyze
             
         Returns:
             list of extracted features in the order defined by feature_names
         """
-        try:
-            # Basic packet information - checks for presence of different protocols
-            packet_length = len(packet)
-            is_ip = int(IP in packet)
-            is_ipv6 = int(IPv6 in packet)
-            is_tcp = int(TCP in packet)
-            is_udp = int(UDP in packet)
-            is_dns = int(DNS in packet)
-            is_llmnr = int('LLMNR' in packet.summary())
-        except Exception:
-            # Return default values if basic feature extraction fails
-            return [0] * len(self.feature_names)
-
-        try:
-            # Check if packet is multicast (starts with specific MAC prefixes)
-            # or broadcast (sent to all devices on network)
-            is_multicast = int(
-                packet.dst.startswith("01:00:5e") or 
-                packet.dst.startswith("33:33")
-            )
-            is_broadcast = int(
-                packet.dst == "ff:ff:ff:ff:ff:ff" or 
-                (is_ip and packet[IP].dst == "255.255.255.255")
-            )
-        except Exception:
-            is_multicast = 0
-            is_broadcast = 0
-
-        try:
-            # Extract Time To Live value for IP/IPv6 packets
-            ttl = 0
-            if is_ip:
-                ttl = packet[IP].ttl
-            elif is_ipv6:
-                ttl = packet[IPv6].hlim
-        except Exception:
-            ttl = 0
-
-        try:
-            # Extract source and destination ports for TCP/UDP packets
-            src_port = 0
-            dst_port = 0
-            if is_tcp:
-                src_port = packet[TCP].sport
-                dst_port = packet[TCP].dport
-            elif is_udp:
-                src_port = packet[UDP].sport
-                dst_port = packet[UDP].dport
-        except Exception:
-            src_port = 0
-            dst_port = 0
-
-        try:
-            # Check for and analyze packet payload
-            has_payload = int(Raw in packet)
-            payload_length = len(packet[Raw].load) if has_payload else 0
-        except Exception:
-            has_payload = 0
-            payload_length = 0
-
-        try:
-            # Analyze TCP flags for connection establishment
-            is_syn = int(is_tcp and (packet[TCP].flags & 0x02))
-            is_syn_ack = int(is_tcp and (packet[TCP].flags & 0x12))
-        except Exception:
-            is_syn = 0
-            is_syn_ack = 0
-
-        try:
-            # Check for special protocol packets
-            is_icmpv6_nd = int(is_ipv6 and ICMPv6ND_NS in packet)
-            is_stp = int('STP' in packet.summary())
-            is_arp = int(ARP in packet)
-        except Exception:
-            is_icmpv6_nd = 0
-            is_stp = 0
-            is_arp = 0
+        flags = record.flags
+        is_tcp = int(bool(flags & FLAG_TCP))
+        has_ports = bool(flags & (FLAG_TCP | FLAG_UDP))
+        is_dns = has_ports and (record.src_port in DNS_PORTS or record.dst_port in DNS_PORTS)
+        payload_length = record.transport_payload_length
 
         # Return all extracted features as a list
         return [
-            packet_length,
-            is_ip,
-            is_ipv6,
+            record.length,
+            int(record.ip_version == 4),
+            int(record.ip_version == 6),
             is_tcp,
-            is_udp,
-            is_dns,
-            is_llmnr,
-            is_multicast,
-            is_broadcast,
-            ttl,
-            src_port,
-            dst_port,
-            has_payload,
+            int(bool(flags & FLAG_UDP)),
+            int(is_dns),
+            int(bool(flags & FLAG_LLMNR)),
+            int(bool(flags & FLAG_MULTICAST)),
+            int(bool(flags & FLAG_BROADCAST)),
+            record.ttl,
+            record.src_port,
+            record.dst_port,
+            int(payload_length > 0),
             payload_length,
-            is_syn,
-            is_syn_ack,
-            is_icmpv6_nd,
-            is_stp,
-            is_arp
-        ]
\ No newline at end of file
+            int(is_tcp and bool(record.tcp_flags & 0x02)),
+            int(is_tcp and bool(record.tcp_flags & 0x12)),
+            int(bool(flags & FLAG_ICMPV6_ND)),
+            int(bool(flags & FLAG_STP)),
+            int(bool(flags & FLAG_ARP))
+        ]
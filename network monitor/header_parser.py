@@ -0,0 +1,242 @@
+"""
+This script handles vectorized header parsing of raw frames into NumPy structured arrays.
+"""
+
+import numpy as np
+
+# Flag bits for the 'flags' field of HEADER_DTYPE
+HDR_TCP = 0x001
+HDR_UDP = 0x002
+HDR_DNS = 0x004
+HDR_LLMNR = 0x008
+HDR_ARP = 0x010
+HDR_STP = 0x020
+HDR_ICMPV6_ND = 0x040
+HDR_MULTICAST = 0x080
+HDR_BROADCAST = 0x100
+HDR_FRAGMENT = 0x200
+
+HEADER_DTYPE = np.dtype([
+    ('timestamp', 'f8'),
+    ('length', 'u4'),          # Captured frame length
+    ('dst_mac', 'u8'),         # Destination MAC address as a 48-bit integer
+    ('ethertype', 'u2'),       # Ethertype after any VLAN tags
+    ('vlan', 'u2'),            # Outermost VLAN id, 0 if untagged
+    ('ip_version', 'u1'),      # 4, 6 or 0
+    ('ttl', 'u1'),             # IPv4 TTL or IPv6 hop limit
+    ('proto', 'u1'),           # IPv4 protocol or final IPv6 next header
+    ('tcp_flags', 'u1'),
+    ('src_ip4', 'u4'),
+    ('dst_ip4', 'u4'),
+    ('src_ip6', 'u8', (2,)),   # High and low 64 bits
+    ('dst_ip6', 'u8', (2,)),
+    ('src_port', 'u2'),
+    ('dst_port', 'u2'),
+    ('l3_offset', 'u2'),
+    ('l4_offset', 'u2'),
+    ('payload_offset', 'u4'),
+    ('payload_length', 'u4'),
+    ('flags', 'u2'),
+])
+
+ETH_P_IP = 0x0800
+ETH_P_IPV6 = 0x86DD
+ETH_P_ARP = 0x0806
+VLAN_ETHERTYPES = (0x8100, 0x88A8, 0x9100)
+IPV6_EXTENSION_HEADERS = (0, 43, 44, 60)   # Hop-by-hop, routing, fragment, destination options
+MAX_IPV6_EXTENSIONS = 4
+DNS_PORTS = (53, 5353)
+LLMNR_PORT = 5355
+
+# Trailing zero bytes so fixed-offset reads past a short final frame stay in bounds
+_PAD = 128
+
+
+class _FrameBuffer:
+    """Flat uint8 view of a batch with clipped multi-byte big-endian reads."""
+
+    def __init__(self, data):
+        self.data = data
+        self.last = len(data) - 1
+
+    def u8(self, offsets):
+        return self.data[np.minimum(offsets, self.last)].astype(np.uint32)
+
+    def u16(self, offsets):
+        return (self.u8(offsets) << 8) | self.u8(offsets + 1)
+
+    def u32(self, offsets):
+        return (self.u16(offsets) << 16) | self.u16(offsets + 2)
+
+    def u64(self, offsets):
+        return (self.u32(offsets).astype(np.uint64) << np.uint64(32)) | self.u32(offsets + 4).astype(np.uint64)
+
+
+def parse_frames(frames, timestamps=None):
+    """
+    Parse a batch of Ethernet frames.
+
+    Args:
+        frames: Sequence of bytes-like frames
+        timestamps: Optional sequence of capture timestamps
+
+    Returns:
+        numpy structured array of HEADER_DTYPE, one row per frame
+    """
+    lengths = np.fromiter((len(frame) for frame in frames), dtype=np.int64, count=len(frames))
+    starts = np.zeros(len(frames), dtype=np.int64)
+    if len(frames) > 1:
+        np.cumsum(lengths[:-1], out=starts[1:])
+    buffer = b''.join(frames) + bytes(_PAD)
+    return parse_buffer(buffer, starts, lengths, timestamps)
+
+
+def parse_packets(raw_packets):
+    """Parse (timestamp, raw_bytes) tuples as produced by capture and replay."""
+    return parse_frames(
+        [packet[1] for packet in raw_packets],
+        [packet[0] for packet in raw_packets]
+    )
+
+
+def parse_buffer(buffer, starts, lengths, timestamps=None):
+    """
+    Parse frames that already sit back to back in one buffer.
+
+    All header fields are read with vectorized offset arithmetic over a
+    single np.frombuffer view, so no per-packet Python code runs.
+
+    Args:
+        buffer: Bytes-like object holding the frames
+        starts: Offset of each frame in buffer
+        lengths: Captured length of each frame
+        timestamps: Optional capture timestamps
+
+    Returns:
+        numpy structured array of HEADER_DTYPE
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    lengths = np.asarray(lengths, dtype=np.int64)
+    count = len(starts)
+    out = np.zeros(count, dtype=HEADER_DTYPE)
+    if count == 0:
+        return out
+
+    buf = _FrameBuffer(np.frombuffer(buffer, dtype=np.uint8))
+    ends = starts + lengths
+    out['length'] = lengths
+    if timestamps is not None:
+        out['timestamp'] = np.asarray(timestamps, dtype=np.float64)
+    flags = np.zeros(count, dtype=np.int64)
+
+    has_eth = lengths >= 14
+
+    # Link layer: destination MAC class, then up to two VLAN tags
+    dst_hi = buf.u16(starts)
+    dst_mid = buf.u16(starts + 2)
+    dst_lo = buf.u16(starts + 4)
+    multicast = ((dst_hi == 0x0100) & ((dst_mid >> 8) == 0x5e)) | (dst_hi == 0x3333)
+    flags |= np.where(has_eth & multicast, HDR_MULTICAST, 0)
+    mac_broadcast = (dst_hi == 0xffff) & (dst_mid == 0xffff) & (dst_lo == 0xffff)
+    dst_mac = (dst_hi.astype(np.uint64) << np.uint64(32)) | (dst_mid << 16 | dst_lo).astype(np.uint64)
+    out['dst_mac'] = np.where(has_eth, dst_mac, 0)
+    flags |= np.where(has_eth & mac_broadcast, HDR_BROADCAST, 0)
+
+    ethertype = buf.u16(starts + 12)
+    l3 = starts + 14
+    vlan = np.zeros(count, dtype=np.uint32)
+    for depth in range(2):
+        tagged = np.isin(ethertype, VLAN_ETHERTYPES) & (l3 + 4 <= ends)
+        if not tagged.any():
+            break
+        tag = buf.u16(l3) & 0x0fff
+        if depth == 0:
+            vlan = np.where(tagged, tag, vlan)
+        ethertype = np.where(tagged, buf.u16(l3 + 2), ethertype)
+        l3 = np.where(tagged, l3 + 4, l3)
+    ethertype = np.where(has_eth, ethertype, 0)
+    out['ethertype'] = ethertype
+    out['vlan'] = vlan
+    out['l3_offset'] = np.clip(l3 - starts, 0, 0xffff)
+
+    # Spanning tree: bridge group address with an 802.2 LLC header (DSAP/SSAP 0x42)
+    stp = (has_eth & (dst_hi == 0x0180) & (dst_mid == 0xc200) & (dst_lo == 0x0000)
+           & (ethertype <= 1500) & (buf.u16(l3) == 0x4242))
+    flags |= np.where(stp, HDR_STP, 0)
+    flags |= np.where(ethertype == ETH_P_ARP, HDR_ARP, 0)
+
+    # IPv4
+    version_byte = buf.u8(l3)
+    is_ip4 = (ethertype == ETH_P_IP) & ((version_byte >> 4) == 4) & (l3 + 20 <= ends)
+    ihl = (version_byte & 0x0f) * 4
+    ip4_end = l3 + buf.u16(l3 + 2)
+    fragment = is_ip4 & ((buf.u16(l3 + 6) & 0x1fff) != 0)
+    flags |= np.where(fragment, HDR_FRAGMENT, 0)
+    dst_ip4 = buf.u32(l3 + 16)
+    out['src_ip4'] = np.where(is_ip4, buf.u32(l3 + 12), 0)
+    out['dst_ip4'] = np.where(is_ip4, dst_ip4, 0)
+    flags |= np.where(is_ip4 & (dst_ip4 == 0xffffffff), HDR_BROADCAST, 0)
+
+    # IPv6, following the common extension headers
+    is_ip6 = (ethertype == ETH_P_IPV6) & ((version_byte >> 4) == 6) & (l3 + 40 <= ends)
+    next_header = buf.u8(l3 + 6)
+    ip6_l4 = l3 + 40
+    for _ in range(MAX_IPV6_EXTENSIONS):
+        extension = is_ip6 & np.isin(next_header, IPV6_EXTENSION_HEADERS) & (ip6_l4 + 8 <= ends)
+        if not extension.any():
+            break
+        # Only a fragment with a non-zero offset lacks the transport header
+        later_fragment = extension & (next_header == 44) & ((buf.u16(ip6_l4 + 2) & 0xfff8) != 0)
+        flags |= np.where(later_fragment, HDR_FRAGMENT, 0)
+        ext_len = np.where(next_header == 44, 8, (buf.u8(ip6_l4 + 1) + 1) * 8)
+        next_header = np.where(extension, buf.u8(ip6_l4), next_header)
+        ip6_l4 = np.where(extension, ip6_l4 + ext_len, ip6_l4)
+    ip6_end = l3 + 40 + buf.u16(l3 + 4)
+    for field, offset in (('src_ip6', 8), ('dst_ip6', 24)):
+        out[field][:, 0] = np.where(is_ip6, buf.u64(l3 + offset), 0)
+        out[field][:, 1] = np.where(is_ip6, buf.u64(l3 + offset + 8), 0)
+
+    is_ip = is_ip4 | is_ip6
+    out['ip_version'] = np.where(is_ip4, 4, np.where(is_ip6, 6, 0))
+    out['ttl'] = np.where(is_ip4, buf.u8(l3 + 8), np.where(is_ip6, buf.u8(l3 + 7), 0))
+    proto = np.where(is_ip4, buf.u8(l3 + 9), np.where(is_ip6, next_header, 0))
+    out['proto'] = proto
+    l4 = np.where(is_ip4, l3 + ihl, ip6_l4)
+    ip_end = np.minimum(np.where(is_ip4, ip4_end, ip6_end), ends)
+    out['l4_offset'] = np.where(is_ip, np.clip(l4 - starts, 0, 0xffff), 0)
+
+    # Transport layer; non-first fragments carry no transport header
+    first_fragment = is_ip & ((flags & HDR_FRAGMENT) == 0)
+    is_tcp = first_fragment & (proto == 6) & (l4 + 20 <= ends)
+    is_udp = first_fragment & (proto == 17) & (l4 + 8 <= ends)
+    has_ports = is_tcp | is_udp
+    src_port = np.where(has_ports, buf.u16(l4), 0)
+    dst_port = np.where(has_ports, buf.u16(l4 + 2), 0)
+    out['src_port'] = src_port
+    out['dst_port'] = dst_port
+    out['tcp_flags'] = np.where(is_tcp, buf.u8(l4 + 13), 0)
+    flags |= np.where(is_tcp, HDR_TCP, 0)
+    flags |= np.where(is_udp, HDR_UDP, 0)
+
+    dns = has_ports & (np.isin(src_port, DNS_PORTS) | np.isin(dst_port, DNS_PORTS))
+    flags |= np.where(dns, HDR_DNS, 0)
+    llmnr = is_udp & ((src_port == LLMNR_PORT) | (dst_port == LLMNR_PORT))
+    flags |= np.where(llmnr, HDR_LLMNR, 0)
+    icmpv6_ns = is_ip6 & (proto == 58) & (l4 < ends) & (buf.u8(l4) == 135)
+    flags |= np.where(icmpv6_ns, HDR_ICMPV6_ND, 0)
+
+    # Payload after the transport header, bounded by the IP length and the capture
+    tcp_header = (buf.u8(l4 + 12) >> 4) * 4
+    payload_start = np.where(is_tcp, l4 + tcp_header, np.where(is_udp, l4 + 8, ends))
+    payload_length = np.where(has_ports, np.maximum(ip_end - payload_start, 0), 0)
+    out['payload_offset'] = np.where(payload_length > 0, payload_start - starts, 0)
+    out['payload_length'] = payload_length
+
+    out['flags'] = flags
+    return out
+
+
+def ip4_to_str(value):
+    """Format an integer IPv4 address from a parsed batch."""
+    value = int(value)
+    return f"{value >> 24}.{(value >> 16) & 0xff}.{(value >> 8) & 0xff}.{value & 0xff}"
@@ -0,0 +1,141 @@
+"""
+This script handles per-flow payload inspection budgets (flow depth).
+"""
+
+from collections import OrderedDict
+from flow_table import FlowTable, TCP_SYN, TCP_ACK
+
+
+class FlowBudget:
+    """Inspection state for one bidirectional flow; index 0 is the direction from the lower endpoint."""
+
+    __slots__ = ('max_bytes', 'max_packets', 'bytes', 'packets', 'binary_payloads', 'encrypted')
+
+    def __init__(self, max_bytes, max_packets):
+        """Start with nothing inspected in either direction."""
+        self.max_bytes = max_bytes
+        self.max_packets = max_packets
+        self.bytes = [0, 0]
+        self.packets = [0, 0]
+        self.binary_payloads = 0
+        self.encrypted = False
+
+
+class InspectionBudget:
+    """
+    Limits payload inspection to the start of each flow direction.
+
+    Like the flow depth setting of IDS engines, only the first max_bytes
+    payload bytes and first max_packets payload packets of each direction
+    are inspected; the rest of the flow, such as the body of a bulk
+    download, is skipped before its payload is even sliced out of the frame.
+    Flows whose payloads are classified as binary encrypted_after times are
+    treated as encrypted and skipped entirely. A SYN without ACK starts a new
+    connection and resets the flow's budget.
+    """
+
+    def __init__(self, max_bytes=8192, max_packets=16, port_overrides=None,
+                 encrypted_after=2, max_flows=100000):
+        """
+        Initialize the budget.
+
+        Args:
+            max_bytes: Payload bytes inspected per flow direction; None for no limit
+            max_packets: Payload packets inspected per flow direction; None for no limit
+            port_overrides: Dict of port -> (max_bytes, max_packets) for flows to or
+                from that port
+            encrypted_after: Binary payloads after which a flow is skipped as encrypted
+            max_flows: Maximum flows tracked; the least recently seen is forgotten first
+        """
+        self.max_bytes = max_bytes
+        self.max_packets = max_packets
+        self.port_overrides = dict(port_overrides or {})
+        self.encrypted_after = encrypted_after
+        self.max_flows = max_flows
+        self.flows = OrderedDict()
+        self.stats = {
+            'bytes_inspected': 0,
+            'bytes_skipped': 0,
+            'packets_inspected': 0,
+            'packets_skipped': 0,
+            'encrypted_flows': 0,
+        }
+
+    def _limits(self, record):
+        """Byte and packet budget for the flow of a record."""
+        for port in (record.dst_port, record.src_port):
+            if port in self.port_overrides:
+                return self.port_overrides[port]
+        return self.max_bytes, self.max_packets
+
+    def _budget(self, key, record):
+        """Get or create the budget of a flow, resetting it when a new connection starts."""
+        budget = self.flows.get(key)
+        if budget is not None and record.tcp_flags & (TCP_SYN | TCP_ACK) == TCP_SYN:
+            budget = None
+        if budget is None:
+            if key not in self.flows and len(self.flows) >= self.max_flows:
+                self.flows.popitem(last=False)
+            budget = FlowBudget(*self._limits(record))
+            self.flows[key] = budget
+        self.flows.move_to_end(key)
+        return budget
+
+    def inspect_length(self, record):
+        """
+        Account for a payload packet and decide how much of it to inspect.
+
+        Args:
+            record: DecodedPacket
+
+        Returns:
+            int: Number of leading payload bytes to inspect; 0 to skip the packet
+        """
+        length = record.payload_length
+        if not length:
+            # A bare SYN opens a new connection on this 5-tuple
+            if record.tcp_flags & (TCP_SYN | TCP_ACK) == TCP_SYN:
+                self.flows.pop(FlowTable.flow_key(record), None)
+            return 0
+        key = FlowTable.flow_key(record)
+        if key is None:
+            self.stats['bytes_inspected'] += length
+            self.stats['packets_inspected'] += 1
+            return length
+
+        budget = self._budget(key, record)
+        direction = 0 if (record.src_ip, record.src_port) == key[1] else 1
+        inspected = budget.bytes[direction]
+
+        allowed = length
+        if budget.encrypted:
+            allowed = 0
+        else:
+            if budget.max_packets is not None and budget.packets[direction] >= budget.max_packets:
+                allowed = 0
+            if budget.max_bytes is not None:
+                allowed = max(0, min(allowed, budget.max_bytes - inspected))
+
+        if allowed:
+            budget.bytes[direction] = inspected + allowed
+            budget.packets[direction] += 1
+            self.stats['packets_inspected'] += 1
+        else:
+            self.stats['packets_skipped'] += 1
+        self.stats['bytes_inspected'] += allowed
+        self.stats['bytes_skipped'] += length - allowed
+        return allowed
+
+    def mark_binary(self, record):
+        """Record that a payload of the record's flow was classified as binary or encrypted."""
+        key = FlowTable.flow_key(record)
+        budget = self.flows.get(key) if key is not None else None
+        if budget is None or budget.encrypted:
+            return
+        budget.binary_payloads += 1
+        if budget.binary_payloads >= self.encrypted_after:
+            budget.encrypted = True
+            self.stats['encrypted_flows'] += 1
+
+    def __len__(self):
+        return len(self.flows)
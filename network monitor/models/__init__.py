@@ -3,6 +3,7 @@ This script handles   init  .
 """
 
 from .persistent_anomaly_detector import PersistentAnomalyDetector
+from .checkpointer import Checkpointer
 from .deep_packet_analyzer import DeepPacketAnalyzer, SequenceAnomalyDetector
 
-__all__ = ['PersistentAnomalyDetector', 'DeepPacketAnalyzer', 'SequenceAnomalyDetector']
\ No newline at end of file
+__all__ = ['PersistentAnomalyDetector', 'Checkpointer', 'DeepPacketAnalyzer', 'SequenceAnomalyDetector']
\ No newline at end of file
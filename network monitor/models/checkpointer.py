@@ -0,0 +1,216 @@
+"""
+This script handles atomic, versioned model checkpoints written by a background thread.
+"""
+
+import os
+import tempfile
+import threading
+import joblib
+
+
+def checkpoint_versions(path, keep):
+    """
+    Paths of a checkpoint's versions, newest first.
+
+    The current version is path itself; older ones are path.1, path.2, ...
+    """
+    return [path] + [f"{path}.{index}" for index in range(1, keep)]
+
+
+def write_checkpoint(path, state, keep=3):
+    """
+    Atomically write state to path, keeping the previous versions.
+
+    The state is dumped to a temporary file in the same directory, flushed to
+    disk, and renamed over path, so a crash leaves either the old or the new
+    file, never a partial one. The replaced file becomes path.1, path.1
+    becomes path.2, and so on up to keep versions in total.
+
+    Returns:
+        int: Bytes written
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix='.tmp', dir=directory)
+    handle = None
+    try:
+        # mkstemp creates the file private; keep the mode of the file being replaced
+        mode = os.stat(path).st_mode & 0o777 if os.path.exists(path) else 0o644
+        if hasattr(os, 'fchmod'):
+            os.fchmod(fd, mode)
+        # The handle owns fd from here on and closes it
+        handle = os.fdopen(fd, 'wb')
+        with handle:
+            joblib.dump(state, handle)
+            handle.flush()
+            os.fsync(handle.fileno())
+            size = handle.tell()
+        if not hasattr(os, 'fchmod'):
+            # Windows before Python 3.13 has no fchmod
+            os.chmod(temp_path, mode)
+
+        versions = checkpoint_versions(path, keep)
+        for older, newer in reversed(list(zip(versions[1:], versions[2:]))):
+            if os.path.exists(older):
+                os.replace(older, newer)
+        if len(versions) > 1 and os.path.exists(path):
+            # Keep the current file in place until the new one replaces it
+            try:
+                os.link(path, versions[1])
+            except OSError:
+                os.replace(path, versions[1])
+        os.replace(temp_path, path)
+    except BaseException:
+        if handle is None:
+            # Close fd first: an open file cannot be unlinked on Windows
+            os.close(fd)
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+    try:
+        # Make the renames themselves durable
+        dir_fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+    except OSError:
+        pass
+    return size
+
+
+def load_checkpoint(path, keep=3, validate=None):
+    """
+    Load the newest readable version of a checkpoint.
+
+    Args:
+        path: Checkpoint path
+        keep: Versions to try, newest first
+        validate: Optional callable that raises if a loaded state is unusable
+
+    Returns:
+        tuple: (state, path it was loaded from), or (None, None) if no version exists
+
+    Raises:
+        Exception: The error of the newest version if versions exist but none loads
+    """
+    first_error = None
+    for candidate in checkpoint_versions(path, keep):
+        if not os.path.exists(candidate):
+            continue
+        try:
+            state = joblib.load(candidate)
+            if validate is not None:
+                validate(state)
+            return state, candidate
+        except Exception as e:
+            if first_error is None:
+                first_error = e
+    if first_error is not None:
+        raise first_error
+    return None, None
+
+
+class Checkpointer:
+    """
+    Writes checkpoints on a background thread so saving never blocks the caller.
+
+    save() only queues a state snapshot, which the caller must not mutate
+    afterwards. Requests for the same path are coalesced: if a save is still
+    queued when a newer one arrives, only the newer state is written. Every
+    write is atomic and keeps the last keep versions (see write_checkpoint).
+    close() writes everything still queued before returning.
+    """
+
+    def __init__(self, logger=None, keep=3):
+        """
+        Start the writer thread.
+
+        Args:
+            logger: Logger for write errors; errors are printed if not given
+            keep: Versions kept per checkpoint, including the current one
+        """
+        self.logger = logger
+        self.keep = keep
+        self.pending = {}               # path -> newest queued state
+        self.order = []                 # Paths in the order they were first queued
+        self.writing = None
+        self.closed = False
+        self.condition = threading.Condition()
+        self.stats = {'requested': 0, 'coalesced': 0, 'written': 0, 'failed': 0, 'bytes': 0}
+        self.thread = threading.Thread(target=self._run, name='checkpointer', daemon=True)
+        self.thread.start()
+
+    def save(self, path, state):
+        """
+        Queue a state to be written to path.
+
+        Returns:
+            bool: False if the checkpointer is closed and the state was not queued
+        """
+        with self.condition:
+            if self.closed:
+                return False
+            self.stats['requested'] += 1
+            if path in self.pending:
+                self.stats['coalesced'] += 1
+            else:
+                self.order.append(path)
+            self.pending[path] = state
+            self.condition.notify()
+        return True
+
+    def _run(self):
+        """Write queued states until closed and drained."""
+        while True:
+            with self.condition:
+                while not self.order and not self.closed:
+                    self.condition.wait()
+                if not self.order:
+                    return
+                path = self.order.pop(0)
+                state = self.pending.pop(path)
+                self.writing = path
+            try:
+                size = write_checkpoint(path, state, self.keep)
+                with self.condition:
+                    self.stats['written'] += 1
+                    self.stats['bytes'] += size
+            except Exception as e:
+                with self.condition:
+                    self.stats['failed'] += 1
+                self._warn(f"Error writing checkpoint {path}: {e}")
+            finally:
+                with self.condition:
+                    self.writing = None
+                    self.condition.notify_all()
+
+    def _warn(self, message):
+        """Report a write error."""
+        if self.logger is not None:
+            self.logger.error(message)
+        else:
+            print(f"Warning: {message}")
+
+    def flush(self, timeout=None):
+        """
+        Wait until every queued state is written.
+
+        Returns:
+            bool: True if the queue drained within the timeout
+        """
+        with self.condition:
+            return self.condition.wait_for(lambda: not self.order and self.writing is None, timeout)
+
+    def close(self, timeout=None):
+        """
+        Write everything still queued, then stop the writer thread.
+
+        Returns:
+            bool: True if the thread finished within the timeout
+        """
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join(timeout)
+        return not self.thread.is_alive()
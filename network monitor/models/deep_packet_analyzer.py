@@ -4,22 +4,53 @@ Deep Learning-based Packet Analyzer for Network Traffic Analysis
 
 import numpy as np
 import pandas as pd
-try:
-    from sklearn.preprocessing import StandardScaler
-    from sklearn.ensemble import RandomForestClassifier
-    from sklearn.neural_network import MLPClassifier
-except ImportError:
-    print("Warning: scikit-learn not available. Some functionality will be limited.")
+from .mlp_inference import MlpInferenceEngine
 
-try:
-    import torch
-    import torch.nn as nn
-    import torch.optim as optim
-    from torch.utils.data import DataLoader, TensorDataset
-except ImportError:
-    print("Warning: PyTorch not available. Deep learning functionality will be limited.")
-    torch = None
-    nn = None
+# scikit-learn and PyTorch take seconds to import, so they are imported by
+# _load_sklearn() and _load_torch() when a model first needs them
+StandardScaler = RandomForestClassifier = MLPClassifier = None
+torch = nn = optim = DataLoader = TensorDataset = None
+_missing = set()
+
+
+def _load_sklearn():
+    """
+    Import scikit-learn on first use.
+
+    Returns:
+        bool: True if scikit-learn is available
+    """
+    global StandardScaler, RandomForestClassifier, MLPClassifier
+    if StandardScaler is None and 'sklearn' not in _missing:
+        try:
+            from sklearn.preprocessing import StandardScaler
+            from sklearn.ensemble import RandomForestClassifier
+            from sklearn.neural_network import MLPClassifier
+        except ImportError:
+            _missing.add('sklearn')
+            print("Warning: scikit-learn not available. Some functionality will be limited.")
+    return StandardScaler is not None
+
+
+def _load_torch():
+    """
+    Import PyTorch on first use.
+
+    Returns:
+        bool: True if PyTorch is available
+    """
+    global torch, nn, optim, DataLoader, TensorDataset
+    if torch is None and 'torch' not in _missing:
+        try:
+            import torch
+            import torch.nn as nn
+            import torch.optim as optim
+            from torch.utils.data import DataLoader, TensorDataset
+        except ImportError:
+            _missing.add('torch')
+            torch = nn = None
+            print("Warning: PyTorch not available. Deep learning functionality will be limited.")
+    return torch is not None
 
 class DeepPacketAnalyzer:
     """
@@ -35,16 +66,19 @@ class DeepPacketAnalyzer:
             model_type (str): Type of model to use ('random_forest', 'neural_network', 'deep_nn')
         """
         self.model_type = model_type
-        self.model = None
-        self.scaler = StandardScaler()
+        self.model = None               # Created by the first fit(), with the scaler
+        self.scaler = None
         self.is_fitted = False
         self.feature_names = None
-        
-        # Initialize the appropriate model
-        self._initialize_model()
+        self.engine = None              # NumPy forward pass of a trained network
+        self.inference_threads = None   # BLAS threads chosen for the engine on the first build
     
     def _initialize_model(self):
-        """Initialize the model based on the specified type."""
+        """Initialize the scaler and the model based on the specified type."""
+        _load_sklearn()
+        if self.model_type == 'deep_nn':
+            _load_torch()
+        self.scaler = StandardScaler()
         try:
             if self.model_type == 'random_forest':
                 self.model = RandomForestClassifier(
@@ -76,6 +110,30 @@ class DeepPacketAnalyzer:
             # Fallback to a simple model
             self.model = RandomForestClassifier(n_estimators=10, max_depth=5, random_state=42)
     
+    def _as_matrix(self, X):
+        """
+        Return X as a float32 feature matrix.
+
+        A float32 ndarray, such as the output of FeatureExtractor.extract_matrix,
+        is used as is without copying; DataFrames are converted once.
+        """
+        if isinstance(X, pd.DataFrame):
+            # Validate feature names if available
+            if self.feature_names is not None and list(X.columns) != self.feature_names:
+                print("Warning: Feature names do not match training data")
+            return X.to_numpy(dtype=np.float32)
+        return np.asarray(X, dtype=np.float32)
+
+    def _build_engine(self):
+        """Export a trained network, with the scaler folded in, to the NumPy inference engine."""
+        try:
+            self.engine = MlpInferenceEngine.from_model(self.model, self.scaler, self.inference_threads)
+            if self.engine is not None and self.inference_threads is None:
+                self.inference_threads = self.engine.tune_threads()
+        except Exception as e:
+            print(f"Error building inference engine: {e}")
+            self.engine = None
+
     def fit(self, X, y):
         """
         Train the model with the provided data.
@@ -85,13 +143,13 @@ class DeepPacketAnalyzer:
             y (array): Labels (0 for normal, 1 for anomaly)
         """
         try:
-            # Convert DataFrame to numpy array if needed
             if isinstance(X, pd.DataFrame):
                 # Store feature names for later validation
                 self.feature_names = X.columns.tolist()
-                X_values = X.values.astype(np.float32)
-            else:
-                X_values = np.asarray(X, dtype=np.float32)
+            X_values = self._as_matrix(X)
+            if self.model is None:
+                self._initialize_model()
+            self.engine = None
             
             # Scale the features
             X_scaled = self.scaler.fit_transform(X_values)
@@ -106,6 +164,7 @@ class DeepPacketAnalyzer:
                 self.model.fit(X_scaled, y_values)
             
             self.is_fitted = True
+            self._build_engine()
         except Exception as e:
             print(f"Error training model: {e}")
     
@@ -123,14 +182,10 @@ class DeepPacketAnalyzer:
             if not self.is_fitted:
                 raise ValueError("Model is not fitted yet. Call 'fit' first.")
             
-            # Convert DataFrame to numpy array if needed
-            if isinstance(X, pd.DataFrame):
-                # Validate feature names if available
-                if self.feature_names is not None and list(X.columns) != self.feature_names:
-                    print("Warning: Feature names do not match training data")
-                X_values = X.values.astype(np.float32)
-            else:
-                X_values = np.asarray(X, dtype=np.float32)
+            X_values = self._as_matrix(X)
+            if getattr(self, 'engine', None) is not None:
+                # The engine scales the features in its first layer
+                return self.engine.predict(X_values)
             
             # Scale the features
             X_scaled = self.scaler.transform(X_values)
@@ -158,14 +213,10 @@ class DeepPacketAnalyzer:
             if not self.is_fitted:
                 raise ValueError("Model is not fitted yet. Call 'fit' first.")
             
-            # Convert DataFrame to numpy array if needed
-            if isinstance(X, pd.DataFrame):
-                # Validate feature names if available
-                if self.feature_names is not None and list(X.columns) != self.feature_names:
-                    print("Warning: Feature names do not match training data")
-                X_values = X.values.astype(np.float32)
-            else:
-                X_values = np.asarray(X, dtype=np.float32)
+            X_values = self._as_matrix(X)
+            if getattr(self, 'engine', None) is not None:
+                # The engine scales the features in its first layer; copy its reused output buffer
+                return self.engine.predict_proba(X_values).copy()
             
             # Scale the features
             X_scaled = self.scaler.transform(X_values)
@@ -203,7 +254,7 @@ class DeepNeuralNetwork:
             hidden_sizes (list): Sizes of hidden layers
             num_classes (int): Number of output classes
         """
-        if torch is None:
+        if not _load_torch():
             raise ImportError("PyTorch is required for DeepNeuralNetwork")
         
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
@@ -337,7 +388,7 @@ class SequenceAnomalyDetector:
         """
         self.sequence_length = sequence_length
         self.model = None
-        self.scaler = StandardScaler()
+        self.scaler = None              # Created by fit()
         self.is_fitted = False
     
     def _create_sequences(self, data):
@@ -377,6 +428,8 @@ class SequenceAnomalyDetector:
                 X_values = X
             
             # Scale the features
+            _load_sklearn()
+            self.scaler = StandardScaler()
             X_scaled = self.scaler.fit_transform(X_values)
             
             # Create sequences
@@ -0,0 +1,230 @@
+"""
+This script handles a streaming Half-Space Trees anomaly model with constant-time updates.
+"""
+
+import numpy as np
+
+
+class HalfSpaceTrees:
+    """
+    Streaming anomaly detector (Tan, Ting and Liu, "Fast Anomaly Detection for
+    Streaming Data", IJCAI 2011).
+
+    Each tree halves a random work range along a random feature at every node,
+    down to a fixed height; the trees do not depend on the data. Every sample
+    is counted in the nodes on its path in each tree. Counting runs in
+    windows of window_size samples: the reference mass scores samples, while
+    the current window fills up. A complete window is blended into the
+    reference mass with weight 1 - decay, so the reference remembers about
+    1 / (1 - decay) windows, not just the last one, and traffic that
+    disappears for a while is not flagged as soon as it comes back. A sample
+    that lands in nodes with little reference mass is anomalous.
+
+    An update costs n_trees * height node visits per sample, whatever has been
+    seen before, and memory is fixed at four arrays of n_trees * 2**(height+1)
+    nodes. Features are scaled with sign(x) * log1p(|x|) and then to [0, 1]
+    using the range seen in the first update, since packet lengths and ports
+    span several orders of magnitude. Later values outside that range still
+    fall into the outer half-spaces.
+    """
+
+    def __init__(self, n_trees=25, height=10, window_size=256, size_limit=None,
+                 decay=0.99, contamination=0.01, random_state=42):
+        """
+        Initialize the model; the trees are built on the first update.
+
+        Args:
+            n_trees: Number of trees
+            height: Depth of every tree
+            window_size: Samples per counting window
+            size_limit: Reference mass below which scoring stops descending;
+                defaults to 10% of the window
+            decay: Weight the reference mass keeps when a window completes;
+                0 replaces it with the last window, as in the original algorithm
+            contamination: Share of samples predict() flags as anomalies
+            random_state: Seed for the random trees
+        """
+        self.n_trees = n_trees
+        self.height = height
+        self.window_size = window_size
+        self.size_limit = size_limit if size_limit is not None else max(1, window_size // 10)
+        self.decay = decay
+        self.contamination = contamination
+        self.random_state = random_state
+
+        self.n_features_in_ = None
+        self.offset = None              # Minimum of the transformed features
+        self.scale = None               # 1 / range of the transformed features
+        self.split_feature = None       # (n_trees, internal nodes) feature index per node
+        self.split_value = None         # (n_trees, internal nodes) split point per node
+        self.reference_mass = None      # (n_trees, nodes) decayed reference mass of past windows
+        self.latest_mass = None         # (n_trees, nodes) counts of the current window
+        self.window_count = 0           # Samples counted in the current window
+        self.windows = 0                # Complete windows seen
+        self.recent_scores = None       # Scores of recent samples, for the predict() threshold
+        self.recent_index = 0
+        self.recent_filled = 0
+        self.threshold_ = None
+
+    @property
+    def is_fitted(self):
+        """True once a complete window provides reference mass."""
+        return self.windows > 0
+
+    def _transform(self, X):
+        """Log-scale the features, then map the first update's range to [0, 1]."""
+        X = np.asarray(X, dtype=np.float64)
+        X = np.sign(X) * np.log1p(np.abs(X))
+        return (X - self.offset) * self.scale
+
+    def _build(self, X):
+        """Set the feature scaling from X and draw the random trees."""
+        rng = np.random.default_rng(self.random_state)
+        n_features = X.shape[1]
+        transformed = np.sign(X) * np.log1p(np.abs(X))
+        low, high = transformed.min(axis=0), transformed.max(axis=0)
+        span = np.where(high > low, high - low, 1.0)
+        self.n_features_in_ = n_features
+        self.offset = low
+        self.scale = 1.0 / span
+
+        internal = (1 << self.height) - 1
+        nodes = (1 << (self.height + 1)) - 1
+        self.split_feature = np.zeros((self.n_trees, internal), dtype=np.intp)
+        self.split_value = np.zeros((self.n_trees, internal), dtype=np.float64)
+        for tree in range(self.n_trees):
+            # Work range of each feature: a random point in [0, 1] +- twice its
+            # larger distance to the bounds, so it always covers [0, 1]
+            center = rng.random(n_features)
+            radius = 2 * np.maximum(center, 1 - center)
+            low_bounds = np.empty((nodes, n_features))
+            high_bounds = np.empty((nodes, n_features))
+            low_bounds[0], high_bounds[0] = center - radius, center + radius
+            features = rng.integers(0, n_features, internal)
+            for node in range(internal):
+                feature = features[node]
+                low, high = low_bounds[node], high_bounds[node]
+                middle = (low[feature] + high[feature]) / 2
+                self.split_feature[tree, node] = feature
+                self.split_value[tree, node] = middle
+                left, right = 2 * node + 1, 2 * node + 2
+                low_bounds[left], high_bounds[left] = low, high
+                low_bounds[right], high_bounds[right] = low, high
+                high_bounds[left, feature] = middle
+                low_bounds[right, feature] = middle
+
+        self.reference_mass = np.zeros((self.n_trees, nodes), dtype=np.float64)
+        self.latest_mass = np.zeros((self.n_trees, nodes), dtype=np.float64)
+        self.recent_scores = np.zeros(self.window_size, dtype=np.float64)
+
+    def _paths(self, X):
+        """Node index of every sample at every depth of every tree, shape (height + 1, n_trees, n)."""
+        # Flat indexes into the split arrays and X avoid 2-D fancy indexing
+        X = np.ascontiguousarray(X)
+        tree_offset = (np.arange(self.n_trees) * self.split_feature.shape[1])[:, np.newaxis]
+        row_offset = np.arange(len(X)) * X.shape[1]
+        split_feature = self.split_feature.ravel()
+        split_value = self.split_value.ravel()
+        values = X.ravel()
+        node = np.zeros((self.n_trees, len(X)), dtype=np.intp)
+        paths = np.empty((self.height + 1, self.n_trees, len(X)), dtype=np.intp)
+        paths[0] = node
+        for depth in range(self.height):
+            index = node + tree_offset
+            right = values.take(split_feature.take(index) + row_offset) >= split_value.take(index)
+            node = 2 * node + 1 + right
+            paths[depth + 1] = node
+        return paths
+
+    def _mass_scores(self, paths):
+        """Reference mass of each sample's deepest sufficiently populated node, scaled by 2**depth."""
+        tree_offset = (np.arange(self.n_trees) * self.reference_mass.shape[1])[:, np.newaxis]
+        reference_mass = self.reference_mass.ravel()
+        scores = np.zeros(paths.shape[1:], dtype=np.float64)
+        done = np.zeros(paths.shape[1:], dtype=bool)
+        for depth in range(self.height + 1):
+            mass = reference_mass.take(paths[depth] + tree_offset)
+            stop = ~done & ((mass < self.size_limit) | (depth == self.height))
+            scores[stop] = mass[stop] * (1 << depth)
+            done |= stop
+        # Higher in densely populated regions, 0 where the decayed reference mass is empty
+        return scores.sum(axis=0) / (self.n_trees * self.window_size)
+
+    def _remember_scores(self, scores):
+        """Keep the scores of the last window_size samples for the predict() threshold."""
+        for start in range(0, len(scores), self.window_size):
+            chunk = scores[start:start + self.window_size]
+            end = self.recent_index + len(chunk)
+            if end <= self.window_size:
+                self.recent_scores[self.recent_index:end] = chunk
+            else:
+                split = self.window_size - self.recent_index
+                self.recent_scores[self.recent_index:] = chunk[:split]
+                self.recent_scores[:end - self.window_size] = chunk[split:]
+            self.recent_index = end % self.window_size
+            self.recent_filled = min(self.window_size, self.recent_filled + len(chunk))
+        self.threshold_ = float(np.quantile(self.recent_scores[:self.recent_filled], self.contamination))
+
+    def partial_fit(self, X):
+        """
+        Count a batch of samples, rolling the window whenever it fills.
+
+        Args:
+            X: 2-D feature matrix
+
+        Returns:
+            HalfSpaceTrees: self
+        """
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or not len(X):
+            return self
+        if self.n_features_in_ is None:
+            self._build(X)
+        elif X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X has {X.shape[1]} features, the model expects {self.n_features_in_}")
+
+        scaled = self._transform(X)
+        start = 0
+        while start < len(scaled):
+            # Never count past the end of the current window
+            end = min(len(scaled), start + self.window_size - self.window_count)
+            paths = self._paths(scaled[start:end])
+            if self.is_fitted:
+                self._remember_scores(self._mass_scores(paths))
+            nodes = self.latest_mass.shape[1]
+            flat = (paths + np.arange(self.n_trees)[:, np.newaxis] * nodes).ravel()
+            self.latest_mass += np.bincount(flat, minlength=self.latest_mass.size).reshape(self.latest_mass.shape)
+            self.window_count += end - start
+            start = end
+            if self.window_count == self.window_size:
+                if self.windows:
+                    self.reference_mass *= self.decay
+                    self.reference_mass += (1 - self.decay) * self.latest_mass
+                else:
+                    self.reference_mass[:] = self.latest_mass
+                self.latest_mass.fill(0)
+                self.window_count = 0
+                self.windows += 1
+        return self
+
+    def score_samples(self, X):
+        """
+        Normality score of each sample; lower is more anomalous, as in IsolationForest.
+
+        Returns:
+            ndarray: Non-negative scores, 0 in regions with no decayed reference mass
+        """
+        if not self.is_fitted:
+            raise ValueError("Model is not fitted yet. Call 'partial_fit' first.")
+        return self._mass_scores(self._paths(self._transform(X)))
+
+    def predict(self, X):
+        """
+        Label each sample 1 (normal) or -1 (anomaly), as IsolationForest does.
+
+        A sample is an anomaly if it scores below the contamination quantile of
+        the scores of the most recent window_size updates.
+        """
+        scores = self.score_samples(X)
+        threshold = self.threshold_ if self.threshold_ is not None else 0.0
+        return np.where(scores < threshold, -1, 1)
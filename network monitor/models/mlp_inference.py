@@ -0,0 +1,265 @@
+"""
+This script handles a NumPy-only inference engine for trained multilayer perceptrons.
+"""
+
+import os
+import time
+from contextlib import nullcontext
+import numpy as np
+
+HIDDEN_ACTIVATIONS = ('relu', 'tanh', 'logistic', 'identity')
+
+# threadpoolctl is imported when a thread count is first applied
+_controller = None
+_controller_missing = False
+
+
+def _threadpool_controller():
+    """Shared threadpoolctl controller for the BLAS thread pool, or None if threadpoolctl is missing."""
+    global _controller, _controller_missing
+    if _controller is None and not _controller_missing:
+        try:
+            from threadpoolctl import ThreadpoolController
+            _controller = ThreadpoolController()
+        except ImportError:
+            _controller_missing = True
+            print("Warning: threadpoolctl not available. Inference thread counts will not be applied.")
+    return _controller
+
+
+def _sigmoid(buffer):
+    """Logistic function, in place."""
+    np.negative(buffer, out=buffer)
+    with np.errstate(over='ignore'):
+        # Overflows to inf for very negative inputs, whose result is then 0 as it should be
+        np.exp(buffer, out=buffer)
+    buffer += 1
+    np.reciprocal(buffer, out=buffer)
+
+
+def _activate(buffer, activation):
+    """Apply a hidden layer activation, in place."""
+    if activation == 'relu':
+        np.maximum(buffer, 0, out=buffer)
+    elif activation == 'tanh':
+        np.tanh(buffer, out=buffer)
+    elif activation == 'logistic':
+        _sigmoid(buffer)
+
+
+class MlpInferenceEngine:
+    """
+    Forward pass of a trained multilayer perceptron in NumPy, for CPU inference.
+
+    The weights are exported once from a trained network: a PyTorch
+    DeepNeuralNetwork (or nn.Sequential of Linear, ReLU and Dropout layers),
+    or a scikit-learn MLPClassifier. Dropout is skipped, as in eval mode.
+
+    The input scaler's standardization is folded into the first layer. With
+    x' = (x - mean) / scale, W x' + b equals (W / scale) x + (b - W (mean / scale)),
+    so raw features go straight into the network.
+
+    Every layer writes into a buffer that is allocated for the largest batch
+    seen so far and reused afterwards, so steady-state inference allocates
+    nothing but the softmax row reductions. The BLAS thread count can be
+    limited for the forward pass; for a network this small, fewer threads
+    than cores are often faster (see tune_threads).
+    """
+
+    def __init__(self, weights, biases, activation='relu', output='softmax',
+                 mean=None, scale=None, classes=None, threads=None):
+        """
+        Initialize the engine from exported weights.
+
+        Args:
+            weights: Weight matrix of each layer, shaped (inputs, outputs)
+            biases: Bias vector of each layer
+            activation: Hidden layer activation: relu, tanh, logistic or identity
+            output: Output activation: softmax, or logistic for a single-unit
+                binary output, which is expanded to two probability columns
+            mean: Optional scaler mean to fold into the first layer
+            scale: Optional scaler standard deviation to fold into the first layer
+            classes: Class label of each probability column; defaults to 0..n-1
+            threads: BLAS threads used for the forward pass; None leaves the pool as is
+        """
+        if activation not in HIDDEN_ACTIVATIONS:
+            raise ValueError(f"Unsupported activation: {activation}")
+        if output not in ('softmax', 'logistic'):
+            raise ValueError(f"Unsupported output activation: {output}")
+        weights = [np.asarray(weight, dtype=np.float64) for weight in weights]
+        biases = [np.asarray(bias, dtype=np.float64).ravel() for bias in biases]
+        if output == 'logistic' and weights[-1].shape[1] != 1:
+            raise ValueError("A logistic output needs a single output unit")
+
+        # Fold standardization into the first layer, in float64 before rounding to float32
+        if scale is not None:
+            weights[0] = weights[0] / np.asarray(scale, dtype=np.float64)[:, np.newaxis]
+        if mean is not None:
+            biases[0] = biases[0] - np.asarray(mean, dtype=np.float64) @ weights[0]
+
+        self.weights = [np.ascontiguousarray(weight, dtype=np.float32) for weight in weights]
+        self.biases = [np.ascontiguousarray(bias, dtype=np.float32) for bias in biases]
+        self.activation = activation
+        self.output_activation = output
+        self.n_features_in_ = self.weights[0].shape[0]
+        self.n_outputs = 2 if output == 'logistic' else self.weights[-1].shape[1]
+        self.classes_ = np.asarray(classes) if classes is not None else np.arange(self.n_outputs)
+        self.threads = threads
+        self.capacity = 0               # Rows the buffers hold; grown on demand
+        self.input = None
+        self.layers = None
+        self.output = None
+
+    @classmethod
+    def from_model(cls, model, scaler=None, threads=None):
+        """
+        Export a trained network.
+
+        Args:
+            model: Trained DeepNeuralNetwork, nn.Sequential or MLPClassifier
+            scaler: Optional fitted StandardScaler applied to the model's input
+            threads: BLAS threads used for the forward pass
+
+        Returns:
+            MlpInferenceEngine: The engine, or None if the model is not a supported network
+        """
+        mean = scale = None
+        if scaler is not None:
+            if getattr(scaler, 'with_mean', True):
+                mean = getattr(scaler, 'mean_', None)
+            if getattr(scaler, 'with_std', True):
+                scale = getattr(scaler, 'scale_', None)
+
+        if hasattr(model, 'coefs_') and hasattr(model, 'intercepts_'):
+            # scikit-learn MLPClassifier
+            if model.out_activation_ not in ('softmax', 'logistic') or len(getattr(model, 'classes_', [])) < 2:
+                return None
+            return cls(model.coefs_, model.intercepts_, model.activation, model.out_activation_,
+                       mean, scale, model.classes_, threads)
+
+        # PyTorch: DeepNeuralNetwork wraps an nn.Sequential in .model
+        network = getattr(model, 'model', model)
+        if type(network).__name__ != 'Sequential':
+            return None
+        weights, biases = [], []
+        for layer in network:
+            kind = type(layer).__name__
+            if kind == 'Linear':
+                weights.append(layer.weight.detach().cpu().numpy().T)
+                bias = layer.bias
+                biases.append(bias.detach().cpu().numpy() if bias is not None else np.zeros(layer.out_features))
+            elif kind not in ('ReLU', 'Dropout'):
+                return None
+        if not weights:
+            return None
+        return cls(weights, biases, 'relu', 'softmax', mean, scale, None, threads)
+
+    def __getstate__(self):
+        """Pickle the weights only; the buffers are reallocated on the first batch."""
+        state = self.__dict__.copy()
+        state.update(capacity=0, input=None, layers=None, output=None)
+        return state
+
+    def reserve(self, rows):
+        """Allocate buffers for batches of up to rows samples."""
+        if rows <= self.capacity:
+            return
+        self.input = np.empty((rows, self.n_features_in_), dtype=np.float32)
+        self.layers = [np.empty((rows, weight.shape[1]), dtype=np.float32) for weight in self.weights]
+        if self.output_activation == 'logistic':
+            self.output = np.empty((rows, 2), dtype=np.float32)
+        else:
+            self.output = self.layers[-1]
+        self.capacity = rows
+
+    def _thread_limit(self):
+        """Context that applies the thread count to the BLAS pool."""
+        controller = _threadpool_controller() if self.threads is not None else None
+        if controller is None:
+            return nullcontext()
+        return controller.limit(limits=self.threads, user_api='blas')
+
+    def predict_proba(self, X):
+        """
+        Class probabilities of unscaled feature rows.
+
+        Args:
+            X: 2-D feature matrix, ideally float32 and C-contiguous, which is used without copying
+
+        Returns:
+            ndarray: (n, n_outputs) float32 probabilities. This is the engine's
+                output buffer: the next call overwrites it, so copy it to keep it.
+        """
+        X = np.asarray(X)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected a 2-D matrix with {self.n_features_in_} features, got shape {X.shape}")
+        rows = len(X)
+        self.reserve(max(rows, 1))
+        if X.dtype == np.float32 and X.flags.c_contiguous:
+            current = X
+        else:
+            current = self.input[:rows]
+            np.copyto(current, X, casting='unsafe')
+
+        last = len(self.weights) - 1
+        with self._thread_limit():
+            for index, (weight, bias) in enumerate(zip(self.weights, self.biases)):
+                out = self.layers[index][:rows]
+                np.matmul(current, weight, out=out)
+                out += bias
+                if index < last:
+                    _activate(out, self.activation)
+                current = out
+
+            output = self.output[:rows]
+            if self.output_activation == 'logistic':
+                _sigmoid(current)
+                output[:, 1:] = current
+                np.subtract(1, current, out=output[:, :1])
+            else:
+                output -= output.max(axis=1, keepdims=True)
+                np.exp(output, out=output)
+                output /= output.sum(axis=1, keepdims=True)
+        return output
+
+    def predict(self, X):
+        """
+        Most probable class of each row.
+
+        Returns:
+            ndarray: Class labels
+        """
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+    def tune_threads(self, batch_size=1000, candidates=None, repeats=20):
+        """
+        Time the forward pass with several BLAS thread counts and keep the fastest.
+
+        Args:
+            batch_size: Rows per timed batch; use the monitor's batch size
+            candidates: Thread counts to try; defaults to powers of two up to the CPU count
+            repeats: Timed batches per candidate
+
+        Returns:
+            int: The chosen thread count, or None if there is no choice to make
+                and the pool is left as is
+        """
+        if candidates is None:
+            cpus = os.cpu_count() or 1
+            candidates = [1 << power for power in range(cpus.bit_length()) if 1 << power <= cpus]
+        if len(candidates) < 2 or _threadpool_controller() is None:
+            # Limiting the pool costs a few microseconds per batch; skip it when nothing is gained
+            self.threads = None
+            return None
+
+        sample = np.random.default_rng(0).standard_normal((batch_size, self.n_features_in_)).astype(np.float32)
+        timings = {}
+        for threads in candidates:
+            self.threads = threads
+            self.predict_proba(sample)          # Warm up
+            start = time.perf_counter()
+            for _ in range(repeats):
+                self.predict_proba(sample)
+            timings[threads] = time.perf_counter() - start
+        self.threads = min(timings, key=timings.get)
+        return self.threads
@@ -0,0 +1,96 @@
+"""
+This script handles a shared registry that constructs each model once, and model selection without importing ML frameworks.
+"""
+
+import importlib.util
+import threading
+
+# Model types in order of preference, with the framework each one needs
+MODEL_TYPES = [
+    ('deep_nn', 'torch', "Deep Neural Network model (most sophisticated)"),
+    ('neural_network', 'sklearn', "Neural Network model"),
+    ('random_forest', 'sklearn', "Random Forest model"),
+]
+
+_available = {}
+
+
+def framework_available(name):
+    """
+    Check whether a framework can be imported, without importing it.
+
+    Importing torch or scikit-learn takes seconds, so availability is decided
+    from the module spec alone; the framework itself is imported by the model
+    that first needs it.
+    """
+    if name not in _available:
+        try:
+            _available[name] = importlib.util.find_spec(name) is not None
+        except (ImportError, ValueError):
+            _available[name] = False
+    return _available[name]
+
+
+def select_model_type(requested='auto'):
+    """
+    Choose the deep analyzer model type.
+
+    Args:
+        requested: A model type, or 'auto' for the most sophisticated one available
+
+    Returns:
+        tuple: (model type, description)
+    """
+    for model_type, framework, description in MODEL_TYPES:
+        if requested == model_type or (requested == 'auto' and framework_available(framework)):
+            return model_type, description
+    # Nothing is installed: DeepPacketAnalyzer reports the missing framework when it trains
+    return MODEL_TYPES[-1][0], MODEL_TYPES[-1][2]
+
+
+class ModelRegistry:
+    """
+    Holds the models shared by the monitor's components, by name.
+
+    get() constructs a model with its factory the first time it is asked for,
+    and returns the same instance afterwards, so components that need the
+    same model no longer build copies of it. set() replaces a model, e.g.
+    with a newly trained one.
+    """
+
+    def __init__(self):
+        self.models = {}
+        self.lock = threading.Lock()
+
+    def __contains__(self, name):
+        return name in self.models
+
+    def get(self, name, factory=None):
+        """
+        Get a model, constructing it on first use.
+
+        Args:
+            name: Model name
+            factory: Callable that builds the model if it is not registered yet
+
+        Returns:
+            object: The registered model
+
+        Raises:
+            KeyError: If the model is not registered and no factory was given
+        """
+        with self.lock:
+            if name not in self.models:
+                if factory is None:
+                    raise KeyError(f"No model registered as {name!r}")
+                self.models[name] = factory()
+            return self.models[name]
+
+    def set(self, name, model):
+        """Register a model, replacing any model of the same name."""
+        with self.lock:
+            self.models[name] = model
+
+
+# Registry shared by every component of a monitor process
+shared_registry = ModelRegistry()
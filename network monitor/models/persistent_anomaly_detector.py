@@ -2,49 +2,106 @@
 This script handles persistent anomaly detector that processes data.
 """
 
-import os
-import warnings
-import joblib
+import copy
+import threading
+import numpy as np
 import pandas as pd
-from sklearn.ensemble import IsolationForest
-from sklearn.exceptions import InconsistentVersionWarning
+from .checkpointer import load_checkpoint, write_checkpoint
+from .half_space_trees import HalfSpaceTrees
 
 class PersistentAnomalyDetector:
     """
     Represents a persistent anomaly detector.
+
+    The model is a streaming Half-Space Trees forest: partial_fit counts new
+    samples in fixed-size trees in constant time per sample instead of
+    refitting on the newest batch, so it keeps what it learned from earlier
+    traffic and its memory does not grow.
+
+    Saves are atomic and keep the last checkpoint_versions files. With a
+    Checkpointer they are written on its background thread; only a copy of
+    the model is taken on the caller's thread.
+
+    The pipeline updates the model on one thread while another scores
+    with it, and an update changes the model's counts in several steps, so
+    updates, scoring, saving and loading all hold the detector's lock.
     """
-    def __init__(self, model_path='anomaly_model.joblib', contamination=0.01):
+    def __init__(self, model_path='anomaly_model.joblib', contamination=0.01,
+                 n_trees=25, height=10, window_size=256, checkpointer=None,
+                 checkpoint_versions=3):
         """
         Special method __init__.
+
+        Args:
+            model_path: File the model is saved to and loaded from
+            contamination: Share of samples predict() flags as anomalies
+            n_trees: Number of Half-Space Trees
+            height: Depth of every tree
+            window_size: Samples per counting window; the model is fitted once
+                the first window is complete
+            checkpointer: Checkpointer that writes saves in the background;
+                saves are written synchronously if not given
+            checkpoint_versions: Saved versions kept, including the current one
         """
         self.model_path = model_path
         self.contamination = contamination
-        self.model = IsolationForest(contamination=contamination, random_state=42)
+        self.n_trees = n_trees
+        self.height = height
+        self.window_size = window_size
+        self.checkpointer = checkpointer
+        self.checkpoint_versions = checkpoint_versions
+        self.model = self._new_model()
         self.is_fitted = False
         self.feature_names = None
+        self.version = 0                # Incremented by every model update
+        self.saved_version = 0          # Version of the last save
+        self.lock = threading.RLock()   # Serializes model updates with scoring
+
+    def _new_model(self):
+        """Create an empty streaming model with this detector's settings."""
+        return HalfSpaceTrees(self.n_trees, self.height, self.window_size,
+                              contamination=self.contamination, random_state=42)
 
-    def partial_fit(self, X):
-        """Partially fit the model with new data."""
-        if not isinstance(X, pd.DataFrame):
+    def partial_fit(self, X, feature_names=None):
+        """
+        Update the model with new data.
+
+        Args:
+            X: DataFrame, or float32 feature matrix as produced by
+                FeatureExtractor.extract_matrix
+            feature_names: Column names of X when it is a matrix
+        """
+        if isinstance(X, pd.DataFrame):
+            feature_names = X.columns.tolist()
+        elif not isinstance(X, np.ndarray) or X.ndim != 2:
             return
 
-        if X.empty:
+        if len(X) == 0:
             return
 
         try:
-            if not self.is_fitted or self.feature_names is None or set(X.columns) != set(self.feature_names):
-                self.model = IsolationForest(contamination=self.contamination, random_state=42)
-                self.model.fit(X)
-                self.is_fitted = True
-                self.feature_names = X.columns.tolist()
-            else:
-                self.model.fit(X)
-            
-            self.save_model()
+            matrix = self._as_matrix(X)
+            with self.lock:
+                self._update(matrix, feature_names)
         except Exception as e:
             # Handle any errors during model fitting
             print(f"Warning: Error during model fitting: {e}")
 
+    def _update(self, matrix, feature_names):
+        """Count a matrix in the model and queue a save. Call with the lock held."""
+        if ((feature_names is not None and self.feature_names is not None
+                    and set(feature_names) != set(self.feature_names))
+                or (self.model.n_features_in_ or matrix.shape[1]) != matrix.shape[1]):
+            # The features changed; what was learned no longer applies
+            self.model = self._new_model()
+        if feature_names is not None:
+            self.feature_names = list(feature_names)
+        self.model.partial_fit(matrix)
+        self.is_fitted = self.model.is_fitted
+        self.version += 1
+
+        self.save_model()
+
     def update_model(self, features):
         """
         Update the model with new features.
@@ -55,68 +112,88 @@ class PersistentAnomalyDetector:
             if len(features) > 0 and isinstance(features[0], list):
                 # Assuming features is a list of feature vectors
                 try:
-                    df = pd.DataFrame(features, columns=getattr(self, 'feature_names', None))
-                    self.partial_fit(df)
+                    self.partial_fit(np.asarray(features, dtype=np.float32), self.feature_names)
                 except Exception as e:
-                    print(f"Warning: Error converting features to DataFrame: {e}")
+                    print(f"Warning: Error converting features to a matrix: {e}")
             else:
                 print("Warning: Unexpected features format for model update")
-        elif isinstance(features, pd.DataFrame):
+        elif isinstance(features, (pd.DataFrame, np.ndarray)):
             self.partial_fit(features)
         else:
             print("Warning: Unsupported features format for model update")
 
+    def _as_matrix(self, X):
+        """Return X as a float32 matrix, ordering DataFrame columns as in training."""
+        if isinstance(X, pd.DataFrame):
+            if self.feature_names is not None and set(X.columns) == set(self.feature_names):
+                X = X[self.feature_names]
+            return X.to_numpy(dtype=np.float32)
+        return np.asarray(X, dtype=np.float32)
+
+    def _call_model(self, method, X):
+        """Run a method of the fitted model on a feature matrix, never during an update."""
+        matrix = self._as_matrix(X)
+        with self.lock:
+            if not self.is_fitted:
+                raise ValueError("Model is not fitted yet. Call 'partial_fit' first.")
+            return getattr(self.model, method)(matrix)
+
     def predict(self, X):
         """Make predictions using the fitted model."""
-        if not self.is_fitted:
-            raise ValueError("Model is not fitted yet. Call 'partial_fit' first.")
-        return self.model.predict(X)
+        return self._call_model('predict', X)
 
     def score_samples(self, X):
         """Calculate anomaly scores for samples."""
-        if not self.is_fitted:
-            raise ValueError("Model is not fitted yet. Call 'partial_fit' first.")
-        return self.model.score_samples(X)
+        return self._call_model('score_samples', X)
 
     def save_model(self):
-        """Save the fitted model to a file."""
+        """
+        Save the fitted model to a file.
+
+        Nothing is written if the model has not changed since the last save.
+        With a checkpointer the write happens in the background.
+        """
         try:
-            if self.is_fitted:
-                joblib.dump({
-                    'model': self.model, 
-                    'feature_names': self.feature_names,
+            with self.lock:
+                if not self.is_fitted or self.version == self.saved_version:
+                    return
+                state = {
+                    'model': copy.deepcopy(self.model) if self.checkpointer is not None else self.model,
+                    'feature_names': list(self.feature_names) if self.feature_names is not None else None,
                     'contamination': self.contamination
-                }, self.model_path)
+                }
+                if self.checkpointer is not None and self.checkpointer.save(self.model_path, state):
+                    self.saved_version = self.version
+                else:
+                    write_checkpoint(self.model_path, state, self.checkpoint_versions)
+                    self.saved_version = self.version
         except Exception as e:
             print(f"Warning: Error saving model: {e}")
 
+    @staticmethod
+    def _validate_state(state):
+        """Raise if a loaded checkpoint does not hold a streaming model."""
+        if not isinstance(state, dict) or not isinstance(state.get('model'), HalfSpaceTrees):
+            # Files written before the streaming model hold a batch IsolationForest
+            raise ValueError("Saved model is not a streaming HalfSpaceTrees model; starting a new one")
+
     def load_model(self):
-        """Load a previously saved model."""
+        """Load the newest readable saved version of the model."""
         try:
-            if os.path.exists(self.model_path):
-                with warnings.catch_warnings():
-                    warnings.filterwarnings("ignore", category=InconsistentVersionWarning)
-                    loaded_data = joblib.load(self.model_path)
-                
-                if isinstance(loaded_data, dict):
+            loaded_data, path = load_checkpoint(self.model_path, self.checkpoint_versions, self._validate_state)
+            if loaded_data is not None:
+                if path != self.model_path:
+                    print(f"Warning: {self.model_path} could not be loaded; using the previous version {path}")
+                with self.lock:
                     self.model = loaded_data['model']
                     self.feature_names = loaded_data.get('feature_names', None)
                     # Update contamination if it was saved
                     if 'contamination' in loaded_data:
                         self.contamination = loaded_data['contamination']
-                else:
-                    self.model = loaded_data
-                    self.feature_names = None
-                
-                self.is_fitted = True
-                
-                if not isinstance(self.model, IsolationForest):
-                    raise ValueError("Loaded model is not an IsolationForest")
-                
-                if not hasattr(self.model, 'contamination') or not hasattr(self.model, 'random_state'):
-                    raise ValueError("Loaded model is missing expected attributes")
+                    self.is_fitted = self.model.is_fitted
         except Exception as e:
             print(f"Warning: Error loading model: {e}")
-            self.model = IsolationForest(contamination=self.contamination, random_state=42)
-            self.is_fitted = False
-            self.feature_names = None
\ No newline at end of file
+            with self.lock:
+                self.model = self._new_model()
+                self.is_fitted = False
+                self.feature_names = None
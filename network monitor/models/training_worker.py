@@ -0,0 +1,162 @@
+"""
+This script handles training the deep packet analyzer in a separate process and publishing the trained models.
+"""
+
+import multiprocessing
+import pickle
+import queue
+import threading
+import time
+
+
+def _training_loop(model_type, jobs, results):
+    """
+    Worker process: train a private DeepPacketAnalyzer on each job and publish it.
+
+    The analyzer persists across jobs, so a network keeps training from its
+    previous weights like the inline model did.
+    """
+    from models.deep_packet_analyzer import DeepPacketAnalyzer
+
+    analyzer = DeepPacketAnalyzer(model_type=model_type)
+    while True:
+        job = jobs.get()
+        if job is None:
+            return
+        job_id, features, labels = job
+        start = time.perf_counter()
+        try:
+            analyzer.fit(features, labels)
+            if not analyzer.is_fitted:
+                raise RuntimeError("training did not produce a fitted model")
+            results.put((job_id, pickle.dumps(analyzer), time.perf_counter() - start, None))
+        except Exception as e:
+            results.put((job_id, None, time.perf_counter() - start, str(e)))
+
+
+class TrainingWorker:
+    """
+    Trains the deep packet analyzer off the capture loop.
+
+    submit() hands a snapshot of features and labels to a worker process and
+    returns at once. At most one job is in training; snapshots submitted
+    meanwhile replace each other, so only the newest is trained next.
+    poll() returns a newly trained analyzer when one has been published, for
+    the caller to swap in between batches. The process is started on the
+    first submit.
+    """
+
+    def __init__(self, model_type, logger=None):
+        """
+        Initialize the worker.
+
+        Args:
+            model_type: DeepPacketAnalyzer model type to train
+            logger: Logger for training results
+        """
+        self.model_type = model_type
+        self.logger = logger
+        # Spawn instead of fork: the monitor is multithreaded when training starts
+        self.context = multiprocessing.get_context('spawn')
+        self.process = None
+        self.jobs = None
+        self.results = None
+        self.lock = threading.Lock()
+        self.next_job = None            # Newest snapshot waiting for the running job to finish
+        self.in_flight = None           # Id of the job being trained
+        self.job_count = 0
+        self.stats = {'submitted': 0, 'superseded': 0, 'trained': 0, 'failed': 0}
+
+    def _start(self):
+        """Start the worker process. Call with the lock held."""
+        self.jobs = self.context.Queue()
+        self.results = self.context.Queue()
+        self.process = self.context.Process(
+            target=_training_loop,
+            args=(self.model_type, self.jobs, self.results),
+            name='deep-training',
+            daemon=True
+        )
+        self.process.start()
+
+    def _send(self, features, labels):
+        """Hand a job to the worker process. Call with the lock held."""
+        if self.process is None or not self.process.is_alive():
+            self._start()
+        self.job_count += 1
+        self.in_flight = self.job_count
+        self.jobs.put((self.in_flight, features, labels))
+
+    def submit(self, features, labels):
+        """
+        Queue a training snapshot without waiting for training.
+
+        Args:
+            features: Feature matrix; copied, so the caller may keep changing its array
+            labels: Labels (0 for normal, 1 for anomaly)
+        """
+        features, labels = features.copy(), labels.copy()
+        with self.lock:
+            self.stats['submitted'] += 1
+            if self.in_flight is not None:
+                if self.next_job is not None:
+                    self.stats['superseded'] += 1
+                self.next_job = (features, labels)
+                return
+            self._send(features, labels)
+
+    def poll(self):
+        """
+        Collect a finished job without blocking.
+
+        Returns:
+            DeepPacketAnalyzer: The newly trained analyzer, or None if none is ready
+        """
+        with self.lock:
+            if self.in_flight is None:
+                return None
+            try:
+                job_id, payload, seconds, error = self.results.get_nowait()
+            except queue.Empty:
+                if not self.process.is_alive():
+                    # The worker died (e.g. out of memory); restart it with the newest snapshot
+                    self._log('error', f"Training process exited with code {self.process.exitcode}")
+                    self.in_flight = None
+                    self.stats['failed'] += 1
+                    if self.next_job is not None:
+                        self._send(*self.next_job)
+                        self.next_job = None
+                return None
+
+            self.in_flight = None
+            if self.next_job is not None:
+                self._send(*self.next_job)
+                self.next_job = None
+
+        if error is not None:
+            self.stats['failed'] += 1
+            self._log('error', f"Background training job {job_id} failed after {seconds:.1f}s: {error}")
+            return None
+        self.stats['trained'] += 1
+        self._log('info', f"Background training job {job_id} finished in {seconds:.1f}s")
+        return pickle.loads(payload)
+
+    def _log(self, level, message):
+        """Log a message if a logger was given."""
+        if self.logger is not None:
+            getattr(self.logger, level)(message)
+
+    def close(self, timeout=5.0):
+        """Stop the worker process, abandoning any job in training."""
+        with self.lock:
+            process, self.process = self.process, None
+            self.in_flight = self.next_job = None
+        if process is None:
+            return
+        try:
+            self.jobs.put(None)
+            process.join(timeout)
+        finally:
+            if process.is_alive():
+                process.terminate()
+                process.join(timeout)
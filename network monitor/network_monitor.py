@@ -3,67 +3,100 @@ This script handles network monitor.
 """
 
 # Import required libraries
-import argparse  # For parsing command-line arguments
 import sys      # For system-specific parameters and functions
-import time     # For time-related functions
+
+# With --startup-profile, time every import from here on; this must run before the other imports
+from startup_profile import StartupProfiler
+startup_profiler = StartupProfiler() if __name__ == "__main__" and '--startup-profile' in sys.argv[1:] else None
+if startup_profiler is not None:
+    startup_profiler.install()
+
+import argparse  # For parsing command-line arguments
 import os       # For operating system dependent functionality
-import socket   # For resolving IP addresses to hostnames
+import time     # For measuring replay duration
+import ipaddress  # For parsing the local network
 from collections import defaultdict  # For creating dictionaries with default values
-import pandas as pd  # For DataFrame operations
 import numpy as np   # For numerical operations
 
-# Check what ML libraries are available
-DEEP_LEARNING_AVAILABLE = False
-try:
-    import torch
-    DEEP_LEARNING_AVAILABLE = True
-except ImportError:
-    pass
-
-NEURAL_NETWORK_AVAILABLE = False
-try:
-    from sklearn.neural_network import MLPClassifier
-    NEURAL_NETWORK_AVAILABLE = True
-except ImportError:
-    pass
-
 # Import custom modules for network monitoring functionality
 from logger_setup import LoggerSetup                                    # Module for setting up logging
 from interface_manager import InterfaceManager                          # Module for managing network interfaces
 from packet_capture import PacketCapture                               # Module for capturing network packets
+from bpf_filter import compile_whitelist_filter, pack_filter, whitelist_filter_expression  # Kernel whitelist filter
+from config.whitelist_config import WHITELISTED_IPS, WHITELISTED_PORTS, WHITELISTED_PROTOCOLS
+from capture_pipeline import CapturePipeline, PacketBatch              # Module for running capture and analysis concurrently
+from pcap_reader import PcapReplaySource, find_pcap_files              # Module for replaying recorded traffic
+from packet_decoder import PacketDecoder                               # Module for decoding packets once per batch
 from packet_analyzer import PacketAnalyzer                             # Module for analyzing network packets
+from utils.network_utils import ReverseDnsResolver                     # Background reverse DNS for alerts
+from flow_table import FlowTable, flow_matrix                          # Module for tracking flows across batches
 from anomaly_detector import AnomalyDetector                           # Module for detecting network anomalies
 from models.persistent_anomaly_detector import PersistentAnomalyDetector  # Module for persistent anomaly detection
-from models.deep_packet_analyzer import DeepPacketAnalyzer, SequenceAnomalyDetector  # Deep learning models
+from models.checkpointer import Checkpointer                           # Background model checkpoints
+from config.feature_config import FLOW_FEATURE_NAMES, DNS_FEATURE_NAMES  # Flow and DNS feature column order
+
+# Thresholds and configuration parameters for monitoring
+PORT_SCAN_THRESHOLD = 10          # Threshold for detecting port scans
+DNS_QUERY_THRESHOLD = 25          # Threshold for detecting DNS query anomalies
+SYN_FLOOD_WINDOW = 60             # Seconds over which SYNs are counted
+SYN_FLOOD_THRESHOLD = 50          # SYNs from one source to one port within the window
+SYN_FLOOD_TARGET_THRESHOLD = 500  # SYNs to one destination port within the window
+MODEL_UPDATE_INTERVAL = 5         # Frequency of model updates (in batches)
+SAVE_INTERVAL = 10                # Frequency of model saves (in batches)
+CHECKPOINT_VERSIONS = 3           # Saved versions kept per model file
+FLOW_IDLE_TIMEOUT = 60.0          # Seconds without packets before a flow is exported
+FLOW_ACTIVE_TIMEOUT = 300.0       # Maximum seconds covered by one flow record
+FLOW_CLOSE_LINGER = 5.0           # Seconds a closed TCP flow still takes its last ACKs
+MAX_FLOWS = 100000                # Hard cap on tracked flows
+INSPECTION_DEPTH_BYTES = 8192     # Payload bytes inspected per flow direction
+INSPECTION_DEPTH_PACKETS = 16     # Payload packets inspected per flow direction
+INSPECTION_PORT_DEPTHS = {        # Per-port (bytes, packets) inspection depth overrides
+    80: (65536, 64),              # HTTP: inspect request and response bodies deeper
+    443: (2048, 4),               # HTTPS: only the handshake is readable
+}
+
+# Reverse DNS for alert enrichment: lookups run in the background and never
+# delay logging; failed lookups are cached for a shorter time
+DNS_RESOLVER_WORKERS = 4
+DNS_CACHE_TTL = 3600
+DNS_NEGATIVE_TTL = 300
 
 class NetworkMonitor:
     """Main class for monitoring network traffic and detecting anomalies"""
-    def __init__(self):
+    def __init__(self, model_type='auto', startup_profiler=None):
         """
         Special method __init__.
+
+        Args:
+            model_type: Deep analyzer model type, or 'auto' for the most sophisticated one available
+            startup_profiler: Optional StartupProfiler, reported when the first packet arrives
         """
+        self.startup_profiler = startup_profiler
         # Initialize components for logging, interface management, packet capture/analysis, and anomaly detection
         self.logger_setup = LoggerSetup()                    # Create logger setup instance
         self.logger = self.logger_setup.get_logger()         # Get logger instance
         self.interface_manager = InterfaceManager(self.logger)    # Initialize interface manager
         self.packet_capture = PacketCapture(self.logger)         # Initialize packet capture
-        self.packet_analyzer = PacketAnalyzer(self.logger)       # Initialize packet analyzer
-        self.anomaly_detector = AnomalyDetector(self.logger)     # Initialize anomaly detector
-        self.persistent_detector = PersistentAnomalyDetector()   # Initialize persistent anomaly detector
-        
-        # Select the most sophisticated model available
-        if DEEP_LEARNING_AVAILABLE:
-            model_type = 'deep_nn'
-            self.logger.info("Using Deep Neural Network model (most sophisticated)")
-        elif NEURAL_NETWORK_AVAILABLE:
-            model_type = 'neural_network'
-            self.logger.info("Using Neural Network model")
-        else:
-            model_type = 'random_forest'
-            self.logger.info("Using Random Forest model")
-            
-        self.deep_analyzer = DeepPacketAnalyzer(model_type=model_type)  # Initialize deep analyzer
-        self.sequence_analyzer = SequenceAnomalyDetector(sequence_length=5)  # Initialize sequence analyzer
+        self.packet_decoder = PacketDecoder(self.logger)         # Initialize packet decoder
+        self.dns_resolver = ReverseDnsResolver(                   # Shared reverse DNS cache
+            max_workers=DNS_RESOLVER_WORKERS, ttl=DNS_CACHE_TTL, negative_ttl=DNS_NEGATIVE_TTL
+        )
+        self.packet_analyzer = PacketAnalyzer(                    # Initialize packet analyzer
+            self.logger, SYN_FLOOD_WINDOW, SYN_FLOOD_THRESHOLD, SYN_FLOOD_TARGET_THRESHOLD,
+            INSPECTION_DEPTH_BYTES, INSPECTION_DEPTH_PACKETS, INSPECTION_PORT_DEPTHS,
+            dns_resolver=self.dns_resolver
+        )
+        self.anomaly_detector = AnomalyDetector(self.logger, model_type=model_type)  # Initialize anomaly detector
+        self.checkpointer = Checkpointer(self.logger, keep=CHECKPOINT_VERSIONS)  # Writes model saves in the background
+        self.persistent_detector = PersistentAnomalyDetector(     # Initialize persistent anomaly detector
+            checkpointer=self.checkpointer, checkpoint_versions=CHECKPOINT_VERSIONS
+        )
+        self.flow_detector = PersistentAnomalyDetector(model_path='flow_anomaly_model.joblib',  # Anomaly model for flow records
+                                                       checkpointer=self.checkpointer,
+                                                       checkpoint_versions=CHECKPOINT_VERSIONS)
+        self.dns_detector = PersistentAnomalyDetector(model_path='dns_anomaly_model.joblib',  # Anomaly model for DNS clients
+                                                      checkpointer=self.checkpointer,
+                                                      checkpoint_versions=CHECKPOINT_VERSIONS)
 
     def check_root_linux(self):
         """Check if script is running with root privileges on Linux systems"""
@@ -75,15 +108,22 @@ class NetworkMonitor:
                 print("sudo python3 network_monitor.py")
                 sys.exit(1)
 
-    def run(self, interface_name=None):
-        """Main monitoring loop that captures and analyzes network traffic"""
+    def enable_kernel_whitelist(self, sample_rate=0):
+        """
+        Drop statically whitelisted traffic in the kernel instead of after capture.
+
+        Args:
+            sample_rate: Keep a random 1-in-N sample of whitelisted packets (0 drops all)
+        """
+        program = compile_whitelist_filter(WHITELISTED_IPS, WHITELISTED_PORTS, WHITELISTED_PROTOCOLS,
+                                           sample_rate=sample_rate)
+        expression = whitelist_filter_expression(WHITELISTED_IPS, WHITELISTED_PORTS, WHITELISTED_PROTOCOLS)
+        self.packet_capture.set_kernel_filter(pack_filter(program), expression, sample_rate)
+        self.logger.info(f"Kernel whitelist filter: {len(program)} BPF instructions, {expression or 'no rules'}")
+
+    def run(self, interface_name=None, batch_size=1000, batch_timeout=5.0):
+        """Main monitoring loop that captures and analyzes network traffic continuously"""
         try:
-            # Define thresholds and configuration parameters for monitoring
-            PORT_SCAN_THRESHOLD = 10          # Threshold for detecting port scans
-            DNS_QUERY_THRESHOLD = 25          # Threshold for detecting DNS query anomalies
-            PACKET_COUNT = 1000               # Number of packets to capture in each batch
-            MODEL_UPDATE_INTERVAL = 5         # Frequency of model updates (in iterations)
-            
             # Set up network interface and get network details
             interface, local_ip, subnet_mask = self.interface_manager.setup_interface(interface_name)
             if not interface:
@@ -91,150 +131,319 @@ class NetworkMonitor:
                 return
 
             self.logger.info(f"Monitoring interface: {interface}")
+            self.local_ip = local_ip
+            self.subnet_mask = subnet_mask
+            self._load_model()
+
+            if not self.packet_capture.start_stream(interface):
+                self.logger.error("Could not start packet capture. Exiting.")
+                return
+
+            self.logger.info(
+                f"Continuous capture started (batch size {batch_size}, batch timeout {batch_timeout}s)"
+            )
+            try:
+                self._run_pipeline(self.packet_capture, batch_size, batch_timeout)
+            finally:
+                self.packet_capture.stop_stream()
+
+        except KeyboardInterrupt:
+            self.logger.info("\nStopping packet capture. Exiting.")
+        except Exception as e:
+            self.logger.error(f"An unexpected error occurred: {e}", exc_info=True)
+        finally:
+            self._shutdown()
 
-            # Initialize tracking variables for monitoring
-            false_positive_count = defaultdict(int)  # Track potential false positives
-            iteration_count = 0                      # Count monitoring iterations
-            save_interval = 10                       # Interval for saving model state
-            collected_features = []                  # Store features for model updates
-            collected_labels = []                    # Store labels for deep learning model training
-            
-            # Try to load existing model or prepare for new model creation
+    def replay(self, pcap_files, local_network="192.168.1.0/24", batch_size=1000,
+               batch_timeout=5.0, realtime=False, speed=1.0):
+        """Run the detection pipeline over recorded pcap/pcapng files"""
+        try:
+            if not pcap_files:
+                self.logger.error("No capture files to replay. Exiting.")
+                return
+
+            network = ipaddress.ip_network(local_network, strict=False)
+            self.local_ip = str(network.network_address)
+            self.subnet_mask = str(network.netmask)
+            self._load_model()
+
+            source = PcapReplaySource(self.logger, pcap_files, realtime=realtime, speed=speed)
+            mode = f"timestamp-faithful at {speed}x" if realtime else "as fast as possible"
+            self.logger.info(f"Replaying {len(pcap_files)} capture file(s) {mode}")
+            start = time.monotonic()
+            self._run_pipeline(source, batch_size, batch_timeout, drop_when_full=False)
+            elapsed = time.monotonic() - start
+            self.logger.info(
+                f"Replayed {source.stats['packets']} packets from {source.stats['files']} file(s) "
+                f"in {elapsed:.1f}s ({source.stats['packets'] / max(elapsed, 1e-9):.0f} packets/s), "
+                f"skipped {source.stats['skipped']} non-Ethernet frames"
+            )
+
+        except KeyboardInterrupt:
+            self.logger.info("\nStopping replay. Exiting.")
+        except Exception as e:
+            self.logger.error(f"An unexpected error occurred: {e}", exc_info=True)
+        finally:
+            self._shutdown()
+
+    def _load_model(self):
+        """Try to load existing model or prepare for new model creation"""
+        try:
+            self.persistent_detector.load_model()
+            self.flow_detector.load_model()
+            self.dns_detector.load_model()
+            self.logger.info("Loaded existing anomaly detection model")
+        except Exception as e:
+            self.logger.warning(f"Could not load model: {e}. Will create new model after collecting data.")
+        if self.startup_profiler is not None:
+            self.startup_profiler.mark('models loaded')
+
+    def _run_pipeline(self, packet_source, batch_size, batch_timeout, drop_when_full=True):
+        """Run the capture pipeline over a packet source until it ends or is interrupted"""
+        pipeline = self._build_pipeline(packet_source, batch_size, batch_timeout, drop_when_full)
+        try:
+            pipeline.run()
+        finally:
+            pipeline.stop()
+            pipeline.join(timeout=batch_timeout + 5)
+            if pipeline.is_alive():
+                # The flows stage may still be using the flow table, so flushing it here would race
+                self.logger.warning("Pipeline threads did not stop in time; skipped the final flow export")
+            else:
+                self._flush_flows()
+            self.logger.info(
+                f"Pipeline processed {pipeline.stats['packets']} packets in "
+                f"{pipeline.stats['batches']} batches, dropped {pipeline.stats['dropped_packets']} packets"
+            )
+            self.logger.info(
+                f"Flow table exported {self.flow_table.stats['exported']} flows, "
+                f"evicted {self.flow_table.stats['evicted']}, {len(self.flow_table)} still active"
+            )
+
+    def _report_startup(self, milestone):
+        """Log the startup profile once: when the first packet arrives, or at exit if none did"""
+        profiler, self.startup_profiler = self.startup_profiler, None
+        if profiler is None:
+            return
+        profiler.mark(milestone)
+        profiler.uninstall()
+        for line in profiler.report():
+            self.logger.info(line)
+
+    def _shutdown(self):
+        """Save the final model state and stop the logger"""
+        self._report_startup('exit without packets')
+        # Abandon queued hostname lookups so a slow resolver cannot delay exit
+        self.dns_resolver.close()
+        # Stop background training; a model still in training is discarded
+        self.anomaly_detector.close()
+        # Ensure model state is saved before exiting
+        try:
+            if hasattr(self, 'persistent_detector'):
+                self.persistent_detector.save_model()
+                self.flow_detector.save_model()
+                self.dns_detector.save_model()
+                # Wait for the queued checkpoints to reach the disk
+                self.checkpointer.close()
+                stats = self.checkpointer.stats
+                self.logger.info(
+                    f"Saved final model state ({stats['written']} checkpoints written, "
+                    f"{stats['coalesced']} redundant saves coalesced, {stats['failed']} failed)"
+                )
+        except Exception as e:
+            self.logger.error(f"Error saving final model state: {e}")
+        finally:
             try:
-                self.persistent_detector.load_model()
-                self.logger.info("Loaded existing anomaly detection model")
+                self.logger_setup.stop_listener()
             except Exception as e:
-                self.logger.warning(f"Could not load model: {e}. Will create new model after collecting data.")
-
-            # Main monitoring loop
-            while True:
-                try:
-                    # Capture network packets using specified interface
-                    packets = self.packet_capture.capture_packets(
-                        interface, 
-                        PACKET_COUNT
-                    )
-
-                    if packets:
-                        self.logger.debug(f"Captured {len(packets)} packets")
-                        
-                        # Analyze captured packets for suspicious behavior
-                        try:
-                            suspicious_activities = self.packet_analyzer.analyze_traffic(
-                                packets,
-                                PORT_SCAN_THRESHOLD,
-                                DNS_QUERY_THRESHOLD,
-                                local_ip,
-                                subnet_mask
-                            )
-                        except Exception as e:
-                            self.logger.error(f"Error in packet analysis: {e}", exc_info=True)
-                            suspicious_activities = []
+                self.logger.error(f"Error stopping logger: {e}")
 
-                        # Extract features from packets for anomaly detection
-                        try:
-                            features = self.anomaly_detector.feature_extractor.extract_features(packets)
-                            if features is not None and not features.empty:
-                                # Convert DataFrame to list for storage if needed
-                                if hasattr(features, 'values'):
-                                    collected_features.extend(features.values.tolist())
-                                else:
-                                    collected_features.extend(features)
-                                
-                                # Generate labels based on suspicious activities detected
-                                # In a real implementation, you would have actual labels
-                                labels = np.zeros(len(features))
-                                if suspicious_activities:
-                                    # Mark some samples as potentially anomalous
-                                    labels[-min(5, len(labels)):] = 1
-                                collected_labels.extend(labels.tolist())
-                                
-                                # Update model periodically with collected features
-                                if iteration_count % MODEL_UPDATE_INTERVAL == 0 and len(collected_features) > 0:
-                                    self.logger.info("Updating anomaly detection models...")
-                                    
-                                    # Prepare features as DataFrame
-                                    if not isinstance(features, pd.DataFrame):
-                                        features_df = pd.DataFrame(collected_features[-len(features):], 
-                                                                 columns=self.anomaly_detector.feature_extractor.feature_names)
-                                    else:
-                                        features_df = features
-                                    
-                                    # Update traditional model
-                                    self.persistent_detector.partial_fit(features_df)
-                                    
-                                    # Train deep learning model if we have enough data
-                                    if len(collected_features) >= 100:
-                                        try:
-                                            # Use recent data for training
-                                            recent_features = np.array(collected_features[-100:])
-                                            recent_labels = np.array(collected_labels[-100:])
-                                            self.anomaly_detector.train_deep_analyzer(recent_features, recent_labels)
-                                        except Exception as e:
-                                            self.logger.debug(f"Could not train deep analyzer: {e}")
-                                    
-                                    # Only keep recent data to avoid memory issues
-                                    if len(collected_features) > 500:
-                                        collected_features = collected_features[-500:]
-                                        collected_labels = collected_labels[-500:]
-                        except Exception as e:
-                            self.logger.error(f"Error in feature extraction: {e}", exc_info=True)
+    def _build_pipeline(self, packet_source, batch_size, batch_timeout, drop_when_full=True):
+        """Create the capture pipeline with analysis, feature, detection and logging stages"""
+        # Tracking state shared by the stages across batches
+        self.false_positive_count = defaultdict(int)  # Track potential false positives
+        self.iteration_count = 0                      # Count processed batches
+        feature_count = len(self.anomaly_detector.feature_extractor.feature_names)
+        self.collected_features = np.empty((0, feature_count), dtype=np.float32)  # Recent features for model updates
+        self.collected_labels = np.empty(0, dtype=np.int64)  # Labels for deep learning model training
+        self.flow_table = FlowTable(FLOW_IDLE_TIMEOUT, FLOW_ACTIVE_TIMEOUT, MAX_FLOWS,
+                                    FLOW_CLOSE_LINGER)  # Flows tracked across batches
+        self.flow_batch_count = 0                     # Count batches that exported flows
+        self.dns_batch_count = 0                      # Count batches with DNS queries
+
+        return CapturePipeline(
+            self.logger,
+            packet_source,
+            [
+                ('decode', self._decode_stage),
+                ('analysis', self._analysis_stage),
+                ('features', self._feature_stage),
+                ('detection', self._detection_stage),
+                ('flows', self._flow_stage),
+                ('dns', self._dns_stage),
+                ('logging', self._logging_stage),
+            ],
+            batch_size=batch_size,
+            batch_timeout=batch_timeout,
+            drop_when_full=drop_when_full,
+            on_first_packet=lambda: self._report_startup('first packet')
+        )
+
+    def _decode_stage(self, batch):
+        """Decode every captured frame once into a packet record"""
+        self.logger.debug(f"Captured {len(batch.packets)} packets")
+        try:
+            local_network = ipaddress.ip_network(f"{self.local_ip}/{self.subnet_mask}", strict=False)
+        except ValueError:
+            local_network = None
+        batch.records = self.packet_decoder.decode_batch(batch.packets, local_network)
+
+    def _analysis_stage(self, batch):
+        """Analyze captured packets for suspicious behavior"""
+        try:
+            batch.suspicious_activities = self.packet_analyzer.analyze_traffic(
+                batch.records,
+                PORT_SCAN_THRESHOLD,
+                DNS_QUERY_THRESHOLD,
+                self.local_ip,
+                self.subnet_mask
+            )
+            # Snapshot the DNS client features in this stage, which owns the tracker
+            batch.dns_clients, batch.dns_features = self.packet_analyzer.dns_tracker.features()
+        except Exception as e:
+            self.logger.error(f"Error in packet analysis: {e}", exc_info=True)
+            batch.suspicious_activities = []
+
+    def _feature_stage(self, batch):
+        """Extract features and periodically update the anomaly models"""
+        try:
+            feature_extractor = self.anomaly_detector.feature_extractor
+            features = feature_extractor.extract_matrix(batch.records)
+            batch.features = features
+            if len(features):
+                # Generate labels based on suspicious activities detected
+                # In a real implementation, you would have actual labels
+                labels = np.zeros(len(features), dtype=np.int64)
+                if batch.suspicious_activities:
+                    # Mark some samples as potentially anomalous
+                    labels[-min(5, len(labels)):] = 1
+
+                # Only keep recent data to avoid memory issues
+                self.collected_features = np.concatenate((self.collected_features[-500:], features))[-500:]
+                self.collected_labels = np.concatenate((self.collected_labels[-500:], labels))[-500:]
+
+                # Update model periodically with collected features
+                if self.iteration_count % MODEL_UPDATE_INTERVAL == 0:
+                    self.logger.info("Updating anomaly detection models...")
+
+                    # Update traditional model
+                    self.persistent_detector.partial_fit(features, feature_extractor.feature_names)
 
-                        # Perform anomaly detection on current packets
+                    # Train deep learning model if we have enough data
+                    if len(self.collected_features) >= 100:
                         try:
-                            anomalies, anomaly_details = self.anomaly_detector.analyze_traffic(
-                                packets,
-                                self.persistent_detector
+                            # Use recent data for training
+                            self.anomaly_detector.train_deep_analyzer(
+                                self.collected_features[-100:],
+                                self.collected_labels[-100:]
                             )
                         except Exception as e:
-                            self.logger.error(f"Error in anomaly detection: {e}", exc_info=True)
-                            anomalies, anomaly_details = [], []
+                            self.logger.debug(f"Could not train deep analyzer: {e}")
+        except Exception as e:
+            self.logger.error(f"Error in feature extraction: {e}", exc_info=True)
 
-                        # Log detection results and update false positive tracking
-                        try:
-                            self._log_results(suspicious_activities, anomaly_details)
-                            self._update_false_positives(anomaly_details, false_positive_count)
-                        except Exception as e:
-                            self.logger.error(f"Error in logging results: {e}", exc_info=True)
+        # Save model state periodically
+        self.iteration_count += 1
+        if self.iteration_count % SAVE_INTERVAL == 0:
+            try:
+                # Only queued here; the checkpointer writes it in the background
+                self.persistent_detector.save_model()
+                self.logger.info("Queued anomaly detection model checkpoint")
+            except Exception as e:
+                self.logger.error(f"Error saving model: {e}", exc_info=True)
+
+    def _detection_stage(self, batch):
+        """Perform anomaly detection on the batch"""
+        try:
+            batch.anomalies, batch.anomaly_details = self.anomaly_detector.analyze_traffic(
+                batch.records,
+                self.persistent_detector,
+                batch.features
+            )
+        except Exception as e:
+            self.logger.error(f"Error in anomaly detection: {e}", exc_info=True)
+            batch.anomalies, batch.anomaly_details = [], []
 
-                    else:
-                        self.logger.warning("No packets captured in this batch.")
+    def _flow_stage(self, batch):
+        """Update the flow table and run the flow anomaly model on exported flows"""
+        try:
+            self.flow_table.update_batch(batch.records)
+            batch.flows = self.flow_table.drain()
+            if not batch.flows:
+                return
+            features = flow_matrix(batch.flows)
+            batch.flow_features = features
 
-                    # Save model state periodically
-                    iteration_count += 1
-                    if iteration_count % save_interval == 0:
-                        try:
-                            self.persistent_detector.save_model()
-                            self.logger.info("Saved anomaly detection model")
-                        except Exception as e:
-                            self.logger.error(f"Error saving model: {e}", exc_info=True)
+            # Update the flow model periodically, like the packet model
+            if self.flow_batch_count % MODEL_UPDATE_INTERVAL == 0:
+                self.flow_detector.partial_fit(features, FLOW_FEATURE_NAMES)
+            self.flow_batch_count += 1
 
-                except Exception as e:
-                    self.logger.error(f"Packet processing error: {e}", exc_info=True)
+            if self.flow_detector.is_fitted:
+                predictions = self.flow_detector.predict(features)
+                scores = -self.flow_detector.score_samples(features)
+                batch.flow_anomaly_details = [
+                    f"Flow anomaly: {flow.summary()} | Ended: {flow.end_reason} | Score: {score:.2f}"
+                    for flow, prediction, score in zip(batch.flows, predictions, scores)
+                    if prediction == -1
+                ]
+        except Exception as e:
+            self.logger.error(f"Error in flow analysis: {e}", exc_info=True)
+
+    def _dns_stage(self, batch):
+        """Run the DNS client anomaly model on the clients that queried in a batch"""
+        try:
+            features = batch.dns_features
+            if features is None or not len(features):
+                return
 
-                # Use a more adaptive sleep time
-                try:
-                    time.sleep(60)
-                except Exception as e:
-                    self.logger.error(f"Sleep interrupted: {e}")
+            # Update the DNS model periodically, like the flow model
+            if self.dns_batch_count % MODEL_UPDATE_INTERVAL == 0:
+                self.dns_detector.partial_fit(features, DNS_FEATURE_NAMES)
+            self.dns_batch_count += 1
 
-        except KeyboardInterrupt:
-            self.logger.info("\nStopping packet capture. Exiting.")
+            if self.dns_detector.is_fitted:
+                predictions = self.dns_detector.predict(features)
+                scores = -self.dns_detector.score_samples(features)
+                batch.dns_anomaly_details = [
+                    f"DNS anomaly: {client} | " + ", ".join(
+                        f"{name}={value:.2f}" for name, value in zip(DNS_FEATURE_NAMES, row)
+                    ) + f" | Score: {score:.2f}"
+                    for client, row, prediction, score in zip(batch.dns_clients, features, predictions, scores)
+                    if prediction == -1
+                ]
         except Exception as e:
-            self.logger.error(f"An unexpected error occurred: {e}", exc_info=True)
-        finally:
-            # Ensure model state is saved before exiting
-            try:
-                if hasattr(self, 'persistent_detector'):
-                    self.persistent_detector.save_model()
-                    self.logger.info("Saved final model state")
-            except Exception as e:
-                self.logger.error(f"Error saving final model state: {e}")
-            finally:
-                try:
-                    self.logger_setup.stop_listener()
-                except Exception as e:
-                    self.logger.error(f"Error stopping logger: {e}")
+            self.logger.error(f"Error in DNS analysis: {e}", exc_info=True)
+
+    def _flush_flows(self):
+        """Export and score the flows still active when capture ends"""
+        try:
+            self.flow_table.flush()
+            batch = PacketBatch(-1, [])
+            self._flow_stage(batch)
+            self._log_flow_anomalies(batch)
+        except Exception as e:
+            self.logger.error(f"Error flushing flows: {e}", exc_info=True)
+
+    def _logging_stage(self, batch):
+        """Log detection results and update false positive tracking"""
+        try:
+            self._log_results(batch.suspicious_activities, batch.anomaly_details)
+            self._log_flow_anomalies(batch)
+            self._log_dns_anomalies(batch)
+            self._update_false_positives(batch.anomaly_details, self.false_positive_count)
+        except Exception as e:
+            self.logger.error(f"Error in logging results: {e}", exc_info=True)
 
     def _log_results(self, suspicious_activities, anomaly_details):
         """Log detected suspicious activities and anomalies"""
@@ -243,18 +452,15 @@ class NetworkMonitor:
             self.logger.info("Suspicious activities detected:")
             for activity in suspicious_activities:
                 activity_type, ip_address = activity[0], activity[1]
-                
-                # Try to resolve IP to hostname
-                try:
-                    hostname = socket.gethostbyaddr(ip_address)[0]
-                    # Show both IP and hostname if they're different
-                    if hostname != ip_address:
-                        self.logger.info(f"- {activity_type}: {ip_address} ({hostname})")
-                    else:
-                        self.logger.info(f"- {activity_type}: {ip_address}")
-                except (socket.herror, socket.timeout):
-                    # If we can't resolve, just show the IP
-                    self.logger.info(f"- {activity_type}: {ip_address}")
+                details = "".join(f" | {detail}" for detail in activity[2:])
+
+                # Log the IP now; if its hostname is not cached yet, it is
+                # logged in a follow-up line when the lookup completes
+                def log_hostname(ip, hostname, activity_type=activity_type):
+                    self.logger.info(f"- {activity_type}: {ip} resolved to {hostname}")
+                self.logger.info(
+                    f"- {activity_type}: {self.dns_resolver.format(ip_address, log_hostname)}{details}"
+                )
         else:
             self.logger.info("No suspicious activities detected.")
 
@@ -268,6 +474,24 @@ class NetworkMonitor:
         else:
             self.logger.info("No anomalies detected.")
 
+    def _log_flow_anomalies(self, batch):
+        """Log anomalous flows exported in a batch, limiting output to first 10"""
+        if batch.flow_anomaly_details:
+            self.logger.info(f"Flow anomalies detected in {len(batch.flows)} exported flows:")
+            for detail in batch.flow_anomaly_details[:10]:
+                self.logger.info(detail)
+            if len(batch.flow_anomaly_details) > 10:
+                self.logger.info(f"... and {len(batch.flow_anomaly_details) - 10} more flow anomalies.")
+
+    def _log_dns_anomalies(self, batch):
+        """Log anomalous DNS clients of a batch, limiting output to first 10"""
+        if batch.dns_anomaly_details:
+            self.logger.info(f"DNS anomalies detected among {len(batch.dns_clients)} querying clients:")
+            for detail in batch.dns_anomaly_details[:10]:
+                self.logger.info(detail)
+            if len(batch.dns_anomaly_details) > 10:
+                self.logger.info(f"... and {len(batch.dns_anomaly_details) - 10} more DNS anomalies.")
+
     def _update_false_positives(self, anomaly_details, false_positive_count):
         """Track and handle potential false positive detections"""
         # Update counter for each anomaly and handle frequent occurrences
@@ -285,12 +509,56 @@ def main():
     parser.add_argument('--model-type', type=str, default='auto', 
                         choices=['auto', 'random_forest', 'neural_network', 'deep_nn'],
                         help='Type of model to use for anomaly detection')
+    parser.add_argument('--batch-size', type=int, default=1000,
+                        help='Maximum number of packets per analysis batch')
+    parser.add_argument('--batch-timeout', type=float, default=5.0,
+                        help='Maximum number of seconds before a partial batch is analyzed')
+    parser.add_argument('--pcap', type=str, action='append', default=[],
+                        help='Replay a pcap/pcapng file instead of capturing live (can be repeated)')
+    parser.add_argument('--pcap-dir', type=str,
+                        help='Replay every pcap/pcapng file in a directory, in name order')
+    parser.add_argument('--realtime', action='store_true',
+                        help='Replay at the pace of the recorded timestamps instead of as fast as possible')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='Speed multiplier for --realtime replay')
+    parser.add_argument('--local-network', type=str, default='192.168.1.0/24',
+                        help='Local network (CIDR) used to classify traffic direction during replay')
+    parser.add_argument('--kernel-whitelist', action='store_true',
+                        help='Drop statically whitelisted IPs, ports and protocols in the kernel (live capture)')
+    parser.add_argument('--whitelist-sample', type=int, default=0,
+                        help='With --kernel-whitelist, keep a random 1-in-N sample of whitelisted packets')
+    parser.add_argument('--startup-profile', action='store_true',
+                        help='Log import time per module and startup milestones up to the first packet')
     args = parser.parse_args()
+    if startup_profiler is not None:
+        startup_profiler.mark('imports')
+
+    if args.batch_size <= 0:
+        parser.error("--batch-size must be positive")
+    if args.batch_timeout <= 0:
+        parser.error("--batch-timeout must be positive")
+    if args.whitelist_sample < 0:
+        parser.error("--whitelist-sample must not be negative")
+
+    pcap_files = list(args.pcap)
+    if args.pcap_dir:
+        if not os.path.isdir(args.pcap_dir):
+            parser.error(f"--pcap-dir {args.pcap_dir} is not a directory")
+        pcap_files.extend(find_pcap_files(args.pcap_dir))
 
     # Create monitor instance and start monitoring
-    monitor = NetworkMonitor()
-    monitor.check_root_linux()
-    monitor.run(args.interface)
+    monitor = NetworkMonitor(args.model_type, startup_profiler)
+    if startup_profiler is not None:
+        startup_profiler.mark('monitor initialized')
+    if args.pcap or args.pcap_dir:
+        # Offline replay needs neither root privileges nor an interface
+        monitor.replay(pcap_files, args.local_network, args.batch_size, args.batch_timeout,
+                       realtime=args.realtime, speed=args.speed)
+    else:
+        monitor.check_root_linux()
+        if args.kernel_whitelist:
+            monitor.enable_kernel_whitelist(args.whitelist_sample)
+        monitor.run(args.interface, args.batch_size, args.batch_timeout)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
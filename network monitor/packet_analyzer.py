@@ -4,38 +4,49 @@ This script handles packet analyzer.
 
 from collections import defaultdict
 import ipaddress
-import re
 import time
-import socket  # Add socket import for DNS resolution
-try:
-    from scapy.all import Ether, Raw
-    from scapy.layers.inet import IP, TCP, UDP
-    from scapy.layers.inet6 import IPv6
-    from scapy.layers.dns import DNS, DNSQR
-except ImportError:
-    print("Warning: scapy is not installed. Some functionality may be limited.")
-
-# Import the IP resolution utility
-try:
-    from utils.network_utils import resolve_ip
-except ImportError:
-    # Fallback function if the utility is not available
-    def resolve_ip(ip):
-        """Fallback function to resolve an IP address to a hostname."""
-        try:
-            return socket.gethostbyaddr(ip)[0]
-        except (socket.herror, socket.timeout, NameError):
-            return ip
+from packet_decoder import (
+    PacketDecoder, FLAG_TCP, FLAG_UDP, FLAG_DNS,
+    DIRECTION_INBOUND, DIRECTION_OUTBOUND, DIRECTION_LOCAL
+)
+from dns_tracker import DnsActivityTracker
+from inspection_budget import InspectionBudget
+from payload_classifier import PayloadClassifier
+from rate_detector import SynFloodDetector
+from sketches import SketchWindow, TrafficSketches
+from tcp_reassembly import TcpReassembler
+from threat_scanner import ThreatScanner, THREAT_PATTERNS, compile_any, decode_context
+from utils.network_utils import ReverseDnsResolver
 
 class PacketAnalyzer:
     """
     Represents a packet analyzer.
     """
-    def __init__(self, logger):
+    def __init__(self, logger, syn_flood_window=60, syn_flood_threshold=50,
+                 syn_flood_target_threshold=500, inspection_depth_bytes=8192,
+                 inspection_depth_packets=16, inspection_port_depths=None, dns_resolver=None):
         """
         Special method __init__.
+
+        Args:
+            logger: Logger object for recording analysis results
+            syn_flood_window: Seconds over which SYNs are counted
+            syn_flood_threshold: SYNs from one source to one port that count as a flood
+            syn_flood_target_threshold: SYNs to one destination port that count as a flood
+            inspection_depth_bytes: Payload bytes inspected per flow direction
+            inspection_depth_packets: Payload packets inspected per flow direction
+            inspection_port_depths: Dict of port -> (bytes, packets) inspection depth overrides
+            dns_resolver: ReverseDnsResolver used to show hostnames next to IPs;
+                one is created if not given
         """
         self.logger = logger
+        self.decoder = PacketDecoder(logger)
+        # SYN rates persist across batches and follow the capture timestamps
+        self.syn_flood_detector = SynFloodDetector(
+            syn_flood_window, syn_flood_threshold, syn_flood_target_threshold
+        )
+        # Per-source distinct ports/hosts and top ports/talkers over the last week, in fixed memory
+        self.traffic_window = SketchWindow(TrafficSketches)
         self.whitelist_patterns = [
             r'(?i)User-Agent:',
             r'(?i)Accept:',
@@ -48,29 +59,30 @@ class PacketAnalyzer:
             r'(?i)X-Requested-With:',
         ]
         
-        self.threat_patterns = {
-            # Command injection patterns with Hebrew support
-            r'(?i)(;|\||\`)\s*(cat|pwd|ls|wget|curl|bash|sh|sudo|צו|פקודה|הרץ)\s': 'Command injection attempt',
-            
-            # SQL injection patterns
-            r'(?i)(UNION\s+SELECT|INSERT\s+INTO|UPDATE\s+.*SET|DELETE\s+FROM)\s+[\w_]+': 'SQL injection attempt',
-            r'(?i)(DROP\s+TABLE|ALTER\s+TABLE|CREATE\s+TABLE)\s+[\w_]+': 'Database modification attempt',
-            
-            # XSS patterns
-            r'(?i)(<script>|javascript:|\balert\s*\(|document\.cookie)': 'Cross-site scripting attempt',
-            
-            # Path traversal - modified to reduce false positives
-            r'(?i)(\.\./|\.\\/|~/)(etc|bin|usr|root|system32|windows)': 'Path traversal attempt',
-            
-            # Common malware patterns
-            r'(?i)(eval\(|base64_decode\(|system\(|exec\(|shell_exec\()': 'Code execution attempt',
-            
-            # Data exfiltration patterns with Hebrew support
-            r'(?i)(סיסמה|משתמש|כניסה|התחברות|שם|מייל)=': 'Hebrew credential exposure',
-            r'(?i)(password=|passwd=|pwd=|user=|username=|login=)': 'Credential exposure',
-            r'\b\d{16}\b': 'Potential credit card number',
-            r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b': 'Email address exposure'
-        }
+        # Payloads are matched as raw bytes; patterns are pre-encoded for each encoding
+        self.whitelist_regex = compile_any(self.whitelist_patterns)
+
+        # Every threat pattern is matched in one pass by the scanner
+        self.threat_scanner = ThreatScanner(THREAT_PATTERNS)
+        self.threat_patterns = {pattern.regex: pattern.description for pattern in THREAT_PATTERNS}
+
+        # Payloads past their flow's inspection depth are skipped
+        self.inspection_budget = InspectionBudget(
+            inspection_depth_bytes, inspection_depth_packets, inspection_port_depths
+        )
+
+        # TCP payloads are reassembled so threats split across segments are found
+        self.reassembler = TcpReassembler()
+
+        # Payload verdicts are cached per batch, so the whitelist and threat
+        # checks classify each payload only once
+        self.payload_classifier = PayloadClassifier()
+
+        # DNS query rates, name cardinality and label statistics per client, across batches
+        self.dns_tracker = DnsActivityTracker()
+
+        # Hostnames are looked up in the background and shown once cached
+        self.dns_resolver = dns_resolver or ReverseDnsResolver()
 
     def _is_binary_or_encrypted(self, data):
         """Check if the data appears to be binary or encrypted."""
@@ -78,74 +90,18 @@ class PacketAnalyzer:
             # Handle case where data might not be string or bytes
             if not isinstance(data, (str, bytes)):
                 return True
-                
-            # If it's bytes, decode it
-            if isinstance(data, bytes):
-                try:
-                    data = data.decode('utf-8')
-                except UnicodeDecodeError:
-                    return True
-            
-            # Calculate ratio of printable characters
-            printable_count = sum(1 for c in data if c.isprintable() or c.isspace())
-            ratio = printable_count / len(data) if len(data) > 0 else 0
-            
-            # If less than 30% printable characters, likely binary/encrypted
-            if ratio < 0.30:
-                return True
-                
-            # Check for high entropy (randomness)
-            char_freq = defaultdict(int)
-            for c in data:
-                char_freq[c] += 1
-            
-            # Avoid division by zero
-            if len(data) == 0:
-                return True
-                
-            entropy = 0
-            for freq in char_freq.values():
-                if freq > 0:
-                    p = freq / len(data)
-                    entropy -= p * (p.bit_length() - 1)  # Approximate log2(p)
-            
-            return entropy > 5.0  # High entropy threshold
-            
+            return self.payload_classifier.is_binary(data)
         except Exception:
             # If we can't determine, assume it's binary/encrypted
             return True
 
-    def _decode_payload(self, raw_data):
-        """Try multiple encodings to decode the payload."""
-        # Handle case where raw_data might not be bytes
-        if not isinstance(raw_data, bytes):
-            return None, None
-            
-        encodings = [
-            'utf-8',
-            'cp1255',  # Windows Hebrew
-            'iso-8859-8',  # Hebrew
-            'hebrew',
-            'windows-1255',
-            'ascii'
-        ]
-        
-        for encoding in encodings:
-            try:
-                decoded = raw_data.decode(encoding)
-                if not self._is_binary_or_encrypted(decoded):
-                    return decoded, encoding
-            except Exception:
-                continue
-                
-        return None, None
-
     def analyze_traffic(self, raw_packets, port_scan_threshold, dns_query_threshold, local_ip, subnet_mask):
-        """Analyze network traffic for suspicious activities."""
+        """Analyze network traffic for suspicious activities.
+
+        raw_packets may be DecodedPacket records from the decode stage or raw
+        (timestamp, bytes) tuples, which are decoded here.
+        """
         suspicious_activities = []
-        inbound_connections = defaultdict(lambda: defaultdict(int))
-        dns_queries = defaultdict(set)
-        port_scans = defaultdict(set)
         
         try:
             # Handle invalid IP or subnet mask
@@ -158,29 +114,25 @@ class PacketAnalyzer:
                 
             self.logger.debug(f"Starting analysis of {len(raw_packets)} packets for network: {local_network}")
             
+            records = self.decoder.decode_batch(raw_packets)
+            self.payload_classifier.clear()
+            self.dns_tracker.set_query_threshold(dns_query_threshold)
+
             packet_types = defaultdict(int)
             protocols = defaultdict(int)
             
-            for packet_data in raw_packets:
-                try:
-                    if isinstance(packet_data, tuple):
-                        packet = Ether(packet_data[1])
-                        
-                        if IP in packet:
-                            packet_types['IPv4'] += 1
-                            protocols[packet[IP].proto] += 1
-                        elif IPv6 in packet:
-                            packet_types['IPv6'] += 1
-                        if TCP in packet:
-                            packet_types['TCP'] += 1
-                        if UDP in packet:
-                            packet_types['UDP'] += 1
-                        if DNS in packet:
-                            packet_types['DNS'] += 1
-                            
-                except Exception as e:
-                    self.logger.debug(f"Error processing packet: {e}")
-                    continue
+            for record in records:
+                if record.ip_version == 4:
+                    packet_types['IPv4'] += 1
+                    protocols[record.proto] += 1
+                elif record.ip_version == 6:
+                    packet_types['IPv6'] += 1
+                if record.flags & FLAG_TCP:
+                    packet_types['TCP'] += 1
+                if record.flags & FLAG_UDP:
+                    packet_types['UDP'] += 1
+                if record.flags & FLAG_DNS:
+                    packet_types['DNS'] += 1
 
             self.logger.info("Packet Statistics:")
             for ptype, count in packet_types.items():
@@ -192,11 +144,8 @@ class PacketAnalyzer:
                 self.logger.info(f"- {protocol_name}: {count} packets")
 
             self._analyze_packets(
-                raw_packets,
+                records,
                 local_network,
-                inbound_connections,
-                dns_queries,
-                port_scans,
                 suspicious_activities
             )
 
@@ -205,11 +154,10 @@ class PacketAnalyzer:
 
         return suspicious_activities
 
-    def _analyze_packets(self, raw_packets, local_network, inbound_connections, 
-                        dns_queries, port_scans, suspicious_activities):
+    def _analyze_packets(self, records, local_network, suspicious_activities):
         """Analyze individual packets for suspicious behavior."""
-        time_window = defaultdict(list)
         current_time = time.time()
+        inbound_seen = False
         
         connection_stats = {
             'total_analyzed': 0,
@@ -218,88 +166,90 @@ class PacketAnalyzer:
             'local': 0
         }
 
-        for packet_data in raw_packets:
+        for record in records:
             try:
-                if isinstance(packet_data, tuple):
-                    packet = Ether(packet_data[1])
-                    connection_stats['total_analyzed'] += 1
+                connection_stats['total_analyzed'] += 1
 
-                    if IP in packet:
-                        try:
-                            src_ip = packet[IP].src
-                            dst_ip = packet[IP].dst
-                            src_ip_obj = ipaddress.ip_address(src_ip)
-                            dst_ip_obj = ipaddress.ip_address(dst_ip)
-
-                            is_inbound = dst_ip_obj in local_network and src_ip_obj not in local_network
-                            is_outbound = src_ip_obj in local_network and dst_ip_obj not in local_network
-                            is_local = src_ip_obj in local_network and dst_ip_obj in local_network
-
-                            if is_inbound:
-                                connection_stats['inbound'] += 1
-                                
-                                if TCP in packet:
-                                    dst_port = packet[TCP].dport
-                                    src_port = packet[TCP].sport
-                                    inbound_connections[dst_port][src_ip] += 1
-                                    port_scans[src_ip].add(dst_port)
-                                    
-                                    self.logger.debug(f"Inbound TCP: {src_ip}:{src_port} -> {dst_ip}:{dst_port}")
-                                    
-                                    if packet[TCP].flags & 0x02:
-                                        time_window[f"{src_ip}:{dst_port}"].append(current_time)
-                                        recent_syns = [t for t in time_window[f"{src_ip}:{dst_port}"] 
-                                                     if t > current_time - 60]
-                                        if len(recent_syns) > 50:
-                                            suspicious_activities.append(
-                                                ('Potential SYN flood detected', src_ip, dst_ip, dst_port)
-                                            )
-                                
-                                elif UDP in packet:
-                                    dst_port = packet[UDP].dport
-                                    src_port = packet[UDP].sport
-                                    inbound_connections[dst_port][src_ip] += 1
-                                    port_scans[src_ip].add(dst_port)
-                                    self.logger.debug(f"Inbound UDP: {src_ip}:{src_port} -> {dst_ip}:{dst_port}")
-
-                            elif is_outbound:
-                                connection_stats['outbound'] += 1
-                            elif is_local:
-                                connection_stats['local'] += 1
-                        except Exception as e:
-                            self.logger.debug(f"Error processing IP addresses: {e}")
-                            continue
+                if record.dns_qname is not None and not record.dns_response:
+                    self.logger.debug(f"DNS Query from {record.src_ip}: {record.dns_qname}")
+                    timestamp = record.timestamp if record.timestamp is not None else current_time
+                    suspicious_activities.extend(
+                        self.dns_tracker.observe(record.src_ip, record.dns_qname, timestamp, record.dns_qtype)
+                    )
 
-                        try:
-                            if DNS in packet and packet.haslayer(DNSQR):
-                                query = packet[DNSQR].qname.decode('utf-8', errors='ignore')
-                                dns_queries[src_ip].add(query)
-                                self.logger.debug(f"DNS Query from {src_ip}: {query}")
-                        except Exception as e:
-                            self.logger.debug(f"Error processing DNS: {e}")
+                if record.ip_version != 4:
+                    continue
+
+                src_ip = record.src_ip
+                dst_ip = record.dst_ip
+                try:
+                    # The decode stage may already have classified the direction
+                    direction = record.direction or self.decoder.direction(record, local_network)
+
+                    if direction == DIRECTION_INBOUND:
+                        connection_stats['inbound'] += 1
+                        
+                        if record.flags & FLAG_TCP:
+                            dst_port = record.dst_port
+                            src_port = record.src_port
+                            timestamp = record.timestamp if record.timestamp is not None else current_time
+                            self._track_inbound(record, timestamp)
+                            inbound_seen = True
+                            
+                            self.logger.debug(f"Inbound TCP: {src_ip}:{src_port} -> {dst_ip}:{dst_port}")
+                            
+                            # Count connection attempts only, not SYN-ACK replies
+                            if record.tcp_flags & 0x12 == 0x02:
+                                suspicious_activities.extend(
+                                    self.syn_flood_detector.observe(src_ip, dst_ip, dst_port, timestamp)
+                                )
+                        
+                        elif record.flags & FLAG_UDP:
+                            dst_port = record.dst_port
+                            src_port = record.src_port
+                            timestamp = record.timestamp if record.timestamp is not None else current_time
+                            self._track_inbound(record, timestamp)
+                            inbound_seen = True
+                            self.logger.debug(f"Inbound UDP: {src_ip}:{src_port} -> {dst_ip}:{dst_port}")
 
+                    elif direction == DIRECTION_OUTBOUND:
+                        connection_stats['outbound'] += 1
+                    elif direction == DIRECTION_LOCAL:
+                        connection_stats['local'] += 1
+                except Exception as e:
+                    self.logger.debug(f"Error processing IP addresses: {e}")
+                    continue
+
+                try:
+                    # Only the start of each flow is inspected; the rest is never sliced out
+                    inspect_length = self.inspection_budget.inspect_length(record)
+                    payload = record.payload[:inspect_length] if inspect_length else b''
+                    chunk = None
+                    if record.flags & FLAG_TCP:
+                        # Every inspected segment is reassembled, scanned or not, to keep the stream contiguous
+                        chunk = self.reassembler.add(record, payload)
+                    if payload and self._is_binary_or_encrypted(payload):
+                        self.inspection_budget.mark_binary(record)
+                    elif payload and not self._is_whitelisted(record, payload):
                         try:
-                            if Raw in packet and not self._is_whitelisted(packet):
-                                try:
-                                    raw_data = packet[Raw].load
-                                    decoded_payload, encoding = self._decode_payload(raw_data)
-                                    
-                                    if decoded_payload and not self._is_binary_or_encrypted(decoded_payload):
-                                        threats = self._check_payload_for_threats(decoded_payload)
-                                        for threat_type, context in threats:
-                                            # Only log if we have meaningful context
-                                            if not self._is_binary_or_encrypted(context):
-                                                suspicious_activities.append(
-                                                    ('Suspicious payload detected', 
-                                                     src_ip, 
-                                                     dst_ip, 
-                                                     threat_type,
-                                                     f"Context ({encoding}): {context[:100]}...")
-                                                )
-                                except Exception as e:
-                                    self.logger.debug(f"Error processing payload: {e}")
+                            # Threat patterns run on the raw bytes; only alert context is decoded
+                            if record.flags & FLAG_TCP:
+                                threats = self._check_stream_for_threats(chunk)
+                            else:
+                                threats = self._check_payload_for_threats(payload)
+                            for threat_type, context, match in threats:
+                                encoding, text = context
+                                suspicious_activities.append(
+                                    ('Suspicious payload detected', 
+                                     src_ip, 
+                                     dst_ip, 
+                                     threat_type,
+                                     f"Context ({encoding}, offset {match.start}): {text[:100]}...")
+                                )
                         except Exception as e:
-                            self.logger.debug(f"Error processing Raw layer: {e}")
+                            self.logger.debug(f"Error processing payload: {e}")
+                except Exception as e:
+                    self.logger.debug(f"Error processing Raw layer: {e}")
 
             except Exception as e:
                 self.logger.debug(f"Error analyzing packet: {e}")
@@ -310,65 +260,117 @@ class PacketAnalyzer:
         self.logger.info(f"Inbound connections: {connection_stats['inbound']}")
         self.logger.info(f"Outbound connections: {connection_stats['outbound']}")
         self.logger.info(f"Local network traffic: {connection_stats['local']}")
+
+        inspection = self.inspection_budget.stats
+        self.logger.info(
+            f"Payload inspection: {inspection['bytes_inspected']} bytes in "
+            f"{inspection['packets_inspected']} packets inspected, "
+            f"{inspection['bytes_skipped']} bytes in {inspection['packets_skipped']} packets skipped, "
+            f"{inspection['encrypted_flows']} encrypted flows"
+        )
+        reassembly = self.reassembler.stats
+        self.logger.info(
+            f"TCP reassembly: {len(self.reassembler)} streams, {self.reassembler.total_pending} bytes "
+            f"buffered out of order, {reassembly['retransmitted_bytes']} retransmitted bytes trimmed, "
+            f"{reassembly['gaps_skipped']} gaps skipped"
+        )
+        self.logger.info(
+            f"DNS activity: {len(self.dns_tracker)} clients and {len(self.dns_tracker.domains)} domains "
+            f"tracked, {self.dns_tracker.stats['queries']} queries seen"
+        )
         
-        if inbound_connections:
+        if inbound_seen:
+            # Both rankings cover the whole sketch window, not just this batch
+            traffic = self.traffic_window.merged()
             self.logger.info("\nMost active destination ports:")
-            port_activity = [(port, sum(connections.values())) 
-                           for port, connections in inbound_connections.items()]
-            port_activity.sort(key=lambda x: x[1], reverse=True)
-            for port, count in port_activity[:5]:
+            for port, count in traffic.top_ports.top(5):
                 self.logger.info(f"Port {port}: {count} connections")
 
-        if port_scans:
             self.logger.info("\nMost active source IPs:")
-            ip_activity = [(ip, len(ports)) for ip, ports in port_scans.items()]
+            ip_activity = [(ip, int(round(ports))) for ip, ports in traffic.ports_per_source.counts().items()]
             ip_activity.sort(key=lambda x: x[1], reverse=True)
             for ip, port_count in ip_activity[:10]:  # Show more IPs now
-                # Resolve IP to hostname
-                hostname = resolve_ip(ip)
-                # Show both IP and hostname if they're different
-                if hostname != ip:
-                    self.logger.info(f"IP {ip} ({hostname}): accessed {port_count} unique ports")
-                else:
-                    self.logger.info(f"IP {ip}: accessed {port_count} unique ports")
+                # The hostname appears once a background lookup has cached it
+                self.logger.info(f"IP {self.dns_resolver.format(ip)}: accessed {port_count} unique ports")
+
+    def _track_inbound(self, record, timestamp):
+        """Add an inbound TCP/UDP packet to the long-term traffic sketches."""
+        sketch = self.traffic_window.sketch_for(timestamp)
+        if sketch is not None:
+            sketch.add(record.src_ip, record.dst_ip, record.dst_port, record.length)
 
     def _check_payload_for_threats(self, payload):
-        """Check packet payload for potential threats with context."""
+        """
+        Check raw packet payload bytes for potential threats with context.
+
+        Returns:
+            list: (description, (encoding, context), ScanMatch) tuples; the
+            ScanMatch carries the pattern id and the match's byte offsets
+        """
         if self._is_binary_or_encrypted(payload):
             return []
+        return self._scan_for_threats(payload)
 
+    def _check_stream_for_threats(self, chunk):
+        """
+        Check newly reassembled TCP stream data for potential threats with context.
+
+        Args:
+            chunk: StreamChunk from the reassembler, or None
+
+        Returns:
+            list: Same tuples as _check_payload_for_threats, with stream offsets
+        """
+        if chunk is None:
+            return []
+        return self._scan_for_threats(chunk.data, chunk.new_start, chunk.offset)
+
+    def _scan_for_threats(self, data, new_start=0, offset=0):
+        """
+        Scan bytes for threats and extract the context of each match.
+
+        Args:
+            data: Bytes to scan
+            new_start: Matches ending at or before this offset were already reported
+            offset: Added to match offsets in the returned ScanMatch tuples
+        """
         detected_threats = []
-        for pattern, description in self.threat_patterns.items():
-            try:
-                if re.search(pattern, payload):
-                    matches = re.finditer(pattern, payload)
-                    for match in matches:
-                        start = max(0, match.start() - 20)
-                        end = min(len(payload), match.end() + 20)
-                        context = payload[start:end].strip()
-                        if not self._is_binary_or_encrypted(context):
-                            detected_threats.append((description, context))
-            except Exception as e:
-                self.logger.debug(f"Error checking pattern {pattern}: {e}")
+        try:
+            matches = self.threat_scanner.scan(data)
+        except Exception as e:
+            self.logger.debug(f"Error scanning payload: {e}")
+            return []
+
+        for match in matches:
+            if match.end <= new_start:
                 continue
+            start = max(0, match.start - 20)
+            end = min(len(data), match.end + 20)
+            context, encoding = decode_context(data[start:end])
+            context = context.strip()
+            # Only report matches with meaningful context
+            if not self._is_binary_or_encrypted(context):
+                if offset:
+                    match = match._replace(start=match.start + offset, end=match.end + offset)
+                detected_threats.append(
+                    (self.threat_scanner.description(match.pattern_id), (encoding, context), match)
+                )
         return detected_threats
 
-    def _is_whitelisted(self, packet):
-        """Check if packet matches any whitelist patterns."""
+    def _is_whitelisted(self, record, payload=None):
+        """Check if packet matches any whitelist patterns.
+
+        payload is the part of the record's payload being inspected; it
+        defaults to the whole payload.
+        """
         try:
-            if Raw in packet:
-                try:
-                    raw_data = packet[Raw].load
-                    decoded_payload, _ = self._decode_payload(raw_data)
-                    
-                    if decoded_payload:
-                        if self._is_binary_or_encrypted(decoded_payload):
-                            return True
-                            
-                        return any(re.search(pattern, decoded_payload) for pattern in self.whitelist_patterns)
-                except:
+            if record.payload_length:
+                if payload is None:
+                    payload = record.payload
+                if self._is_binary_or_encrypted(payload):
                     return True
+                return self.whitelist_regex.search(payload) is not None
             return False
         except Exception:
             # If we can't determine, assume it's whitelisted to avoid false positives
-            return True
\ No newline at end of file
+            return True
@@ -11,6 +11,11 @@ import time
 import multiprocessing
 from multiprocessing import Queue, Process
 from queue import Empty
+from af_packet import (
+    fanout_supported, new_fanout_group_id, open_fanout_socket, recv_frame,
+    socket_statistics, interface_packet_count
+)
+from shared_ring_buffer import SharedRingBuffer
 try:
     from tqdm import tqdm
 except ImportError:
@@ -33,16 +38,67 @@ class PacketCapture:
     """
     Represents a packet capture.
     """
-    def __init__(self, logger):
+    def __init__(self, logger, backend='auto'):
         """
         Special method __init__.
+
+        Args:
+            logger: Logger object for recording capture events
+            backend: 'fanout' for AF_PACKET fanout sockets, 'scapy' for scapy sniff,
+                or 'auto' to use fanout wherever the platform supports it
         """
         self.logger = logger
+        if backend == 'auto':
+            backend = 'fanout' if fanout_supported() else 'scapy'
+        elif backend == 'fanout' and not fanout_supported():
+            self.logger.warning("AF_PACKET fanout is not supported on this platform, using scapy")
+            backend = 'scapy'
+        self.backend = backend
         try:
             self.num_cores = multiprocessing.cpu_count()
         except Exception:
             self.num_cores = 1
             self.logger.warning("Could not determine number of CPU cores, defaulting to 1")
+        self.ring_slots = 32768                    # Frames each worker's ring can hold
+        self.ring_data_size = 16 * 1024 * 1024     # Frame bytes each worker's ring can hold
+        self.stream_rings = []
+        self.next_ring = 0                      # Ring the next read starts from
+        self.stream_stop = None
+        self.stream_processes = []
+        self.stream_interface = None
+        self.interface_packets_start = None
+        self.kernel_filter = None               # Packed BPF program for fanout sockets
+        self.kernel_filter_expression = None    # The same filter in libpcap syntax for scapy
+        self.kernel_filter_sample_rate = 0
+
+    def __getstate__(self):
+        """
+        Pickle the capture settings for a spawned worker process.
+
+        The worker methods are bound to this object, so with the spawn start
+        method it is pickled for every worker. The stream's rings hold views
+        into shared memory and its processes and stop event belong to the
+        parent, so they are left out; workers attach to their ring by name.
+        """
+        state = self.__dict__.copy()
+        state.update(stream_rings=[], stream_processes=[], stream_stop=None)
+        return state
+
+    def set_kernel_filter(self, filter_code, expression, sample_rate=0):
+        """
+        Filter packets in the kernel before they reach the capture workers.
+
+        Args:
+            filter_code: Packed BPF program attached to fanout sockets
+            expression: Equivalent libpcap filter expression for the scapy backend
+            sample_rate: The 1-in-N sample of filtered packets the BPF program keeps;
+                the scapy backend cannot sample and drops all of them
+        """
+        self.kernel_filter = filter_code
+        self.kernel_filter_expression = expression or None
+        self.kernel_filter_sample_rate = sample_rate
+        if self.backend == 'scapy' and sample_rate:
+            self.logger.warning("The scapy capture backend cannot sample filtered packets; dropping all of them")
 
     def capture_packets_worker(self, interface, count, result_queue):
         """
@@ -68,7 +124,8 @@ class PacketCapture:
                 prn=packet_handler,
                 store=False,
                 count=count,
-                timeout=30
+                timeout=30,
+                filter=self.kernel_filter_expression
             )
         except Exception as e:
             self.logger.error(f"Capture error on interface {interface}: {e}")
@@ -78,6 +135,125 @@ class PacketCapture:
             except Exception as e:
                 self.logger.debug(f"Error putting None in queue: {e}")
 
+    def capture_fanout_worker(self, interface, count, result_queue, stop_event, group_id, ring_spec=None):
+        """
+        Capture packets from one member of an AF_PACKET fanout group.
+
+        A count of 0 captures into the worker's shared ring buffer until the
+        stop event is set; otherwise packets go to the result queue and the
+        worker gives up after 30 seconds, like the scapy worker.
+        """
+        packets_captured = 0
+        deadline = time.monotonic() + 30 if count else None
+        ring = SharedRingBuffer.attach(*ring_spec) if ring_spec else None
+        sock = None
+        next_stats = time.monotonic() + 1.0
+        try:
+            sock = open_fanout_socket(interface, group_id, filter_code=self.kernel_filter)
+            while not stop_event.is_set() and (count == 0 or packets_captured < count):
+                if deadline is not None and time.monotonic() >= deadline:
+                    break
+                if ring is not None and time.monotonic() >= next_stats:
+                    # Publish the kernel's filter and drop counters once a second
+                    ring.add_kernel_stats(*socket_statistics(sock))
+                    next_stats = time.monotonic() + 1.0
+                frame = recv_frame(sock)
+                if frame is None:
+                    continue
+                if ring is not None:
+                    # A full ring drops the frame rather than stalling the socket
+                    ring.push(*frame)
+                else:
+                    result_queue.put(frame)
+                packets_captured += 1
+        except Exception as e:
+            self.logger.error(f"Fanout capture error on interface {interface}: {e}")
+        finally:
+            if sock is not None:
+                if ring is not None:
+                    try:
+                        ring.add_kernel_stats(*socket_statistics(sock))
+                    except OSError as e:
+                        self.logger.debug(f"Error reading socket statistics: {e}")
+                sock.close()
+            if ring is not None:
+                ring.close()
+            if count:
+                try:
+                    result_queue.put(None)
+                except Exception as e:
+                    self.logger.debug(f"Error putting None in queue: {e}")
+
+    def _new_ring_spec(self):
+        """
+        Create a ring buffer for a stream worker and return how to attach to it.
+        """
+        ring = SharedRingBuffer.create(self.ring_slots, self.ring_data_size)
+        self.stream_rings.append(ring)
+        return (ring.name, self.ring_slots, self.ring_data_size)
+
+    def _discard_ring(self, ring_spec):
+        """
+        Free the ring buffer of a stream worker that failed to start.
+        """
+        if ring_spec is None:
+            return
+        for ring in self.stream_rings:
+            if ring.name == ring_spec[0]:
+                self.stream_rings.remove(ring)
+                ring.close()
+                break
+
+    def _start_workers(self, interface, count, result_queue, stop_event):
+        """
+        Start the capture worker processes for the configured backend.
+
+        Fanout workers split the traffic between them, so one is started per
+        core. Scapy workers would each see every packet, so only one is used.
+        With a count of 0 each worker streams into its own ring buffer.
+        """
+        processes = []
+        if self.backend == 'fanout':
+            group_id = new_fanout_group_id()
+            num_workers = self.num_cores if count == 0 else min(self.num_cores, count)
+            per_worker = 0 if count == 0 else max(1, count // num_workers)
+            for i in range(num_workers):
+                ring_spec = None
+                try:
+                    ring_spec = self._new_ring_spec() if count == 0 else None
+                    p = Process(
+                        target=self.capture_fanout_worker,
+                        args=(interface, per_worker, result_queue, stop_event, group_id, ring_spec),
+                        daemon=True
+                    )
+                    p.start()
+                    processes.append(p)
+                except Exception as e:
+                    self.logger.error(f"Error starting worker process {i}: {e}")
+                    self._discard_ring(ring_spec)
+        else:
+            ring_spec = None
+            try:
+                if count == 0:
+                    ring_spec = self._new_ring_spec()
+                    p = Process(
+                        target=self.capture_stream_worker,
+                        args=(interface, ring_spec, stop_event),
+                        daemon=True
+                    )
+                else:
+                    p = Process(
+                        target=self.capture_packets_worker,
+                        args=(interface, count, result_queue),
+                        daemon=True
+                    )
+                p.start()
+                processes.append(p)
+            except Exception as e:
+                self.logger.error(f"Error starting worker process: {e}")
+                self._discard_ring(ring_spec)
+        return processes
+
     def capture_packets(self, interface, total_count):
         """
         Capture packets based on interface, total count.
@@ -93,21 +269,8 @@ class PacketCapture:
                 return []
 
             result_queue = Queue()
-            processes = []
-            packets_per_worker = max(1, total_count // self.num_cores)
-            
-            # Start worker processes
-            for i in range(min(self.num_cores, total_count)):
-                try:
-                    p = Process(
-                        target=self.capture_packets_worker,
-                        args=(interface, packets_per_worker, result_queue),
-                        daemon=True
-                    )
-                    processes.append(p)
-                    p.start()
-                except Exception as e:
-                    self.logger.error(f"Error starting worker process {i}: {e}")
+            stop_event = multiprocessing.Event()
+            processes = self._start_workers(interface, total_count, result_queue, stop_event)
 
             all_packets = []
             completed_workers = 0
@@ -128,6 +291,7 @@ class PacketCapture:
                         continue
 
             # Cleanup
+            stop_event.set()
             for p in processes:
                 try:
                     if p.is_alive():
@@ -140,4 +304,190 @@ class PacketCapture:
 
         except Exception as e:
             self.logger.error(f"Capture failed: {e}")
-            return []
\ No newline at end of file
+            return []
+
+    def capture_stream_worker(self, interface, ring_spec, stop_event):
+        """
+        Capture packets continuously into a ring buffer until the stop event is set.
+        """
+        ring = SharedRingBuffer.attach(*ring_spec)
+
+        def packet_handler(pkt):
+            """
+            Packet handler based on pkt.
+            """
+            try:
+                # A full ring drops the packet rather than stalling the sniffer
+                ring.push(float(pkt.time), bytes(pkt))
+            except Exception as e:
+                self.logger.debug(f"Error processing packet: {e}")
+
+        try:
+            while not stop_event.is_set():
+                try:
+                    sniff(
+                        iface=interface,
+                        prn=packet_handler,
+                        store=False,
+                        timeout=1,
+                        filter=self.kernel_filter_expression
+                    )
+                except Exception as e:
+                    self.logger.error(f"Capture error on interface {interface}: {e}")
+                    time.sleep(1)
+        finally:
+            ring.close()
+
+    def start_stream(self, interface):
+        """
+        Start continuous capture on an interface.
+        """
+        if not interface:
+            self.logger.error("No interface specified for packet capture")
+            return False
+
+        self.stream_rings = []
+        self.next_ring = 0
+        self.stream_stop = multiprocessing.Event()
+        self.stream_interface = interface
+        self.interface_packets_start = interface_packet_count(interface)
+        self.stream_processes = self._start_workers(interface, 0, None, self.stream_stop)
+        if not self.stream_processes:
+            self.stop_stream()
+            return False
+        self.logger.info(
+            f"Capturing with {len(self.stream_processes)} {self.backend} worker(s) on {interface}"
+        )
+        return True
+
+    def read_frame_batches(self, max_count, timeout):
+        """
+        Take up to max_count frames from the worker ring buffers.
+
+        Waits up to timeout seconds for the first frame. max_count is split
+        fairly between the rings: each ring gets an equal share, and a ring
+        with fewer frames waiting passes its unused share on to the others.
+        Rings that tie are read from a starting ring that rotates on every
+        call, so under sustained load no worker's ring is starved. Each
+        returned FrameBatch holds memoryviews into shared memory and must be
+        released once the caller is done with it.
+        """
+        batches = []
+        if not self.stream_rings:
+            time.sleep(timeout)
+            return batches
+
+        deadline = time.monotonic() + timeout
+        delay = 0.0005
+        while True:
+            rings = len(self.stream_rings)
+            first = self.next_ring % rings
+            self.next_ring = first + 1
+            rotated = self.stream_rings[first:] + self.stream_rings[:first]
+            # Serve the rings with the fewest frames waiting first, so that
+            # their leftover share goes to the busier ones
+            waiting = sorted(((ring.pending(), ring) for ring in rotated), key=lambda item: item[0])
+            remaining = max_count
+            for index, (pending, ring) in enumerate(waiting):
+                if remaining <= 0:
+                    break
+                share = min(pending, -(-remaining // (rings - index)))
+                batch = ring.read_batch(share) if share > 0 else None
+                if batch is not None:
+                    batches.append(batch)
+                    remaining -= len(batch)
+            if batches or time.monotonic() >= deadline:
+                return batches
+            time.sleep(min(delay, max(0.0, deadline - time.monotonic())))
+            delay = min(delay * 2, 0.01)
+
+    def read_packets(self, max_count, timeout):
+        """
+        Read up to max_count packets from the running stream.
+
+        Waits up to timeout seconds for the first packet and then takes
+        whatever else the workers have already written without waiting.
+        Each frame is copied out of shared memory once, into the bytes the
+        decoder dissects and the packet records keep, so the ring space is
+        released before the batch leaves the capture thread.
+        """
+        packets = []
+        for batch in self.read_frame_batches(max_count, timeout):
+            packets.extend(batch.to_packets())
+            batch.release()
+        return packets
+
+    @property
+    def dropped_packets(self):
+        """
+        Number of packets the stream workers dropped because a ring was full.
+        """
+        return sum(ring.dropped for ring in self.stream_rings if ring.header is not None)
+
+    def capture_stats(self):
+        """
+        Counters of the running stream.
+
+        Returns:
+            dict: interface_packets (seen on the interface since the stream
+            started, or None if unknown), delivered (frames the workers
+            received), socket_dropped (dropped by the kernel on full socket
+            buffers), ring_dropped (dropped on full ring buffers) and filtered
+            (estimated packets the kernel filter discarded, or None)
+        """
+        rings = [ring for ring in self.stream_rings if ring.header is not None]
+        delivered = sum(ring.received for ring in rings)
+        socket_dropped = sum(ring.kernel_stats[1] for ring in rings)
+        stats = {
+            'interface_packets': None,
+            'delivered': delivered,
+            'socket_dropped': socket_dropped,
+            'ring_dropped': sum(ring.dropped for ring in rings),
+            'filtered': None,
+        }
+        current = interface_packet_count(self.stream_interface) if self.stream_interface else None
+        if current is not None and self.interface_packets_start is not None:
+            stats['interface_packets'] = current - self.interface_packets_start
+            if self.kernel_filter or self.kernel_filter_expression:
+                # Interface counters and packet sockets count slightly differently
+                # (e.g. loopback), so this is an estimate
+                stats['filtered'] = max(0, stats['interface_packets'] - delivered - socket_dropped)
+        return stats
+
+    def stop_stream(self):
+        """
+        Stop continuous capture and clean up the worker processes.
+        """
+        if self.stream_stop is not None:
+            self.stream_stop.set()
+
+        for p in self.stream_processes:
+            try:
+                p.join(timeout=2)
+                if p.is_alive():
+                    p.terminate()
+                    p.join(timeout=1)
+            except Exception as e:
+                self.logger.debug(f"Error cleaning up process: {e}")
+
+        if self.stream_rings:
+            dropped = self.dropped_packets
+            if dropped:
+                self.logger.warning(f"Capture workers dropped {dropped} packets on full ring buffers")
+            stats = self.capture_stats()
+            if stats['filtered'] is not None:
+                sample = (f", keeping a 1-in-{self.kernel_filter_sample_rate} sample"
+                          if self.kernel_filter_sample_rate and self.backend == 'fanout' else "")
+                self.logger.info(
+                    f"Kernel filter: about {stats['filtered']} of {stats['interface_packets']} packets "
+                    f"filtered in the kernel{sample}, {stats['delivered']} delivered"
+                )
+            if stats['socket_dropped']:
+                self.logger.warning(f"Kernel dropped {stats['socket_dropped']} packets on full socket buffers")
+        for ring in self.stream_rings:
+            ring.close()
+
+        self.stream_processes = []
+        self.stream_rings = []
+        self.stream_stop = None
+        self.stream_interface = None
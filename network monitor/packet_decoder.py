@@ -0,0 +1,241 @@
+"""
+This script handles decoding raw frames once into compact packet records.
+"""
+
+import ipaddress
+try:
+    from scapy.all import Ether, Raw, Padding
+    from scapy.layers.inet import IP, TCP, UDP
+    from scapy.layers.inet6 import IPv6, ICMPv6ND_NS
+    from scapy.layers.dns import DNS, DNSQR
+    from scapy.layers.l2 import ARP, STP
+except ImportError:
+    print("Warning: scapy is not installed. Packet decoding will not be available.")
+
+# Bit flags for DecodedPacket.flags
+FLAG_TCP = 0x001
+FLAG_UDP = 0x002
+FLAG_DNS = 0x004
+FLAG_LLMNR = 0x008
+FLAG_ARP = 0x010
+FLAG_STP = 0x020
+FLAG_ICMPV6_ND = 0x040
+FLAG_MULTICAST = 0x080
+FLAG_BROADCAST = 0x100
+
+# Traffic direction relative to the local network
+DIRECTION_UNKNOWN = 0
+DIRECTION_INBOUND = 1
+DIRECTION_OUTBOUND = 2
+DIRECTION_LOCAL = 3
+DIRECTION_EXTERNAL = 4
+
+LLMNR_PORT = 5355
+
+
+class DecodedPacket:
+    """Compact record of the header fields of one frame, decoded once per batch."""
+
+    __slots__ = (
+        'timestamp', 'frame', 'length', 'eth_src', 'eth_dst', 'ethertype',
+        'ip_version', 'src_ip', 'dst_ip', 'ttl', 'proto', 'src_port', 'dst_port',
+        'tcp_flags', 'tcp_seq', 'payload_offset', 'payload_length', 'transport_payload_length',
+        'direction', 'flags',
+        'dns_qname', 'dns_qtype', 'dns_response', 'top_layer'
+    )
+
+    def __init__(self, timestamp, frame):
+        """Create an empty record for a raw frame."""
+        self.timestamp = timestamp
+        self.frame = frame
+        self.length = len(frame)
+        self.eth_src = None
+        self.eth_dst = None
+        self.ethertype = 0
+        self.ip_version = 0
+        self.src_ip = None
+        self.dst_ip = None
+        self.ttl = 0
+        self.proto = 0
+        self.src_port = 0
+        self.dst_port = 0
+        self.tcp_flags = 0
+        self.tcp_seq = 0
+        self.payload_offset = 0
+        self.payload_length = 0
+        self.transport_payload_length = 0   # Bytes after the TCP/UDP header, including dissected protocols
+        self.direction = DIRECTION_UNKNOWN
+        self.flags = 0
+        self.dns_qname = None
+        self.dns_qtype = 0
+        self.dns_response = False
+        self.top_layer = "Unknown"
+
+    @property
+    def payload(self):
+        """Application payload bytes, or empty bytes if the frame has none."""
+        if not self.payload_length:
+            return b''
+        return self.frame[self.payload_offset:self.payload_offset + self.payload_length]
+
+    @property
+    def is_tcp(self):
+        return bool(self.flags & FLAG_TCP)
+
+    @property
+    def is_udp(self):
+        return bool(self.flags & FLAG_UDP)
+
+    def summary(self):
+        """Short one-line description, similar to scapy's packet summary."""
+        if self.ip_version:
+            layer = "IP" if self.ip_version == 4 else "IPv6"
+            if self.flags & (FLAG_TCP | FLAG_UDP):
+                proto = "TCP" if self.flags & FLAG_TCP else "UDP"
+                text = f"Ether / {layer} / {proto} {self.src_ip}:{self.src_port} > {self.dst_ip}:{self.dst_port}"
+                if self.flags & FLAG_TCP:
+                    text += f" flags=0x{self.tcp_flags:02x}"
+                return text
+            return f"Ether / {layer} {self.src_ip} > {self.dst_ip} proto={self.proto}"
+        if self.flags & FLAG_ARP:
+            return f"Ether / ARP {self.eth_src} > {self.eth_dst}"
+        return f"Ether {self.eth_src} > {self.eth_dst} type=0x{self.ethertype:04x}"
+
+
+class PacketDecoder:
+    """
+    Turns raw captured frames into DecodedPacket records.
+
+    Each frame is dissected exactly once. The analyzer, the feature
+    extractor and the anomaly detailer all read the resulting records
+    instead of parsing the bytes again.
+    """
+
+    def __init__(self, logger=None):
+        """
+        Special method __init__.
+        """
+        self.logger = logger
+
+    def decode_batch(self, raw_packets, local_network=None):
+        """
+        Decode a batch of (timestamp, raw_bytes) tuples.
+
+        Args:
+            raw_packets: List of captured packets
+            local_network: Optional ipaddress network used to set each record's direction
+
+        Returns:
+            list: DecodedPacket records, one per frame that could be decoded
+        """
+        records = []
+        for packet_data in raw_packets:
+            if isinstance(packet_data, DecodedPacket):
+                records.append(packet_data)
+                continue
+            try:
+                if isinstance(packet_data, tuple):
+                    timestamp, frame = packet_data[0], packet_data[1]
+                else:
+                    timestamp, frame = None, packet_data
+                record = self.decode(timestamp, bytes(frame))
+                if local_network is not None:
+                    record.direction = self.direction(record, local_network)
+                records.append(record)
+            except Exception as e:
+                if self.logger:
+                    self.logger.debug(f"Error decoding packet: {e}")
+        return records
+
+    def decode(self, timestamp, frame):
+        """Dissect one Ethernet frame and copy out the fields the monitor uses."""
+        record = DecodedPacket(float(timestamp) if timestamp is not None else None, frame)
+        packet = Ether(frame)
+
+        record.eth_src = packet.src
+        record.eth_dst = packet.dst
+        # 802.3 frames (STP, CDP) dissect as Dot3, which has a length instead of a type
+        record.ethertype = getattr(packet, 'type', 0)
+        record.top_layer = packet.lastlayer().name
+
+        flags = 0
+        if record.eth_dst.startswith("01:00:5e") or record.eth_dst.startswith("33:33"):
+            flags |= FLAG_MULTICAST
+        if record.eth_dst == "ff:ff:ff:ff:ff:ff":
+            flags |= FLAG_BROADCAST
+
+        if IP in packet:
+            ip = packet[IP]
+            record.ip_version = 4
+            record.src_ip = ip.src
+            record.dst_ip = ip.dst
+            record.ttl = ip.ttl
+            record.proto = ip.proto
+            if ip.dst == "255.255.255.255":
+                flags |= FLAG_BROADCAST
+        elif IPv6 in packet:
+            ip = packet[IPv6]
+            record.ip_version = 6
+            record.src_ip = ip.src
+            record.dst_ip = ip.dst
+            record.ttl = ip.hlim
+            record.proto = ip.nh
+            if ICMPv6ND_NS in packet:
+                flags |= FLAG_ICMPV6_ND
+
+        if TCP in packet:
+            tcp = packet[TCP]
+            flags |= FLAG_TCP
+            record.src_port = tcp.sport
+            record.dst_port = tcp.dport
+            record.tcp_flags = int(tcp.flags)
+            record.tcp_seq = tcp.seq
+            record.transport_payload_length = len(tcp) - tcp.dataofs * 4
+        elif UDP in packet:
+            udp = packet[UDP]
+            flags |= FLAG_UDP
+            record.src_port = udp.sport
+            record.dst_port = udp.dport
+            record.transport_payload_length = len(udp) - 8
+            if LLMNR_PORT in (udp.sport, udp.dport):
+                flags |= FLAG_LLMNR
+
+        if DNS in packet:
+            flags |= FLAG_DNS
+            record.dns_response = bool(packet[DNS].qr)
+            if packet.haslayer(DNSQR):
+                record.dns_qname = packet[DNSQR].qname.decode('utf-8', errors='ignore')
+                record.dns_qtype = packet[DNSQR].qtype
+
+        if ARP in packet:
+            flags |= FLAG_ARP
+        if STP in packet:
+            flags |= FLAG_STP
+
+        if record.transport_payload_length and Padding in packet:
+            # Ethernet padding past the IP length is not payload
+            record.transport_payload_length = max(record.transport_payload_length - len(packet[Padding]), 0)
+
+        if Raw in packet:
+            raw = packet[Raw]
+            record.payload_length = len(raw.load)
+            # len(raw) also counts any Ethernet padding that follows the load
+            record.payload_offset = len(frame) - len(raw)
+
+        record.flags = flags
+        return record
+
+    @staticmethod
+    def direction(record, local_network):
+        """Classify a record's direction relative to the local network."""
+        if record.ip_version != local_network.version:
+            return DIRECTION_UNKNOWN
+        src_local = ipaddress.ip_address(record.src_ip) in local_network
+        dst_local = ipaddress.ip_address(record.dst_ip) in local_network
+        if dst_local and not src_local:
+            return DIRECTION_INBOUND
+        if src_local and not dst_local:
+            return DIRECTION_OUTBOUND
+        if src_local and dst_local:
+            return DIRECTION_LOCAL
+        return DIRECTION_EXTERNAL
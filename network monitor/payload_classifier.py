@@ -0,0 +1,103 @@
+"""
+This script handles classifying payloads as text or binary/encrypted from their byte histogram.
+"""
+
+import math
+from collections import namedtuple
+import numpy as np
+
+# Bytes that can appear in text: tab, newline, carriage return, printable
+# ASCII, and every byte >= 0x80 since UTF-8 and cp1255 Hebrew use them
+_TEXT_BYTES = np.zeros(256, dtype=bool)
+_TEXT_BYTES[[0x09, 0x0A, 0x0D]] = True
+_TEXT_BYTES[0x20:0x7F] = True
+_TEXT_BYTES[0x80:] = True
+
+# Result of classifying one payload
+PayloadVerdict = namedtuple('PayloadVerdict', 'length printable_ratio entropy is_binary')
+
+
+class PayloadClassifier:
+    """
+    Decides whether payloads look like text or like binary/encrypted data.
+
+    One np.bincount over a frombuffer view gives the byte histogram; the
+    printable ratio and the Shannon entropy in bits per byte are both derived
+    from it. Verdicts are cached by payload content until clear() is called,
+    which the analyzer does once per batch, so a payload that is checked by
+    several stages is only classified once.
+    """
+
+    def __init__(self, min_printable_ratio=0.30, max_entropy_ratio=0.9,
+                 min_entropy_length=32, max_cache=65536):
+        """
+        Initialize the classifier.
+
+        Args:
+            min_printable_ratio: Payloads with fewer text bytes than this are binary
+            max_entropy_ratio: Payloads whose entropy exceeds this fraction of the
+                highest entropy possible at their length look random (compressed
+                or encrypted)
+            min_entropy_length: Shorter payloads are judged on the printable ratio only
+            max_cache: Maximum cached verdicts before the cache is reset
+        """
+        self.min_printable_ratio = min_printable_ratio
+        self.max_entropy_ratio = max_entropy_ratio
+        self.min_entropy_length = min_entropy_length
+        self.max_cache = max_cache
+        self.cache = {}
+        self.stats = {'classified': 0, 'cache_hits': 0}
+
+    def clear(self):
+        """Forget cached verdicts, e.g. at the start of a new batch."""
+        self.cache.clear()
+
+    def classify(self, data):
+        """
+        Classify a payload.
+
+        Args:
+            data: Payload bytes, or text (classified by its UTF-8 encoding)
+
+        Returns:
+            PayloadVerdict
+        """
+        if isinstance(data, str):
+            data = data.encode('utf-8', errors='surrogatepass')
+        elif not isinstance(data, bytes):
+            data = bytes(data)
+
+        verdict = self.cache.get(data)
+        if verdict is not None:
+            self.stats['cache_hits'] += 1
+            return verdict
+
+        verdict = self._classify(data)
+        if len(self.cache) >= self.max_cache:
+            self.cache.clear()
+        self.cache[data] = verdict
+        self.stats['classified'] += 1
+        return verdict
+
+    def is_binary(self, data):
+        """True if the payload looks binary or encrypted."""
+        return self.classify(data).is_binary
+
+    def _classify(self, data):
+        """Compute the verdict for one payload."""
+        length = len(data)
+        if length == 0:
+            return PayloadVerdict(0, 0.0, 0.0, True)
+
+        counts = np.bincount(np.frombuffer(data, dtype=np.uint8), minlength=256)
+        printable_ratio = float(counts[_TEXT_BYTES].sum()) / length
+
+        nonzero = counts[counts > 0] / length
+        entropy = float(-(nonzero * np.log2(nonzero)).sum())
+
+        is_binary = printable_ratio < self.min_printable_ratio
+        if not is_binary and length >= self.min_entropy_length:
+            # A random byte string of this length would have about this much entropy
+            max_entropy = math.log2(min(length, 256))
+            is_binary = entropy > self.max_entropy_ratio * max_entropy
+        return PayloadVerdict(length, printable_ratio, entropy, is_binary)
@@ -0,0 +1,262 @@
+"""
+This script handles memory-mapped reading and replay of pcap and pcapng files.
+"""
+
+import mmap
+import os
+import struct
+import time
+
+# Link-layer types the analysis stages understand
+LINKTYPE_ETHERNET = 1
+
+PCAP_MAGIC = {
+    b'\xd4\xc3\xb2\xa1': ('<', 1e-6),   # Little-endian, microsecond timestamps
+    b'\xa1\xb2\xc3\xd4': ('>', 1e-6),   # Big-endian, microsecond timestamps
+    b'\x4d\x3c\xb2\xa1': ('<', 1e-9),   # Little-endian, nanosecond timestamps
+    b'\xa1\xb2\x3c\x4d': ('>', 1e-9),   # Big-endian, nanosecond timestamps
+}
+PCAPNG_SECTION_HEADER = 0x0A0D0D0A
+PCAPNG_BYTE_ORDER_MAGIC = 0x1A2B3C4D
+PCAPNG_INTERFACE_DESCRIPTION = 1
+PCAPNG_PACKET = 2
+PCAPNG_SIMPLE_PACKET = 3
+PCAPNG_ENHANCED_PACKET = 6
+PCAPNG_OPTION_TSRESOL = 9
+
+PCAP_EXTENSIONS = ('.pcap', '.pcapng', '.cap')
+
+
+class PcapReader:
+    """
+    Memory-mapped reader for pcap and pcapng files.
+
+    Iterating yields (timestamp, linktype, frame) tuples where frame is a
+    memoryview slice of the mapped file, so no packet bytes are copied. The
+    views are only valid until the reader is closed.
+    """
+
+    def __init__(self, path):
+        """Open and map a capture file."""
+        self.path = path
+        self.file = open(path, 'rb')
+        self.size = os.fstat(self.file.fileno()).st_size
+        self.map = None
+        self.view = None
+        if self.size:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.view = memoryview(self.map)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __iter__(self):
+        if self.view is None or self.size < 4:
+            return iter(())
+        magic = bytes(self.view[:4])
+        if magic in PCAP_MAGIC:
+            return self._iter_pcap(*PCAP_MAGIC[magic])
+        if struct.unpack_from('<I', self.view, 0)[0] == PCAPNG_SECTION_HEADER:
+            return self._iter_pcapng()
+        raise ValueError(f"{self.path} is not a pcap or pcapng file")
+
+    def _iter_pcap(self, order, resolution):
+        """Yield frames from a classic pcap file."""
+        view = self.view
+        if self.size < 24:
+            return
+        linktype = struct.unpack_from(order + 'I', view, 20)[0] & 0x0fffffff
+        record = struct.Struct(order + 'IIII')
+        offset = 24
+        while offset + record.size <= self.size:
+            ts_sec, ts_frac, incl_len, _ = record.unpack_from(view, offset)
+            offset += record.size
+            if offset + incl_len > self.size:
+                break  # Truncated final record
+            yield ts_sec + ts_frac * resolution, linktype, view[offset:offset + incl_len]
+            offset += incl_len
+
+    def _iter_pcapng(self):
+        """Yield frames from a pcapng file, following its sections and interfaces."""
+        view = self.view
+        order = '<'
+        interfaces = []
+        offset = 0
+        while offset + 12 <= self.size:
+            block_type = struct.unpack_from(order + 'I', view, offset)[0]
+
+            if block_type == PCAPNG_SECTION_HEADER:
+                # Each section can switch byte order and resets the interface list
+                magic = struct.unpack_from('<I', view, offset + 8)[0]
+                order = '<' if magic == PCAPNG_BYTE_ORDER_MAGIC else '>'
+                interfaces = []
+
+            block_len = struct.unpack_from(order + 'I', view, offset + 4)[0]
+            if block_len < 12 or offset + block_len > self.size:
+                break
+            body = offset + 8
+            body_end = offset + block_len - 4
+
+            if block_type == PCAPNG_INTERFACE_DESCRIPTION:
+                linktype = struct.unpack_from(order + 'H', view, body)[0]
+                resolution = self._tsresol(view, order, body + 8, body_end)
+                interfaces.append((linktype, resolution))
+
+            elif block_type in (PCAPNG_ENHANCED_PACKET, PCAPNG_PACKET):
+                if block_type == PCAPNG_ENHANCED_PACKET:
+                    if_id, ts_high, ts_low, cap_len, _ = struct.unpack_from(order + 'IIIII', view, body)
+                else:
+                    if_id, _, ts_high, ts_low, cap_len, _ = struct.unpack_from(order + 'HHIIII', view, body)
+                data = body + 20
+                if if_id < len(interfaces) and data + cap_len <= body_end:
+                    linktype, resolution = interfaces[if_id]
+                    timestamp = ((ts_high << 32) | ts_low) * resolution
+                    yield timestamp, linktype, view[data:data + cap_len]
+
+            elif block_type == PCAPNG_SIMPLE_PACKET and interfaces:
+                orig_len = struct.unpack_from(order + 'I', view, body)[0]
+                data = body + 4
+                cap_len = min(orig_len, body_end - data)
+                # Simple packet blocks carry no timestamp
+                yield None, interfaces[0][0], view[data:data + cap_len]
+
+            offset += block_len
+
+    @staticmethod
+    def _tsresol(view, order, offset, end):
+        """Read the if_tsresol option of an interface description block."""
+        while offset + 4 <= end:
+            code, length = struct.unpack_from(order + 'HH', view, offset)
+            if code == 0:
+                break
+            if code == PCAPNG_OPTION_TSRESOL and length >= 1:
+                value = view[offset + 4]
+                if value & 0x80:
+                    return 2.0 ** -(value & 0x7f)
+                return 10.0 ** -value
+            offset += 4 + ((length + 3) & ~3)
+        return 1e-6
+
+    def close(self):
+        """Unmap and close the file."""
+        if self.view is not None:
+            try:
+                self.view.release()
+            except BufferError:
+                pass
+            self.view = None
+        if self.map is not None:
+            try:
+                self.map.close()
+            except BufferError:
+                # A frame view is still referenced; the mapping closes with it
+                pass
+            self.map = None
+        self.file.close()
+
+
+def find_pcap_files(directory):
+    """Return the capture files in a directory, sorted by name."""
+    return sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.lower().endswith(PCAP_EXTENSIONS)
+    )
+
+
+class PcapReplaySource:
+    """
+    Packet source that replays capture files into the capture pipeline.
+
+    In the default mode frames are delivered as fast as the pipeline takes
+    them. With realtime=True delivery follows the recorded timestamps, scaled
+    by speed, so time-based batching and rate detection behave as they would
+    on the live interface.
+    """
+
+    def __init__(self, logger, pcap_files, realtime=False, speed=1.0):
+        """
+        Initialize the replay source.
+
+        Args:
+            logger: Logger object for recording replay progress
+            pcap_files: List of pcap/pcapng paths, replayed in order
+            realtime: Pace delivery by the recorded timestamps
+            speed: Replay speed multiplier for realtime mode
+        """
+        self.logger = logger
+        self.pcap_files = list(pcap_files)
+        self.realtime = realtime
+        self.speed = speed if speed > 0 else 1.0
+        self.frames = self._iter_frames()
+        self.pending = None
+        self.first_timestamp = None
+        self.start_time = None
+        self.stats = {'files': 0, 'packets': 0, 'skipped': 0}
+
+    def _iter_frames(self):
+        """Yield (timestamp, frame) from every file, skipping non-Ethernet frames."""
+        last_timestamp = 0.0
+        for path in self.pcap_files:
+            try:
+                reader = PcapReader(path)
+            except OSError as e:
+                self.logger.error(f"Could not open {path}: {e}")
+                continue
+
+            self.logger.info(f"Replaying {path}")
+            self.stats['files'] += 1
+            with reader:
+                try:
+                    for timestamp, linktype, frame in reader:
+                        if linktype != LINKTYPE_ETHERNET:
+                            self.stats['skipped'] += 1
+                            frame.release()
+                            continue
+                        if timestamp is None:
+                            timestamp = last_timestamp
+                        last_timestamp = timestamp
+                        yield timestamp, frame
+                except ValueError as e:
+                    self.logger.error(str(e))
+
+    def read_packets(self, max_count, timeout):
+        """
+        Return up to max_count (timestamp, bytes) packets, or None when all files are done.
+        """
+        packets = []
+        deadline = time.monotonic() + timeout
+
+        while len(packets) < max_count:
+            if self.pending is None:
+                self.pending = next(self.frames, None)
+                if self.pending is None:
+                    break
+            timestamp, frame = self.pending
+
+            if self.realtime:
+                if self.first_timestamp is None:
+                    self.first_timestamp = timestamp
+                    self.start_time = time.monotonic()
+                due = self.start_time + (timestamp - self.first_timestamp) / self.speed
+                now = time.monotonic()
+                if due > now:
+                    if packets:
+                        # Hand over what is due now and come back for the rest
+                        break
+                    if due > deadline:
+                        time.sleep(max(0.0, deadline - now))
+                        break
+                    time.sleep(due - now)
+
+            packets.append((timestamp, bytes(frame)))
+            frame.release()
+            self.pending = None
+
+        self.stats['packets'] += len(packets)
+        if not packets and self.pending is None:
+            return None
+        return packets
@@ -0,0 +1,149 @@
+"""
+This script handles sliding-window rate counters and SYN flood detection across batches.
+"""
+
+from collections import OrderedDict
+
+
+class _KeyWindow:
+    """Per-second ring of counts for one key."""
+
+    __slots__ = ('counts', 'last_second', 'total', 'alerted_until')
+
+    def __init__(self, window, second):
+        self.counts = [0] * window
+        self.last_second = second
+        self.total = 0
+        self.alerted_until = None
+
+
+class RateCounter:
+    """
+    Counts events per key over a sliding window of whole seconds.
+
+    Each key owns a ring of one-second buckets indexed by timestamp modulo
+    the window length, plus a running total. Moving to a new second clears
+    only the buckets that fell out of the window, so an update costs O(1)
+    amortized no matter how many events a key has seen. Keys are kept in
+    least-recently-updated order and dropped once idle for a whole window,
+    or when max_keys is reached.
+    """
+
+    def __init__(self, window=60, threshold=50, max_keys=100000):
+        """
+        Initialize the counter.
+
+        Args:
+            window: Window length in seconds
+            threshold: Event count within the window above which a key alerts
+            max_keys: Hard cap on tracked keys
+        """
+        self.window = max(1, int(window))
+        self.threshold = threshold
+        self.max_keys = max(1, int(max_keys))
+        self.keys = OrderedDict()
+        self.last_second = None
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, key, timestamp):
+        """
+        Count one event for key at timestamp.
+
+        Returns:
+            int or None: The key's count within the window when it first goes
+            above the threshold, then again at most once per window; None otherwise
+        """
+        second = int(timestamp)
+        window = self.window
+        self._expire(second)
+
+        state = self.keys.get(key)
+        if state is None:
+            if len(self.keys) >= self.max_keys:
+                self.keys.popitem(last=False)
+            state = _KeyWindow(window, second)
+            self.keys[key] = state
+        else:
+            self.keys.move_to_end(key)
+
+        if second > state.last_second:
+            counts = state.counts
+            if second - state.last_second >= window:
+                counts[:] = [0] * window
+                state.total = 0
+            else:
+                for stale in range(state.last_second + 1, second + 1):
+                    index = stale % window
+                    state.total -= counts[index]
+                    counts[index] = 0
+            state.last_second = second
+        elif second <= state.last_second - window:
+            # Older than the window; arrived too late to count
+            return None
+
+        state.counts[second % window] += 1
+        state.total += 1
+
+        if state.total > self.threshold and (state.alerted_until is None or second >= state.alerted_until):
+            state.alerted_until = second + window
+            return state.total
+        return None
+
+    def count(self, key):
+        """Current count for key within the window ending at its last event."""
+        state = self.keys.get(key)
+        return state.total if state is not None else 0
+
+    def _expire(self, second):
+        """Drop keys with no events in the window ending at second."""
+        if self.last_second is not None and second <= self.last_second:
+            return
+        self.last_second = second
+        keys = self.keys
+        while keys:
+            state = next(iter(keys.values()))
+            if second - state.last_second < self.window:
+                break
+            keys.popitem(last=False)
+
+
+class SynFloodDetector:
+    """
+    Detects SYN floods from inbound TCP SYNs that span any number of batches.
+
+    Two rate counters run on the capture timestamps: one keyed on
+    (source, destination port) for floods from a single host, and one keyed on
+    (destination, destination port) for floods spread over many (possibly
+    spoofed) sources.
+    """
+
+    def __init__(self, window=60, source_threshold=50, target_threshold=500, max_keys=100000):
+        """
+        Initialize the detector.
+
+        Args:
+            window: Window length in seconds
+            source_threshold: SYNs from one source to one port within the window
+            target_threshold: SYNs to one destination port within the window
+            max_keys: Hard cap on tracked keys per counter
+        """
+        self.by_source = RateCounter(window, source_threshold, max_keys)
+        self.by_target = RateCounter(window, target_threshold, max_keys)
+
+    def observe(self, src_ip, dst_ip, dst_port, timestamp):
+        """
+        Count one SYN.
+
+        Returns:
+            list: Suspicious activity tuples for any threshold crossed by this SYN
+        """
+        alerts = []
+        count = self.by_source.add((src_ip, dst_port), timestamp)
+        if count is not None:
+            alerts.append(('Potential SYN flood detected', src_ip, dst_ip, dst_port, count))
+        count = self.by_target.add((dst_ip, dst_port), timestamp)
+        if count is not None:
+            alerts.append(('Potential distributed SYN flood detected', dst_ip, dst_port, count))
+        return alerts
@@ -0,0 +1,219 @@
+"""
+This script handles a single-producer/single-consumer shared-memory ring buffer for captured frames.
+"""
+
+import numpy as np
+from multiprocessing import shared_memory
+
+# Header slots (uint64 each). The producer only writes WRITE_SEQ, DATA_HEAD,
+# DROPPED and the KERNEL_* counters; the consumer only writes READ_SEQ and
+# DATA_TAIL. Each side reads the other's counters, so no lock is needed.
+WRITE_SEQ = 0
+READ_SEQ = 1
+DATA_HEAD = 2
+DATA_TAIL = 3
+DROPPED = 4
+KERNEL_ACCEPTED = 5     # Packets the producer's socket filter accepted
+KERNEL_DROPPED = 6      # Accepted packets the kernel dropped on a full socket buffer
+HEADER_SLOTS = 8
+
+
+class FrameBatch:
+    """A batch of frames read from a ring buffer as views into its shared memory."""
+
+    def __init__(self, ring, timestamps, frames, end_seq, end_pos):
+        """
+        Initialize the batch.
+
+        Args:
+            ring: SharedRingBuffer the frames live in
+            timestamps: float64 array of capture timestamps
+            frames: List of memoryviews into the ring's data region
+            end_seq: Sequence number just past the last frame in the batch
+            end_pos: Data position just past the last frame in the batch
+        """
+        self.ring = ring
+        self.timestamps = timestamps
+        self.frames = frames
+        self.end_seq = end_seq
+        self.end_pos = end_pos
+
+    def __len__(self):
+        return len(self.frames)
+
+    def to_packets(self):
+        """Copy the frames out as (timestamp, bytes) tuples."""
+        return [(float(ts), bytes(frame)) for ts, frame in zip(self.timestamps, self.frames)]
+
+    def release(self):
+        """Hand the batch's space back to the producer; the views must not be used afterwards."""
+        for frame in self.frames:
+            frame.release()
+        self.frames = []
+        self.ring._release(self.end_seq, self.end_pos)
+
+
+class SharedRingBuffer:
+    """
+    Lock-light ring buffer in shared memory for one capture worker and one reader.
+
+    Frame bytes are stored back to back in a contiguous data region. A
+    parallel index holds each frame's offset, length and timestamp, so the
+    reader can take a whole batch at once as memoryviews into the data region
+    without pickling anything; it copies a frame only when it needs bytes. A
+    frame that would run past the end of the data region is written at its
+    start instead.
+    """
+
+    def __init__(self, shm, slots, data_size, owner):
+        """Map the header, index and data regions onto a shared memory block."""
+        self.shm = shm
+        self.name = shm.name
+        self.slots = slots
+        self.data_size = data_size
+        self.owner = owner
+
+        offset = 0
+        self.header = np.ndarray((HEADER_SLOTS,), dtype=np.uint64, buffer=shm.buf, offset=offset)
+        offset += self.header.nbytes
+        self.offsets = np.ndarray((slots,), dtype=np.uint64, buffer=shm.buf, offset=offset)
+        offset += self.offsets.nbytes
+        self.ends = np.ndarray((slots,), dtype=np.uint64, buffer=shm.buf, offset=offset)
+        offset += self.ends.nbytes
+        self.timestamps = np.ndarray((slots,), dtype=np.float64, buffer=shm.buf, offset=offset)
+        offset += self.timestamps.nbytes
+        self.lengths = np.ndarray((slots,), dtype=np.uint32, buffer=shm.buf, offset=offset)
+        offset += self.lengths.nbytes
+        self.data_offset = offset
+        self.data = shm.buf[offset:offset + data_size]
+
+    @staticmethod
+    def required_size(slots, data_size):
+        """Number of shared memory bytes needed for a ring of the given capacity."""
+        return HEADER_SLOTS * 8 + slots * (8 + 8 + 8 + 4) + data_size
+
+    @classmethod
+    def create(cls, slots=32768, data_size=16 * 1024 * 1024):
+        """Allocate a new ring; the creator is responsible for unlinking it."""
+        shm = shared_memory.SharedMemory(create=True, size=cls.required_size(slots, data_size))
+        ring = cls(shm, slots, data_size, owner=True)
+        ring.header[:] = 0
+        return ring
+
+    @classmethod
+    def attach(cls, name, slots, data_size):
+        """Attach to a ring created by another process."""
+        # Capture workers share their parent's resource tracker, so attaching
+        # does not hand ownership of the block to the worker
+        shm = shared_memory.SharedMemory(name=name)
+        return cls(shm, slots, data_size, owner=False)
+
+    def push(self, timestamp, frame):
+        """
+        Append one frame (producer side).
+
+        Returns:
+            bool: False if the ring was full and the frame was dropped
+        """
+        length = len(frame)
+        header = self.header
+        write_seq = int(header[WRITE_SEQ])
+
+        if length > self.data_size or write_seq - int(header[READ_SEQ]) >= self.slots:
+            header[DROPPED] += 1
+            return False
+
+        head = int(header[DATA_HEAD])
+        start = head % self.data_size
+        if start + length > self.data_size:
+            # Not enough room before the end of the region; skip to its start
+            head += self.data_size - start
+            start = 0
+        end = head + length
+
+        if end - int(header[DATA_TAIL]) > self.data_size:
+            header[DROPPED] += 1
+            return False
+
+        self.data[start:start + length] = frame
+        slot = write_seq % self.slots
+        self.offsets[slot] = start
+        self.ends[slot] = end
+        self.lengths[slot] = length
+        self.timestamps[slot] = timestamp
+
+        # Publish the frame only after its bytes and index entry are in place
+        header[DATA_HEAD] = end
+        header[WRITE_SEQ] = write_seq + 1
+        return True
+
+    def add_kernel_stats(self, accepted, dropped):
+        """Add the producer socket's kernel counters (producer side)."""
+        self.header[KERNEL_ACCEPTED] += accepted
+        self.header[KERNEL_DROPPED] += dropped
+
+    def pending(self):
+        """Number of frames written but not yet released by the reader."""
+        return int(self.header[WRITE_SEQ]) - int(self.header[READ_SEQ])
+
+    @property
+    def dropped(self):
+        """Number of frames the producer dropped because the ring was full."""
+        return int(self.header[DROPPED])
+
+    @property
+    def received(self):
+        """Number of frames the producer received, whether or not they fit in the ring."""
+        return int(self.header[WRITE_SEQ]) + int(self.header[DROPPED])
+
+    @property
+    def kernel_stats(self):
+        """Kernel socket counters reported by the producer: (accepted, dropped)."""
+        return int(self.header[KERNEL_ACCEPTED]), int(self.header[KERNEL_DROPPED])
+
+    def read_batch(self, max_count):
+        """
+        Take up to max_count frames (consumer side) as views into the ring.
+
+        The returned batch must be released before the next read.
+
+        Returns:
+            FrameBatch or None if the ring is empty
+        """
+        read_seq = int(self.header[READ_SEQ])
+        count = min(int(self.header[WRITE_SEQ]) - read_seq, max_count)
+        if count <= 0:
+            return None
+
+        slots = (np.arange(read_seq, read_seq + count) % self.slots)
+        starts = self.offsets[slots]
+        lengths = self.lengths[slots]
+        frames = [
+            self.data[start:start + length]
+            for start, length in zip(starts.tolist(), lengths.tolist())
+        ]
+        end_pos = int(self.ends[slots[-1]])
+        return FrameBatch(self, self.timestamps[slots].copy(), frames, read_seq + count, end_pos)
+
+    def _release(self, end_seq, end_pos):
+        """Advance the read position past a released batch."""
+        self.header[DATA_TAIL] = end_pos
+        self.header[READ_SEQ] = end_seq
+
+    def close(self):
+        """Unmap the ring and, for the creator, free the shared memory."""
+        self.header = self.offsets = self.ends = self.timestamps = self.lengths = None
+        try:
+            self.data.release()
+        except Exception:
+            pass
+        try:
+            self.shm.close()
+        except BufferError:
+            # A batch view is still alive; the mapping goes away with the process
+            pass
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,426 @@
+"""
+This script handles fixed-memory probabilistic sketches for long-term traffic statistics.
+"""
+
+import hashlib
+import heapq
+import numpy as np
+
+
+def stable_hash(value):
+    """
+    64-bit hash of a value that is the same in every process.
+
+    Python's built-in hash() is salted per process, which would make sketches
+    built by different capture workers impossible to merge.
+    """
+    if not isinstance(value, bytes):
+        value = repr(value).encode('utf-8')
+    return int.from_bytes(hashlib.blake2b(value, digest_size=8).digest(), 'little')
+
+
+def _hll_register(value, precision):
+    """Register index and rank of a value's hash."""
+    hashed = stable_hash(value)
+    index = hashed >> (64 - precision)
+    remaining = hashed & ((1 << (64 - precision)) - 1)
+    rank = (64 - precision) - remaining.bit_length() + 1
+    return index, rank
+
+
+def _hll_estimate(registers):
+    """
+    Cardinality estimates for the rows of a 2-D register array.
+
+    Uses the HyperLogLog estimator with linear counting for small cardinalities.
+    """
+    m = registers.shape[-1]
+    alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(m, 0.7213 / (1 + 1.079 / m))
+    raw = alpha * m * m / np.sum(np.exp2(-registers.astype(np.float64)), axis=-1)
+    zeros = np.count_nonzero(registers == 0, axis=-1)
+    with np.errstate(divide='ignore'):
+        linear = m * np.log(m / np.maximum(zeros, 1))
+    return np.where((raw <= 2.5 * m) & (zeros > 0), linear, raw)
+
+
+class HyperLogLog:
+    """Distinct-count estimator using 2**precision one-byte registers."""
+
+    def __init__(self, precision=12):
+        """
+        Initialize the sketch.
+
+        Args:
+            precision: Number of index bits; relative error is about 1.04 / sqrt(2**precision)
+        """
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def add(self, value):
+        """Add one value."""
+        index, rank = _hll_register(value, self.precision)
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self):
+        """Estimated number of distinct values added."""
+        return float(_hll_estimate(self.registers[np.newaxis, :])[0])
+
+    def merge(self, other):
+        """Fold another sketch of the same precision into this one."""
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches of different precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def copy(self):
+        clone = HyperLogLog(self.precision)
+        clone.registers[:] = self.registers
+        return clone
+
+
+class KeyedHyperLogLog:
+    """
+    One small HyperLogLog per key, stored as rows of a single register array.
+
+    Memory is fixed at max_keys * 2**precision bytes. When every row is in
+    use, the least recently updated key gives up its row.
+    """
+
+    def __init__(self, precision=6, max_keys=4096):
+        """
+        Initialize the sketch.
+
+        Args:
+            precision: Index bits per key
+            max_keys: Number of keys tracked at once
+        """
+        self.precision = precision
+        self.max_keys = max(1, int(max_keys))
+        self.registers = np.zeros((self.max_keys, 1 << precision), dtype=np.uint8)
+        self.last_used = np.zeros(self.max_keys, dtype=np.int64)
+        self.rows = {}
+        self.row_keys = [None] * self.max_keys
+        self.clock = 0
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _row(self, key):
+        """Row for key, claiming the least recently used row if needed."""
+        row = self.rows.get(key)
+        if row is None:
+            if len(self.rows) < self.max_keys:
+                row = len(self.rows)
+            else:
+                row = int(np.argmin(self.last_used))
+                del self.rows[self.row_keys[row]]
+                self.registers[row] = 0
+            self.rows[key] = row
+            self.row_keys[row] = key
+        self.clock += 1
+        self.last_used[row] = self.clock
+        return row
+
+    def add(self, key, value):
+        """Add value to key's distinct set."""
+        row = self._row(key)
+        index, rank = _hll_register(value, self.precision)
+        if rank > self.registers[row, index]:
+            self.registers[row, index] = rank
+
+    def count(self, key, *others):
+        """
+        Estimated distinct values for key, 0 if the key is not tracked.
+
+        With other keyed sketches of the same precision, the count covers the
+        union of key's values in all of them, without merging whole sketches.
+        """
+        row = self.rows.get(key)
+        if not others:
+            if row is None:
+                return 0.0
+            return float(_hll_estimate(self.registers[row:row + 1])[0])
+        rows = [sketch.registers[sketch.rows[key]] for sketch in (self,) + others if key in sketch.rows]
+        if not rows:
+            return 0.0
+        return float(_hll_estimate(np.maximum.reduce(rows)[np.newaxis])[0])
+
+    def counts(self):
+        """Estimated distinct values for every tracked key, as a dict."""
+        if not self.rows:
+            return {}
+        keys = list(self.rows)
+        rows = np.fromiter(self.rows.values(), dtype=np.int64, count=len(keys))
+        return dict(zip(keys, _hll_estimate(self.registers[rows]).tolist()))
+
+    def merge(self, other):
+        """Fold another keyed sketch of the same precision into this one."""
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches of different precision")
+        for key, other_row in other.rows.items():
+            row = self._row(key)
+            np.maximum(self.registers[row], other.registers[other_row], out=self.registers[row])
+        return self
+
+    def copy(self):
+        clone = KeyedHyperLogLog(self.precision, self.max_keys)
+        clone.registers[:] = self.registers
+        clone.last_used[:] = self.last_used
+        clone.rows = dict(self.rows)
+        clone.row_keys = list(self.row_keys)
+        clone.clock = self.clock
+        return clone
+
+
+class CountMinSketch:
+    """Frequency estimator with depth rows of width counters; never underestimates."""
+
+    def __init__(self, width=2048, depth=4):
+        """
+        Initialize the sketch.
+
+        Args:
+            width: Counters per row; overestimation is at most about 2.7 * total / width
+            depth: Number of rows; the bound holds with probability 1 - exp(-depth)
+        """
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=np.int64)
+        self.total = 0
+
+    def _indexes(self, key):
+        """Flat table index of key in each row, by double hashing one 64-bit hash."""
+        hashed = stable_hash(key)
+        h1, h2 = hashed & 0xffffffff, (hashed >> 32) | 1
+        width = self.width
+        return [row * width + (h1 + row * h2) % width for row in range(self.depth)]
+
+    def add(self, key, count=1):
+        """
+        Add count occurrences of key.
+
+        Returns:
+            int: Updated estimate for key
+        """
+        # Scalar updates on a flat view are much cheaper than fancy indexing for a few rows
+        flat = self.table.reshape(-1)
+        estimate = None
+        for index in self._indexes(key):
+            value = int(flat[index]) + count
+            flat[index] = value
+            if estimate is None or value < estimate:
+                estimate = value
+        self.total += count
+        return estimate
+
+    def estimate(self, key):
+        """Estimated number of occurrences of key."""
+        flat = self.table.reshape(-1)
+        return min(int(flat[index]) for index in self._indexes(key))
+
+    def merge(self, other):
+        """Fold another sketch of the same dimensions into this one."""
+        if (other.width, other.depth) != (self.width, self.depth):
+            raise ValueError("Cannot merge Count-Min sketches of different dimensions")
+        self.table += other.table
+        self.total += other.total
+        return self
+
+    def copy(self):
+        clone = CountMinSketch(self.width, self.depth)
+        clone.table[:] = self.table
+        clone.total = self.total
+        return clone
+
+
+class HeavyHitters:
+    """
+    Top-k keys by count, using a Count-Min Sketch and a min-heap of candidates.
+
+    The heap holds (estimate, key) entries; entries whose estimate has since
+    grown are skipped lazily when the minimum is inspected.
+    """
+
+    def __init__(self, k=10, width=2048, depth=4):
+        """
+        Initialize the tracker.
+
+        Args:
+            k: Number of heavy hitters to keep
+            width: Count-Min Sketch width
+            depth: Count-Min Sketch depth
+        """
+        self.k = k
+        self.sketch = CountMinSketch(width, depth)
+        self.candidates = {}
+        self.heap = []
+
+    def add(self, key, count=1):
+        """Count key and update the candidate set."""
+        self._offer(key, self.sketch.add(key, count))
+
+    def _offer(self, key, estimate):
+        """Consider key with its current estimate for the top k."""
+        if key in self.candidates:
+            self.candidates[key] = estimate
+            return
+        if len(self.candidates) < self.k:
+            self.candidates[key] = estimate
+            heapq.heappush(self.heap, (estimate, key))
+            return
+        smallest = self._smallest()
+        if estimate > smallest[0]:
+            heapq.heappop(self.heap)
+            del self.candidates[smallest[1]]
+            self.candidates[key] = estimate
+            heapq.heappush(self.heap, (estimate, key))
+
+    def _smallest(self):
+        """Current minimum heap entry, refreshing stale entries."""
+        while True:
+            estimate, key = self.heap[0]
+            current = self.candidates[key]
+            if current == estimate:
+                return self.heap[0]
+            heapq.heapreplace(self.heap, (current, key))
+
+    def top(self, n=None):
+        """List of (key, estimate) pairs, largest first."""
+        ranked = sorted(self.candidates.items(), key=lambda item: item[1], reverse=True)
+        return ranked[:n] if n is not None else ranked
+
+    def merge(self, other):
+        """Fold another tracker into this one and re-rank the union of candidates."""
+        self.sketch.merge(other.sketch)
+        keys = set(self.candidates) | set(other.candidates)
+        self.candidates = {}
+        self.heap = []
+        for key in keys:
+            self._offer(key, self.sketch.estimate(key))
+        return self
+
+    def copy(self):
+        clone = HeavyHitters(self.k, self.sketch.width, self.sketch.depth)
+        clone.sketch = self.sketch.copy()
+        clone.candidates = dict(self.candidates)
+        clone.heap = list(self.heap)
+        return clone
+
+
+class TrafficSketches:
+    """
+    The per-period traffic statistics PacketAnalyzer keeps long-term.
+
+    Tracks distinct destination ports and hosts per source, plus the top
+    destination ports and top talkers, in fixed memory.
+    """
+
+    def __init__(self, max_sources=4096, top_k=10, precision=6, width=2048, depth=4):
+        """
+        Initialize the sketches.
+
+        Args:
+            max_sources: Sources with per-source distinct counts
+            top_k: Heavy hitters kept for ports and talkers
+            precision: HyperLogLog index bits per source
+            width: Count-Min Sketch width
+            depth: Count-Min Sketch depth
+        """
+        self.ports_per_source = KeyedHyperLogLog(precision, max_sources)
+        self.hosts_per_source = KeyedHyperLogLog(precision, max_sources)
+        self.top_ports = HeavyHitters(top_k, width, depth)
+        self.top_talkers = HeavyHitters(top_k, width, depth)
+
+    def add(self, src_ip, dst_ip, dst_port, length=0):
+        """Account one inbound connection packet."""
+        self.ports_per_source.add(src_ip, dst_port)
+        self.hosts_per_source.add(src_ip, dst_ip)
+        self.top_ports.add(dst_port)
+        self.top_talkers.add(src_ip, max(1, length))
+
+    def merge(self, other):
+        """Fold another set of sketches, e.g. from another worker or period, into this one."""
+        self.ports_per_source.merge(other.ports_per_source)
+        self.hosts_per_source.merge(other.hosts_per_source)
+        self.top_ports.merge(other.top_ports)
+        self.top_talkers.merge(other.top_talkers)
+        return self
+
+    def copy(self):
+        clone = TrafficSketches.__new__(TrafficSketches)
+        clone.ports_per_source = self.ports_per_source.copy()
+        clone.hosts_per_source = self.hosts_per_source.copy()
+        clone.top_ports = self.top_ports.copy()
+        clone.top_talkers = self.top_talkers.copy()
+        return clone
+
+
+class SketchWindow:
+    """
+    Sliding window of mergeable sketches, one per fixed-length epoch.
+
+    Events go into the sketch of the epoch their timestamp falls in; epochs
+    older than the window are dropped whole. Queries merge the epochs, and
+    the merge of all closed epochs is cached until the window moves.
+    """
+
+    def __init__(self, factory, epoch_seconds=21600, epochs=28):
+        """
+        Initialize the window.
+
+        Args:
+            factory: Callable returning an empty sketch with merge() and copy()
+            epoch_seconds: Length of one epoch
+            epochs: Number of epochs kept; the default covers one week
+        """
+        self.factory = factory
+        self.epoch_seconds = epoch_seconds
+        self.epochs = max(1, int(epochs))
+        self.ring = {}
+        self.current_epoch = None
+        self._closed = None
+
+    def sketch_for(self, timestamp):
+        """Sketch of the epoch containing timestamp, or None if it is already outside the window."""
+        epoch = int(timestamp // self.epoch_seconds)
+        if self.current_epoch is None or epoch > self.current_epoch:
+            self.current_epoch = epoch
+            for old in [e for e in self.ring if e <= epoch - self.epochs]:
+                del self.ring[old]
+            self._closed = None
+        elif epoch <= self.current_epoch - self.epochs:
+            return None
+        sketch = self.ring.get(epoch)
+        if sketch is None:
+            sketch = self.ring[epoch] = self.factory()
+        if epoch != self.current_epoch:
+            # A late event changes a closed epoch
+            self._closed = None
+        return sketch
+
+    def sketches(self):
+        """The sketch of every epoch in the window, unmerged, for queries on a few keys."""
+        return list(self.ring.values())
+
+    def merged(self):
+        """One sketch covering the whole window."""
+        if self._closed is None:
+            self._closed = self.factory()
+            for epoch, sketch in self.ring.items():
+                if epoch != self.current_epoch:
+                    self._closed.merge(sketch)
+        merged = self._closed.copy()
+        current = self.ring.get(self.current_epoch)
+        if current is not None:
+            merged.merge(current)
+        return merged
+
+    def merge(self, other):
+        """Fold another window with the same epoch length into this one, epoch by epoch."""
+        for epoch, sketch in other.ring.items():
+            target = self.sketch_for(epoch * self.epoch_seconds)
+            if target is not None:
+                target.merge(sketch)
+        self._closed = None
+        return self
@@ -0,0 +1,131 @@
+"""
+This script handles timing module imports and startup milestones up to the first captured packet.
+"""
+
+import sys
+import threading
+import time
+
+# Frameworks whose import at startup is worth calling out
+HEAVY_FRAMEWORKS = ['torch', 'sklearn', 'scipy', 'pandas', 'scapy']
+
+
+class _TimedLoader:
+    """Wraps a module loader to time the execution of the module it loads."""
+
+    def __init__(self, loader, profiler, name):
+        self.loader = loader
+        self.profiler = profiler
+        self.name = name
+
+    def __getattr__(self, attribute):
+        return getattr(self.loader, attribute)
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        # Put the real loader back before the module runs, so nothing else ever sees the wrapper
+        module.__loader__ = self.loader
+        if module.__spec__ is not None:
+            module.__spec__.loader = self.loader
+        self.profiler._enter()
+        start = time.perf_counter()
+        try:
+            self.loader.exec_module(module)
+        finally:
+            self.profiler._leave(self.name, time.perf_counter() - start)
+
+
+class StartupProfiler:
+    """
+    Measures where startup time goes until the first packet arrives.
+
+    Once installed, it times every module imported afterwards, like
+    python -X importtime: cumulative time includes the modules a module
+    imports, self time does not. mark() records named milestones, measured
+    from the creation of the profiler. Install it before importing anything
+    else, so that every import is seen.
+    """
+
+    def __init__(self):
+        """Start the clock."""
+        self.start = time.perf_counter()
+        self.imports = []               # (module, cumulative seconds, self seconds, depth)
+        self.milestones = []            # (label, seconds since start)
+        self.local = threading.local()  # Per-thread stack of child import times
+        self.installed = False
+
+    def install(self):
+        """Start timing imports."""
+        if not self.installed:
+            sys.meta_path.insert(0, self)
+            self.installed = True
+
+    def uninstall(self):
+        """Stop timing imports."""
+        if self.installed:
+            sys.meta_path.remove(self)
+            self.installed = False
+
+    def find_spec(self, fullname, path=None, target=None):
+        """Find the module with the other finders and time its loader."""
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+            spec.loader = _TimedLoader(spec.loader, self, fullname)
+        return spec
+
+    def _enter(self):
+        """Open a frame for an import; imports nested in it add their time to it."""
+        stack = getattr(self.local, 'stack', None)
+        if stack is None:
+            stack = self.local.stack = []
+        stack.append(0.0)
+
+    def _leave(self, name, elapsed):
+        """Close an import frame and record its cumulative and self time."""
+        stack = self.local.stack
+        children = stack.pop()
+        if stack:
+            stack[-1] += elapsed
+        self.imports.append((name, elapsed, elapsed - children, len(stack)))
+
+    def mark(self, label):
+        """
+        Record a startup milestone.
+
+        Returns:
+            float: Seconds since the profiler started
+        """
+        elapsed = time.perf_counter() - self.start
+        self.milestones.append((label, elapsed))
+        return elapsed
+
+    def report(self, top=15):
+        """
+        Summarize startup: milestones, total import time and the slowest imports.
+
+        Args:
+            top: Number of slowest imports to list
+
+        Returns:
+            list: Report lines
+        """
+        total = sum(cumulative for _, cumulative, _, depth in self.imports if depth == 0)
+        loaded = [name for name in HEAVY_FRAMEWORKS if name in sys.modules]
+        lines = [
+            "Startup: " + ", ".join(f"{label} at {elapsed:.2f}s" for label, elapsed in self.milestones),
+            f"Startup imports: {len(self.imports)} modules in {total:.2f}s; "
+            f"heavy frameworks loaded: {', '.join(loaded) or 'none'}",
+            "Slowest imports (cumulative ms, self ms, module):",
+        ]
+        for name, cumulative, own, depth in sorted(self.imports, key=lambda item: -item[1])[:top]:
+            lines.append(f"  {cumulative * 1000:9.1f} {own * 1000:9.1f}  {'  ' * depth}{name}")
+        return lines
@@ -0,0 +1,204 @@
+"""
+This script handles bounded-memory TCP stream reassembly for incremental payload scanning.
+"""
+
+from collections import OrderedDict, namedtuple
+from flow_table import TCP_FIN, TCP_SYN, TCP_RST
+
+SEQ_MODULO = 1 << 32
+
+# Newly contiguous stream data ready to be scanned.
+#   data:       Bytes to scan: the retained overlap tail, then the new bytes
+#   new_start:  Offset in data where the new bytes begin; a match ending at or
+#               before it was already reported by an earlier scan
+#   offset:     Stream offset of data[0], counted in bytes delivered
+StreamChunk = namedtuple('StreamChunk', 'data new_start offset')
+
+
+def seq_diff(a, b):
+    """Signed distance from sequence number b to a, with 32-bit wraparound."""
+    diff = (a - b) % SEQ_MODULO
+    return diff - SEQ_MODULO if diff >= SEQ_MODULO // 2 else diff
+
+
+class StreamState:
+    """Reassembly state for one direction of a TCP connection."""
+
+    __slots__ = ('next_seq', 'pending', 'pending_bytes', 'tail', 'offset')
+
+    def __init__(self, next_seq):
+        """Start a stream expecting next_seq."""
+        self.next_seq = next_seq
+        self.pending = {}        # Out-of-order segments: sequence number -> bytes
+        self.pending_bytes = 0
+        self.tail = b''          # Last bytes already scanned, rechecked with the next data
+        self.offset = 0          # Stream bytes delivered so far
+
+
+class TcpReassembler:
+    """
+    Reassembles TCP payloads per direction so patterns spanning segments match.
+
+    In-order segments are delivered at once. Out-of-order segments wait until
+    the hole before them is filled; retransmitted and overlapping bytes are
+    trimmed by sequence number. Each delivery is returned together with the
+    last overlap bytes of the previous one, so a scan only rechecks that
+    window instead of the whole stream, and a match that straddles a segment
+    boundary is found as long as it is no longer than the overlap.
+
+    Memory is bounded: each stream buffers at most max_stream_pending
+    out-of-order bytes and all streams together at most max_total_pending.
+    When a cap is hit the stream gives up on its hole and resumes at the
+    earliest buffered segment. At most max_streams streams are tracked; the
+    least recently active is dropped first.
+    """
+
+    def __init__(self, overlap=256, max_stream_pending=65536,
+                 max_total_pending=16 * 1024 * 1024, max_streams=100000):
+        """
+        Initialize the reassembler.
+
+        Args:
+            overlap: Scanned bytes kept per stream and rescanned with the next data
+            max_stream_pending: Out-of-order bytes buffered per stream direction
+            max_total_pending: Out-of-order bytes buffered across all streams
+            max_streams: Maximum stream directions tracked
+        """
+        self.overlap = overlap
+        self.max_stream_pending = max_stream_pending
+        self.max_total_pending = max_total_pending
+        self.max_streams = max_streams
+        self.streams = OrderedDict()
+        self.total_pending = 0
+        self.stats = {
+            'segments': 0,
+            'bytes_delivered': 0,
+            'out_of_order': 0,
+            'retransmitted_bytes': 0,
+            'gaps_skipped': 0,
+            'streams_evicted': 0,
+        }
+
+    @staticmethod
+    def stream_key(record):
+        """Key of the stream direction a TCP packet record belongs to."""
+        return (record.src_ip, record.src_port, record.dst_ip, record.dst_port)
+
+    def __len__(self):
+        return len(self.streams)
+
+    def _drop(self, key):
+        """Forget a stream and release its buffered bytes."""
+        state = self.streams.pop(key, None)
+        if state is not None:
+            self.total_pending -= state.pending_bytes
+
+    def _stream(self, key, record):
+        """Get or create the state of a stream, restarting it on SYN."""
+        state = self.streams.get(key)
+        if record.tcp_flags & TCP_SYN:
+            self._drop(key)
+            state = None
+        if state is None:
+            if len(self.streams) >= self.max_streams:
+                self._drop(next(iter(self.streams)))
+                self.stats['streams_evicted'] += 1
+            # SYN consumes one sequence number; a stream seen mid-connection
+            # starts at its first captured segment
+            next_seq = record.tcp_seq + 1 if record.tcp_flags & TCP_SYN else record.tcp_seq
+            state = StreamState(next_seq % SEQ_MODULO)
+            self.streams[key] = state
+        else:
+            self.streams.move_to_end(key)
+        return state
+
+    def add(self, record, payload=None):
+        """
+        Add a TCP segment and return the stream data that became contiguous.
+
+        Args:
+            record: DecodedPacket of a TCP packet
+            payload: Payload bytes to use instead of record.payload, e.g. cut to an
+                inspection depth
+
+        Returns:
+            StreamChunk, or None if no new contiguous data is available
+        """
+        if payload is None:
+            payload = record.payload
+        key = self.stream_key(record)
+        if not payload:
+            if record.tcp_flags & TCP_SYN:
+                self._stream(key, record)
+            elif record.tcp_flags & (TCP_FIN | TCP_RST):
+                self._drop(key)
+            return None
+
+        self.stats['segments'] += 1
+        state = self._stream(key, record)
+        seq = record.tcp_seq + 1 if record.tcp_flags & TCP_SYN else record.tcp_seq
+
+        delivered = []
+        distance = seq_diff(seq, state.next_seq)
+        if distance > 0:
+            self._buffer(state, seq, payload)
+        else:
+            self._deliver(state, delivered, distance, payload)
+        if state.pending:
+            self._drain(state, delivered)
+
+        chunk = None
+        if delivered:
+            data = b''.join(delivered)
+            window = state.tail + data
+            chunk = StreamChunk(window, len(state.tail), state.offset - len(state.tail))
+            state.offset += len(data)
+            state.tail = window[-self.overlap:] if self.overlap else b''
+            self.stats['bytes_delivered'] += len(data)
+
+        if record.tcp_flags & (TCP_FIN | TCP_RST):
+            self._drop(key)
+        return chunk
+
+    def _deliver(self, state, delivered, distance, data):
+        """Append a segment starting distance (<= 0) bytes from next_seq, trimming bytes already delivered."""
+        if distance < 0:
+            trimmed = min(-distance, len(data))
+            self.stats['retransmitted_bytes'] += trimmed
+            data = data[trimmed:]
+        if data:
+            delivered.append(data)
+            state.next_seq = (state.next_seq + len(data)) % SEQ_MODULO
+
+    def _buffer(self, state, seq, data):
+        """Hold an out-of-order segment, skipping the hole before it when a cap is reached."""
+        self.stats['out_of_order'] += 1
+        previous = state.pending.get(seq)
+        if previous is not None:
+            if len(previous) >= len(data):
+                self.stats['retransmitted_bytes'] += len(data)
+                return
+            state.pending_bytes -= len(previous)
+            self.total_pending -= len(previous)
+        state.pending[seq] = data
+        state.pending_bytes += len(data)
+        self.total_pending += len(data)
+
+        if (state.pending_bytes > self.max_stream_pending
+                or self.total_pending > self.max_total_pending):
+            # The hole will not be filled in time; resume at the earliest buffered byte
+            state.next_seq = min(state.pending, key=lambda s: seq_diff(s, state.next_seq))
+            state.tail = b''
+            self.stats['gaps_skipped'] += 1
+
+    def _drain(self, state, delivered):
+        """Deliver buffered segments that are now contiguous."""
+        while state.pending:
+            seq = min(state.pending, key=lambda s: seq_diff(s, state.next_seq))
+            distance = seq_diff(seq, state.next_seq)
+            if distance > 0:
+                break
+            data = state.pending.pop(seq)
+            state.pending_bytes -= len(data)
+            self.total_pending -= len(data)
+            self._deliver(state, delivered, distance, data)
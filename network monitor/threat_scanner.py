@@ -0,0 +1,234 @@
+"""
+This script handles single-pass multi-pattern scanning of payloads for threat signatures.
+"""
+
+import re
+from collections import namedtuple
+
+# pyahocorasick provides a C Aho-Corasick automaton for the literal prefilter.
+# Without it each literal is located with str.find, which is slower but
+# still runs in C and is much cheaper than running every regex.
+AHOCORASICK_AVAILABLE = False
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    pass
+
+# One threat signature.
+#   regex:       Full pattern used to confirm a match
+#   description: Threat type reported for a match
+#   literals:    Lowercase substrings, one of which every match contains; an
+#                empty tuple means the pattern is run on every payload
+#   anchored:    True if every match starts at the literal it contains, so
+#                confirmation can start at the first literal hit instead of
+#                at the start of the payload
+ThreatPattern = namedtuple('ThreatPattern', 'regex description literals anchored')
+
+# A confirmed match: index into the scanner's patterns and the match span
+ScanMatch = namedtuple('ScanMatch', 'pattern_id start end')
+
+THREAT_PATTERNS = [
+    # Command injection patterns with Hebrew support
+    ThreatPattern(
+        r'(?i)(;|\||\`)\s*(cat|pwd|ls|wget|curl|bash|sh|sudo|צו|פקודה|הרץ)\s',
+        'Command injection attempt', (';', '|', '`'), True),
+
+    # SQL injection patterns
+    ThreatPattern(
+        r'(?i)(UNION\s+SELECT|INSERT\s+INTO|UPDATE\s+.*SET|DELETE\s+FROM)\s+[\w_]+',
+        'SQL injection attempt', ('union', 'insert', 'update', 'delete'), True),
+    ThreatPattern(
+        r'(?i)(DROP\s+TABLE|ALTER\s+TABLE|CREATE\s+TABLE)\s+[\w_]+',
+        'Database modification attempt', ('drop', 'alter', 'create'), True),
+
+    # XSS patterns
+    ThreatPattern(
+        r'(?i)(<script>|javascript:|\balert\s*\(|document\.cookie)',
+        'Cross-site scripting attempt', ('<script>', 'javascript:', 'alert', 'document.cookie'), True),
+
+    # Path traversal - modified to reduce false positives
+    ThreatPattern(
+        r'(?i)(\.\./|\.\\/|~/)(etc|bin|usr|root|system32|windows)',
+        'Path traversal attempt', ('../', '.\\/', '~/'), True),
+
+    # Common malware patterns
+    ThreatPattern(
+        r'(?i)(eval\(|base64_decode\(|system\(|exec\(|shell_exec\()',
+        'Code execution attempt', ('eval(', 'base64_decode(', 'system(', 'exec(', 'shell_exec('), True),
+
+    # Data exfiltration patterns with Hebrew support
+    ThreatPattern(
+        r'(?i)(סיסמה|משתמש|כניסה|התחברות|שם|מייל)=',
+        'Hebrew credential exposure', ('סיסמה=', 'משתמש=', 'כניסה=', 'התחברות=', 'שם=', 'מייל='), True),
+    ThreatPattern(
+        r'(?i)(password=|passwd=|pwd=|user=|username=|login=)',
+        'Credential exposure', ('password=', 'passwd=', 'pwd=', 'user=', 'username=', 'login='), True),
+    ThreatPattern(
+        r'\b\d{16}\b',
+        'Potential credit card number', (), False),
+    ThreatPattern(
+        r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
+        'Email address exposure', ('@',), False),
+]
+
+# Encodings payload patterns are compiled for. ASCII-only patterns are the
+# same bytes in both; Hebrew keywords become UTF-8 and cp1255 byte sequences
+# (cp1255 also covers iso-8859-8 Hebrew letters).
+PAYLOAD_ENCODINGS = ('utf-8', 'cp1255')
+
+
+def encode_pattern(regex, encodings=PAYLOAD_ENCODINGS):
+    """
+    Encode a text pattern into one bytes pattern per distinct byte form.
+
+    In bytes patterns the whitespace, word and digit classes and (?i) only
+    cover ASCII, so non-ASCII text in a payload matches only where it is
+    spelled out in the pattern, as the Hebrew keywords are.
+
+    Returns:
+        list: Distinct bytes patterns
+    """
+    encoded = []
+    for encoding in encodings:
+        data = regex.encode(encoding)
+        if data not in encoded:
+            encoded.append(data)
+    return encoded
+
+
+def compile_any(regexes, encodings=PAYLOAD_ENCODINGS):
+    """
+    Compile text patterns into a single bytes regex matching any of them.
+
+    A leading (?i) is turned into a scoped (?i:...) group so patterns with
+    different flags can share one alternation.
+    """
+    alternatives = []
+    for regex in regexes:
+        for data in encode_pattern(regex, encodings):
+            if data.startswith(b'(?i)'):
+                data = b'(?i:' + data[4:] + b')'
+            alternatives.append(b'(?:' + data + b')')
+    return re.compile(b'|'.join(alternatives))
+
+
+def decode_context(data):
+    """
+    Decode a slice of payload bytes for display in an alert.
+
+    Returns:
+        tuple: (text, encoding)
+    """
+    try:
+        return data.decode('utf-8'), 'utf-8'
+    except UnicodeDecodeError:
+        return data.decode('cp1255', errors='replace'), 'cp1255'
+
+
+class ThreatScanner:
+    """
+    Scans raw payload bytes for every threat pattern in one pass.
+
+    Each pattern and its literals are compiled to bytes once per target
+    encoding, so payloads are never trial-decoded. A literal prefilter finds,
+    in a single Aho-Corasick pass over the ASCII-lowercased payload, which
+    patterns can possibly match and where their first required literal
+    occurs. Only those patterns are confirmed with their bytes regexes,
+    starting at the first hit for anchored patterns.
+    """
+
+    def __init__(self, patterns=None, encodings=PAYLOAD_ENCODINGS):
+        """
+        Compile the patterns.
+
+        Args:
+            patterns: List of ThreatPattern; defaults to THREAT_PATTERNS
+            encodings: Encodings to compile non-ASCII patterns and literals for
+        """
+        self.patterns = list(patterns if patterns is not None else THREAT_PATTERNS)
+        self.regexes = [
+            [re.compile(data) for data in encode_pattern(pattern.regex, encodings)]
+            for pattern in self.patterns
+        ]
+        self.unfiltered = [i for i, pattern in enumerate(self.patterns) if not pattern.literals]
+
+        # Each encoded literal maps to the ids of the patterns that require it
+        self.literal_ids = {}
+        for pattern_id, pattern in enumerate(self.patterns):
+            for literal in pattern.literals:
+                for encoding in encodings:
+                    ids = self.literal_ids.setdefault(literal.encode(encoding), [])
+                    if pattern_id not in ids:
+                        ids.append(pattern_id)
+
+        self.automaton = None
+        if self.literal_ids and AHOCORASICK_AVAILABLE:
+            # The automaton works on text; latin-1 maps each byte to one character
+            self.automaton = ahocorasick.Automaton()
+            for literal, ids in self.literal_ids.items():
+                self.automaton.add_word(literal.decode('latin-1'), (len(literal), tuple(ids)))
+            self.automaton.make_automaton()
+
+    def description(self, pattern_id):
+        """Threat type of a pattern id."""
+        return self.patterns[pattern_id].description
+
+    def candidates(self, payload):
+        """
+        Run the literal prefilter over raw payload bytes.
+
+        Returns:
+            dict: pattern id -> byte offset of its first literal hit
+        """
+        first_hits = {}
+        if not self.literal_ids:
+            return first_hits
+        # bytes.lower() only changes ASCII letters, so offsets are unchanged
+        folded = bytes(payload).lower()
+        if self.automaton is not None:
+            # Hits arrive by end offset, so a longer literal can start earlier
+            for end, (length, ids) in self.automaton.iter(folded.decode('latin-1')):
+                start = end - length + 1
+                for pattern_id in ids:
+                    if start < first_hits.get(pattern_id, start + 1):
+                        first_hits[pattern_id] = start
+        else:
+            for literal, ids in self.literal_ids.items():
+                start = folded.find(literal)
+                if start < 0:
+                    continue
+                for pattern_id in ids:
+                    if start < first_hits.get(pattern_id, start + 1):
+                        first_hits[pattern_id] = start
+        return first_hits
+
+    def scan(self, payload):
+        """
+        Find every threat pattern match in raw payload bytes.
+
+        Args:
+            payload: Payload bytes
+
+        Returns:
+            list: ScanMatch tuples with byte offsets, ordered by pattern id, then offset
+        """
+        payload = bytes(payload)
+        regions = self.candidates(payload)
+        for pattern_id in self.unfiltered:
+            regions[pattern_id] = 0
+
+        matches = []
+        for pattern_id in sorted(regions):
+            start = regions[pattern_id] if self.patterns[pattern_id].anchored else 0
+            regexes = self.regexes[pattern_id]
+            if len(regexes) == 1:
+                for match in regexes[0].finditer(payload, start):
+                    matches.append(ScanMatch(pattern_id, match.start(), match.end()))
+            else:
+                # The encodings can agree on the ASCII parts of a pattern
+                spans = set()
+                for regex in regexes:
+                    spans.update(match.span() for match in regex.finditer(payload, start))
+                matches.extend(ScanMatch(pattern_id, begin, end) for begin, end in sorted(spans))
+        return matches
@@ -2,11 +2,13 @@
 This script handles   init  .
 """
 
-from .network_utils import resolve_ip, is_private_ip
+from .network_utils import resolve_ip, lookup_ptr, ReverseDnsResolver, is_private_ip
 from .packet_utils import is_inbound, get_packet_protocol, get_packet_ports
 
 __all__ = [
     'resolve_ip',
+    'lookup_ptr',
+    'ReverseDnsResolver',
     'is_private_ip', 
     'is_inbound',
     'get_packet_protocol',
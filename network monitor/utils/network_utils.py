@@ -3,6 +3,10 @@ This script provides utility functions for networks.
 """
 
 import socket
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 def resolve_ip(ip):
     """Resolve an IP address to a hostname."""
@@ -11,6 +15,161 @@ def resolve_ip(ip):
     except (socket.herror, socket.timeout):
         return ip
 
+def lookup_ptr(ip):
+    """
+    Look up the PTR name of an IP address with the system resolver.
+
+    Returns:
+        str: Hostname, or None if the address has no name
+    """
+    try:
+        hostname = socket.gethostbyaddr(ip)[0]
+    except (socket.herror, socket.gaierror, socket.timeout, UnicodeError, OSError):
+        return None
+    return hostname if hostname != ip else None
+
+class ReverseDnsResolver:
+    """
+    Non-blocking reverse DNS lookups with a TTL-bounded LRU cache.
+
+    lookup() never waits on the network: it answers from the cache, and on a
+    miss schedules the PTR query on a small thread pool and returns None, so
+    the caller can show the bare IP now and the hostname once it is known.
+    Failed lookups are cached too (for negative_ttl), so an address without a
+    PTR record is not queried again for every alert. At most max_workers
+    queries run at once and at most max_pending wait; beyond that, misses are
+    not scheduled until the backlog drains.
+    """
+
+    def __init__(self, resolver=None, max_workers=4, max_pending=256, ttl=3600.0,
+                 negative_ttl=300.0, max_entries=4096, clock=time.monotonic):
+        """
+        Initialize the resolver.
+
+        Args:
+            resolver: Callable ip -> hostname or None; defaults to the system
+                resolver (lookup_ptr). Tests can pass a local stub.
+            max_workers: Concurrent lookups
+            max_pending: Lookups queued or running before misses are no longer scheduled
+            ttl: Seconds a resolved hostname is cached
+            negative_ttl: Seconds a failed lookup is cached
+            max_entries: Cached addresses; the least recently used is evicted first
+            clock: Time source in seconds
+        """
+        self.resolver = resolver or lookup_ptr
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self.cache = OrderedDict()      # ip -> (hostname or None, expiry)
+        self.pending = {}               # ip -> callbacks waiting for the answer
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='rdns')
+        self.closed = False
+        self.stats = {
+            'hits': 0,
+            'negative_hits': 0,
+            'misses': 0,
+            'resolved': 0,
+            'failed': 0,
+            'skipped': 0,
+        }
+
+    def _cached(self, ip, now):
+        """Return (found, hostname) from the cache, dropping an expired entry. Call with the lock held."""
+        entry = self.cache.get(ip)
+        if entry is None:
+            return False, None
+        hostname, expiry = entry
+        if expiry <= now:
+            del self.cache[ip]
+            return False, None
+        self.cache.move_to_end(ip)
+        return True, hostname
+
+    def lookup(self, ip, callback=None):
+        """
+        Get the cached hostname of an IP address, resolving it in the background on a miss.
+
+        Args:
+            ip: IP address string
+            callback: Called as callback(ip, hostname) from a worker thread when a
+                scheduled lookup finds a hostname; not called on cache hits
+
+        Returns:
+            str: Hostname if it is cached, otherwise None
+        """
+        with self.lock:
+            found, hostname = self._cached(ip, self.clock())
+            if found:
+                self.stats['hits' if hostname else 'negative_hits'] += 1
+                return hostname
+            self.stats['misses'] += 1
+            if ip in self.pending:
+                if callback is not None:
+                    self.pending[ip].append(callback)
+                return None
+            if self.closed or len(self.pending) >= self.max_pending:
+                self.stats['skipped'] += 1
+                return None
+            self.pending[ip] = [callback] if callback is not None else []
+        self.executor.submit(self._resolve, ip)
+        return None
+
+    def _resolve(self, ip):
+        """Run one lookup on a worker thread, cache the answer and notify the waiting callbacks."""
+        try:
+            hostname = self.resolver(ip)
+        except Exception:
+            hostname = None
+        with self.lock:
+            ttl = self.ttl if hostname else self.negative_ttl
+            self.stats['resolved' if hostname else 'failed'] += 1
+            self.cache[ip] = (hostname, self.clock() + ttl)
+            self.cache.move_to_end(ip)
+            while len(self.cache) > self.max_entries:
+                self.cache.popitem(last=False)
+            callbacks = self.pending.pop(ip, [])
+        if hostname:
+            for callback in callbacks:
+                try:
+                    callback(ip, hostname)
+                except Exception:
+                    pass
+
+    def format(self, ip, callback=None):
+        """Return "ip (hostname)" if the hostname is cached, otherwise just the IP."""
+        hostname = self.lookup(ip, callback)
+        return f"{ip} ({hostname})" if hostname else ip
+
+    def wait(self, timeout=None):
+        """
+        Wait until no lookups are pending.
+
+        Returns:
+            bool: True if every lookup finished within the timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self.lock:
+                if not self.pending:
+                    return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+
+    def close(self):
+        """Stop scheduling lookups; queued ones are abandoned and running ones finish in the background."""
+        with self.lock:
+            self.closed = True
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        with self.lock:
+            self.pending.clear()
+
+    def __len__(self):
+        return len(self.cache)
+
 def is_private_ip(ip):
     """Check if an IP address is private."""
     try:
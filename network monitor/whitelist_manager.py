@@ -9,7 +9,7 @@ try:
         WHITELISTED_PROTOCOLS,
         TIME_BASED_WHITELIST,
         WHITELISTED_DOMAINS,
-        COMPILED_DOMAIN_PATTERNS
+        WHITELISTED_DOMAIN_FILES
     )
 except ImportError:
     # Fallback defaults if config is not available
@@ -18,7 +18,7 @@ except ImportError:
     WHITELISTED_PROTOCOLS = []
     TIME_BASED_WHITELIST = {}
     WHITELISTED_DOMAINS = []
-    COMPILED_DOMAIN_PATTERNS = []
+    WHITELISTED_DOMAIN_FILES = []
 
 import time
 try:
@@ -29,7 +29,234 @@ try:
 except ImportError:
     print("Warning: scapy is not installed. Some whitelist functionality may be limited.")
 
+import bisect
 import ipaddress
+import numpy as np
+from domain_trie import DomainTrie
+from header_parser import (
+    HEADER_DTYPE, parse_frames, parse_packets,
+    HDR_TCP, HDR_UDP, HDR_ICMPV6_ND
+)
+from packet_decoder import DecodedPacket
+
+PROTOCOL_NUMBERS_V4 = {"TCP": 6, "UDP": 17, "ICMP": 1}
+PROTOCOL_NUMBERS_V6 = {"TCP": 6, "UDP": 17, "ICMPv6": 58}
+
+BROADCAST_MAC = 0xffffffffffff
+DHCP_PORTS = (67, 68)
+ETH_P_ARP = 0x0806
+# Link-local multicast destinations: STP, LLDP, Cisco CDP/VTP/UDLD, Cisco PVST+
+MULTICAST_MACS = np.array([0x0180c2000000, 0x0180c200000e, 0x01000ccccccc, 0x01000ccccccd], dtype=np.uint64)
+IPV4_MULTICAST_MAC_PREFIX = 0x01005e   # 01:00:5e, top 24 bits
+IPV6_MULTICAST_MAC_PREFIX = 0x3333     # 33:33, top 16 bits
+
+IPV6_DTYPE = np.dtype([('hi', 'u8'), ('lo', 'u8')])
+
+
+def _merge_intervals(intervals):
+    """Sort inclusive (start, end) intervals and merge overlapping or adjacent ones."""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def _split_ipv6(values):
+    """Structured (hi, lo) array for 128-bit integers, which sorts like the integers."""
+    out = np.empty(len(values), dtype=IPV6_DTYPE)
+    out['hi'] = [value >> 64 for value in values]
+    out['lo'] = [value & 0xffffffffffffffff for value in values]
+    return out
+
+
+class CompiledWhitelist:
+    """
+    The whitelist configuration compiled into lookup tables.
+
+    IP networks become sorted, merged integer intervals per IP version, port
+    ranges a 65536-bit bitmap, protocols a table per IP version and time
+    windows a table of the 1440 minutes of the day. Lookups are then a
+    binary search or a table index, and whole batches of parsed headers are
+    checked with np.searchsorted and mask operations.
+    """
+
+    def __init__(self, ips=WHITELISTED_IPS, ports=WHITELISTED_PORTS, protocols=WHITELISTED_PROTOCOLS,
+                 time_windows=TIME_BASED_WHITELIST, domains=WHITELISTED_DOMAINS,
+                 domain_files=WHITELISTED_DOMAIN_FILES):
+        """
+        Compile the rules.
+
+        Args:
+            ips: ip_network objects (IPv4 and IPv6)
+            ports: Inclusive (start, end) port ranges
+            protocols: Protocol names, as in WHITELISTED_PROTOCOLS
+            time_windows: Dict of name -> ("HH:MM", "HH:MM") inclusive windows; a
+                window whose end is before its start wraps past midnight
+            domains: Domain entries, exact or "*." wildcards
+            domain_files: Plain-text lists or hosts files with more domain entries
+        """
+        v4 = _merge_intervals(
+            (int(net.network_address), int(net.broadcast_address)) for net in ips if net.version == 4
+        )
+        self.ip4_starts = np.array([start for start, _ in v4], dtype=np.uint32)
+        self.ip4_ends = np.array([end for _, end in v4], dtype=np.uint32)
+        v6 = _merge_intervals(
+            (int(net.network_address), int(net.broadcast_address)) for net in ips if net.version == 6
+        )
+        self.ip6_starts = _split_ipv6([start for start, _ in v6])
+        self.ip6_ends = _split_ipv6([end for _, end in v6])
+        # Plain lists for single-address lookups with bisect
+        self.ip4_intervals = ([start for start, _ in v4], [end for _, end in v4])
+        self.ip6_intervals = ([start for start, _ in v6], [end for _, end in v6])
+
+        ports_allowed = np.zeros(65536, dtype=bool)
+        for start, end in ports:
+            ports_allowed[max(start, 0):min(end, 65535) + 1] = True
+        self.port_bitmap = np.packbits(ports_allowed, bitorder='little')
+
+        self.proto4_table = np.zeros(256, dtype=bool)
+        self.proto6_table = np.zeros(256, dtype=bool)
+        for name in protocols:
+            if name in PROTOCOL_NUMBERS_V4:
+                self.proto4_table[PROTOCOL_NUMBERS_V4[name]] = True
+            if name in PROTOCOL_NUMBERS_V6:
+                self.proto6_table[PROTOCOL_NUMBERS_V6[name]] = True
+
+        self.minute_table = np.zeros(1440, dtype=bool)
+        for start, end in time_windows.values():
+            first, last = self._minute_of_day(start), self._minute_of_day(end)
+            if first <= last:
+                self.minute_table[first:last + 1] = True
+            else:
+                self.minute_table[first:] = True
+                self.minute_table[:last + 1] = True
+
+        self.domains = DomainTrie(domains)
+        for path in domain_files:
+            try:
+                self.domains.load(path)
+            except OSError as e:
+                print(f"Warning: could not load domain list {path}: {e}")
+
+    @staticmethod
+    def _minute_of_day(text):
+        """Minute of the day of an "HH:MM" string."""
+        hours, minutes = text.split(':')
+        return int(hours) * 60 + int(minutes)
+
+    def ip_whitelisted(self, address):
+        """Check a single IP address string against the compiled networks."""
+        ip = ipaddress.ip_address(address)
+        starts, ends = self.ip4_intervals if ip.version == 4 else self.ip6_intervals
+        value = int(ip)
+        index = bisect.bisect_right(starts, value) - 1
+        return index >= 0 and value <= ends[index]
+
+    def port_whitelisted(self, port):
+        """Check a single port against the bitmap."""
+        return 0 <= port <= 65535 and bool((self.port_bitmap[port >> 3] >> (port & 7)) & 1)
+
+    def time_whitelisted(self, timestamp=None):
+        """Check whether a time (default now) falls in a whitelisted window, in local time."""
+        local = time.localtime(timestamp)
+        return bool(self.minute_table[local.tm_hour * 60 + local.tm_min])
+
+    def domain_whitelisted(self, qname):
+        """Check a DNS query name against the domain trie."""
+        return self.domains.match(qname)
+
+    def evaluate(self, headers, qnames=None, now=None):
+        """
+        Evaluate every rule for a batch of parsed headers.
+
+        Args:
+            headers: HEADER_DTYPE array
+            qnames: Optional sequence of DNS query names (or None) per row; without
+                it the domain rule is skipped
+            now: Time used for rows without a capture timestamp; defaults to now
+
+        Returns:
+            numpy bool array, True where a row matches any rule
+        """
+        count = len(headers)
+        if count == 0:
+            return np.zeros(0, dtype=bool)
+        flags = headers['flags']
+        ip_version = headers['ip_version']
+        is_ip4 = ip_version == 4
+        is_ip6 = ip_version == 6
+
+        # IP networks
+        result = is_ip4 & (self._in_ip4(headers['src_ip4']) | self._in_ip4(headers['dst_ip4']))
+        if len(self.ip6_starts) and is_ip6.any():
+            result |= is_ip6 & (self._in_ip6(headers['src_ip6']) | self._in_ip6(headers['dst_ip6']))
+
+        # Ports
+        has_ports = (flags & (HDR_TCP | HDR_UDP)) != 0
+        result |= has_ports & (self._ports_set(headers['src_port']) | self._ports_set(headers['dst_port']))
+
+        # Protocols
+        proto = headers['proto']
+        result |= (is_ip4 & self.proto4_table[proto]) | (is_ip6 & self.proto6_table[proto])
+
+        # Time windows, by capture time in local time
+        if self.minute_table.any():
+            now = time.time() if now is None else now
+            timestamps = np.where(headers['timestamp'] > 0, headers['timestamp'], now)
+            utc_offset = time.localtime(float(timestamps[0])).tm_gmtoff
+            minutes = ((timestamps + utc_offset) // 60).astype(np.int64) % 1440
+            result |= self.minute_table[minutes]
+
+        # Broadcast: ARP, DHCP and IPv6 neighbor discovery
+        dst_mac = headers['dst_mac']
+        broadcast = dst_mac == BROADCAST_MAC
+        if broadcast.any():
+            dhcp = ((flags & HDR_UDP) != 0) & np.isin(headers['dst_port'], DHCP_PORTS)
+            result |= broadcast & (
+                (headers['ethertype'] == ETH_P_ARP) | dhcp | ((flags & HDR_ICMPV6_ND) != 0)
+            )
+
+        # Multicast
+        result |= (
+            ((dst_mac >> np.uint64(24)) == IPV4_MULTICAST_MAC_PREFIX)
+            | ((dst_mac >> np.uint64(32)) == IPV6_MULTICAST_MAC_PREFIX)
+            | np.isin(dst_mac, MULTICAST_MACS)
+        )
+
+        # Domains, only for the few rows that carry a DNS query
+        if qnames is not None and len(self.domains):
+            for row, qname in enumerate(qnames):
+                if qname is not None and not result[row] and self.domain_whitelisted(qname):
+                    result[row] = True
+        return result
+
+    def _in_ip4(self, values):
+        """Mask of IPv4 addresses inside a whitelisted interval."""
+        if not len(self.ip4_starts):
+            return np.zeros(len(values), dtype=bool)
+        index = np.searchsorted(self.ip4_starts, values, side='right') - 1
+        return (index >= 0) & (values <= self.ip4_ends[np.maximum(index, 0)])
+
+    def _in_ip6(self, values):
+        """Mask of IPv6 addresses, given as (n, 2) high/low words, inside a whitelisted interval."""
+        addresses = np.empty(len(values), dtype=IPV6_DTYPE)
+        addresses['hi'] = values[:, 0]
+        addresses['lo'] = values[:, 1]
+        index = np.searchsorted(self.ip6_starts, addresses, side='right') - 1
+        ends = self.ip6_ends[np.maximum(index, 0)]
+        below_end = (addresses['hi'] < ends['hi']) | (
+            (addresses['hi'] == ends['hi']) & (addresses['lo'] <= ends['lo'])
+        )
+        return (index >= 0) & below_end
+
+    def _ports_set(self, ports):
+        """Mask of ports set in the bitmap."""
+        ports = ports.astype(np.intp)
+        return ((self.port_bitmap[ports >> 3] >> (ports & 7)) & 1).astype(bool)
+
 
 class WhitelistManager:
     """
@@ -38,8 +265,11 @@ class WhitelistManager:
     def __init__(self, logger):
         """
         Special method __init__.
+
+        The whitelist configuration is compiled once here.
         """
         self.logger = logger
+        self.compiled = CompiledWhitelist()
 
     def is_whitelisted(self, packet):
         """Check if a packet matches any whitelist rules."""
@@ -73,10 +303,38 @@ class WhitelistManager:
             # to avoid false positives
             return True
 
+    def is_whitelisted_batch(self, batch, now=None):
+        """
+        Check a whole batch of packets against the whitelist rules at once.
+
+        Args:
+            batch: List of DecodedPacket records, list of raw (timestamp, bytes)
+                tuples, or a parsed header array (HEADER_DTYPE)
+            now: Time used for packets without a capture timestamp; defaults to now
+
+        Returns:
+            numpy bool array with one entry per packet
+        """
+        try:
+            qnames = None
+            if isinstance(batch, np.ndarray) and batch.dtype == HEADER_DTYPE:
+                headers = batch
+            elif len(batch) and isinstance(batch[0], DecodedPacket):
+                headers = parse_frames([record.frame for record in batch],
+                                       [record.timestamp or 0.0 for record in batch])
+                qnames = [record.dns_qname for record in batch]
+            else:
+                headers = parse_packets(batch)
+            return self.compiled.evaluate(headers, qnames, now)
+        except Exception as e:
+            self.logger.debug(f"Error in batch whitelist check: {e}")
+            # As for single packets, treat the batch as whitelisted to avoid false positives
+            return np.ones(len(batch), dtype=bool)
+
     def is_whitelisted_port(self, port):
         """Check if a port is whitelisted."""
         try:
-            return any(start <= port <= end for start, end in WHITELISTED_PORTS)
+            return self.compiled.port_whitelisted(port)
         except Exception as e:
             self.logger.debug(f"Error checking if port {port} is whitelisted: {e}")
             return True
@@ -85,13 +343,11 @@ class WhitelistManager:
         """Check if packet IPs are whitelisted."""
         try:
             if IP in packet:
-                src_ip = packet[IP].src
-                dst_ip = packet[IP].dst
-                return any(
-                    ipaddress.ip_address(src_ip) in network or 
-                    ipaddress.ip_address(dst_ip) in network 
-                    for network in WHITELISTED_IPS
-                )
+                return (self.compiled.ip_whitelisted(packet[IP].src)
+                        or self.compiled.ip_whitelisted(packet[IP].dst))
+            elif IPv6 in packet:
+                return (self.compiled.ip_whitelisted(packet[IPv6].src)
+                        or self.compiled.ip_whitelisted(packet[IPv6].dst))
             return False
         except Exception as e:
             self.logger.debug(f"Error checking IP whitelist: {e}")
@@ -103,8 +359,7 @@ class WhitelistManager:
             if TCP in packet or UDP in packet:
                 sport = packet[TCP].sport if TCP in packet else packet[UDP].sport
                 dport = packet[TCP].dport if TCP in packet else packet[UDP].dport
-                return any(start <= sport <= end or start <= dport <= end 
-                          for start, end in WHITELISTED_PORTS)
+                return self.compiled.port_whitelisted(sport) or self.compiled.port_whitelisted(dport)
             return False
         except Exception as e:
             self.logger.debug(f"Error checking port whitelist: {e}")
@@ -114,13 +369,9 @@ class WhitelistManager:
         """Check if packet protocol is whitelisted."""
         try:
             if IP in packet:
-                proto = packet[IP].proto
-                proto_name = {6: "TCP", 17: "UDP", 1: "ICMP"}.get(proto)
-                return proto_name in WHITELISTED_PROTOCOLS
+                return bool(self.compiled.proto4_table[packet[IP].proto])
             elif IPv6 in packet:
-                nh = packet[IPv6].nh
-                proto_name = {6: "TCP", 17: "UDP", 58: "ICMPv6"}.get(nh)
-                return proto_name in WHITELISTED_PROTOCOLS
+                return bool(self.compiled.proto6_table[packet[IPv6].nh])
             return False
         except Exception as e:
             self.logger.debug(f"Error checking protocol whitelist: {e}")
@@ -129,11 +380,7 @@ class WhitelistManager:
     def _check_time_based_whitelist(self):
         """Check if current time falls within whitelisted time windows."""
         try:
-            current_time = time.strftime("%H:%M")
-            return any(
-                start_time <= current_time <= end_time 
-                for start_time, end_time in TIME_BASED_WHITELIST.values()
-            )
+            return self.compiled.time_whitelisted()
         except Exception as e:
             self.logger.debug(f"Error checking time-based whitelist: {e}")
             return True
@@ -143,7 +390,7 @@ class WhitelistManager:
         try:
             if packet.haslayer(DNSQR):
                 qname = packet[DNSQR].qname.decode('utf-8')
-                return any(pattern.match(qname) for pattern in COMPILED_DOMAIN_PATTERNS)
+                return self.compiled.domain_whitelisted(qname)
             return False
         except Exception as e:
             self.logger.debug(f"Error checking domain whitelist: {e}")